@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw, __version__ as PIL_VERSION
+
+from core import (
+    DELETED_DIRNAME,
+    MEDIA_EXTS,
+    DirectoryIndex,
+    StateJournal,
+    iter_media_batches,
+    iter_move_to_deleted,
+    iter_restore_deleted,
+    resolve_initial_index,
+    sanitize_state_payload,
+    save_state,
+    scan_media_files,
+)
+from imaging import decode_image, fit_frame, pillow_heif
+
+CORPUS_VERSION = 1
+CORPUS_MARKER = ".benchmark_corpus.json"
+RESOLUTIONS = [(640, 480), (1920, 1080), (4000, 3000)]
+VIEW_BOX = (1260, 780)
+MASTER_BOX = (2540, 1420)
+THUMB_BOX = (150, 150)
+MOVE_COUNT = 1000
+DEFAULT_THRESHOLD = 0.15
+
+
+def _formats() -> dict[str, dict]:
+    formats = {
+        ".jpg": {"format": "JPEG", "quality": 90},
+        ".png": {"format": "PNG"},
+        ".tif": {"format": "TIFF"},
+        ".webp": {"format": "WEBP", "quality": 85},
+    }
+    if pillow_heif is not None:
+        formats[".heic"] = {"format": "HEIF", "quality": 80}
+    return formats
+
+
+def _synthetic_image(rng: random.Random, size: tuple[int, int]) -> Image.Image:
+    # Degradado más formas al azar: comprime como una foto mejor que el ruido puro.
+    width, height = size
+    base = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(base)
+    for _ in range(24):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(width // 4 + 1), y0 + rng.randrange(height // 4 + 1)
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        draw.ellipse((x0, y0, x1, y1), fill=color)
+    return base
+
+
+def build_corpus(root: Path, files: int, seed: int) -> dict:
+    # Un número pequeño de imágenes reales por formato y resolución, y el resto
+    # del volumen con copias de una miniatura en un árbol de directorios anidado.
+    rng = random.Random(seed)
+    marker = root / CORPUS_MARKER
+    spec = {"version": CORPUS_VERSION, "files": files, "seed": seed, "formats": sorted(_formats())}
+    if marker.exists():
+        if json.loads(marker.read_text(encoding="utf-8")) == spec:
+            return spec
+        # Solo se borra lo que este script generó: una carpeta con el marcador.
+        shutil.rmtree(root)
+    elif root.exists() and any(root.iterdir()):
+        raise SystemExit(f"{root} no está vacía y no es un corpus de benchmark; elige otra carpeta con --corpus")
+    root.mkdir(parents=True, exist_ok=True)
+    # El marcador va primero: un corpus a medias también se reconoce como propio.
+    marker.write_text(json.dumps({"version": CORPUS_VERSION, "partial": True}), encoding="utf-8")
+    samples = root / "samples"
+    samples.mkdir()
+    written = 0
+    for ext, options in _formats().items():
+        for width, height in RESOLUTIONS:
+            image = _synthetic_image(rng, (width, height))
+            image.save(samples / f"sample_{width}x{height}{ext}", **options)
+            written += 1
+
+    filler = _synthetic_image(rng, (160, 120))
+    payloads = {}
+    for ext in (".jpg", ".png"):
+        target = root / f"filler{ext}"
+        filler.save(target, **_formats()[ext])
+        payloads[ext] = target.read_bytes()
+        target.unlink()
+    exts = sorted(MEDIA_EXTS)
+    for i in range(max(0, files - written)):
+        directory = root / f"d{rng.randrange(20):02d}" / f"e{rng.randrange(20):02d}" / f"f{rng.randrange(10)}"
+        directory.mkdir(parents=True, exist_ok=True)
+        ext = rng.choice(exts)
+        data = payloads[".png"] if ext == ".png" else payloads[".jpg"]
+        (directory / f"IMG_{i:06d}{ext}").write_bytes(data)
+    marker.write_text(json.dumps(spec), encoding="utf-8")
+    return spec
+
+
+def _measure(fn: Callable[[], object], repeat: int, setup: Callable[[], None] | None = None) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_benchmarks(corpus: Path, repeat: int, seed: int) -> dict[str, dict]:
+    results: dict[str, dict] = {}
+
+    def record(name: str, timings: list[float], items: int) -> None:
+        median = statistics.median(timings)
+        results[name] = {
+            "median_s": round(median, 6),
+            "min_s": round(min(timings), 6),
+            "runs": len(timings),
+            "items": items,
+            "per_item_us": round(median / items * 1_000_000, 3) if items else None,
+        }
+        print(f"{name:<24} {median * 1000:10.2f} ms  ({items} items)", file=sys.stderr)
+
+    files = scan_media_files(corpus)
+    record("scan_cold", _measure(lambda: scan_media_files(corpus), repeat), len(files))
+
+    index = DirectoryIndex(MEDIA_EXTS, DELETED_DIRNAME)
+    for _batch in iter_media_batches(corpus, index=index):
+        pass
+
+    def _scan_indexed() -> None:
+        for _batch in iter_media_batches(corpus, previous=index, index=DirectoryIndex(MEDIA_EXTS, DELETED_DIRNAME)):
+            pass
+
+    record("scan_indexed", _measure(_scan_indexed, repeat), len(files))
+
+    samples = sorted((corpus / "samples").iterdir())
+    for name, box in (("decode_view", VIEW_BOX), ("decode_thumb", THUMB_BOX)):
+        record(name, _measure(lambda box=box: [decode_image(path, box) for path in samples], repeat), len(samples))
+        for ext in sorted({path.suffix for path in samples}):
+            subset = [path for path in samples if path.suffix == ext]
+            record(
+                f"{name}{ext}",
+                _measure(lambda box=box, subset=subset: [decode_image(path, box) for path in subset], repeat),
+                len(subset),
+            )
+
+    # Redimensionar la ventana: derivar del maestro en memoria frente a decodificar de nuevo.
+    masters = [frame for frame, _err, _strategy in (decode_image(path, MASTER_BOX) for path in samples) if frame is not None]
+    record(
+        "resize_from_master",
+        _measure(lambda: [fit_frame(master, VIEW_BOX, Image.Resampling.LANCZOS) for master in masters], repeat),
+        len(masters),
+    )
+
+    rng = random.Random(seed)
+    rels = [str(path.relative_to(corpus)) for path in files]
+    marked = rng.sample(rels, len(rels) * 3 // 10)
+    state = {"index": len(files) // 2, "kept": marked[: len(marked) // 2], "deleted": marked[len(marked) // 2 :]}
+    record("state_sanitize", _measure(lambda: sanitize_state_payload(state, files, corpus), repeat), len(files))
+    with tempfile.TemporaryDirectory() as state_dir:
+        sanitized = sanitize_state_payload(state, files, corpus)
+        record("state_save", _measure(lambda: save_state(Path(state_dir), sanitized), repeat), len(marked))
+        # Lo que cuesta guardar una decisión con el diario frente a reescribir el JSON entero.
+        journal = StateJournal(Path(state_dir))
+        record("state_journal_append", _measure(lambda: journal.append([{"op": "keep", "rel": rels[0]}]), repeat), 1)
+
+    # Sin progreso guardado y con la imagen elegida al final: el peor caso.
+    fresh = {"index": 0, "kept": [], "deleted": []}
+    start_path = files[-1] if files else None
+    record("resolve_initial_index", _measure(lambda: resolve_initial_index(files, fresh, start_path), repeat), len(files))
+
+    to_move = [rel for rel in rels if not rel.startswith("samples")][:MOVE_COUNT]
+
+    timings = []
+    restore_timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _item in iter_move_to_deleted(corpus, to_move):
+            pass
+        timings.append(time.perf_counter() - started)
+        # El manifiesto devuelve cada archivo a su subcarpeta original.
+        started = time.perf_counter()
+        for _item in iter_restore_deleted(corpus):
+            pass
+        restore_timings.append(time.perf_counter() - started)
+    record("move_to_deleted", timings, len(to_move))
+    record("restore_from_manifest", restore_timings, len(to_move))
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, data in sorted(current["results"].items()):
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("median_s"):
+            continue
+        ratio = data["median_s"] / previous["median_s"]
+        status = "REGRESIÓN" if ratio > 1 + threshold else ("mejora" if ratio < 1 - threshold else "igual")
+        print(f"{name:<24} {previous['median_s'] * 1000:10.2f} -> {data['median_s'] * 1000:10.2f} ms  x{ratio:.2f}  {status}")
+        if status == "REGRESIÓN":
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks reproducibles con un corpus sintético.")
+    parser.add_argument("--files", type=int, default=10_000, help="archivos totales del corpus (10k-200k)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--corpus",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "trash-image-eraser-bench",
+        help="carpeta del corpus; se reutiliza si coincide con --files y --seed",
+    )
+    parser.add_argument("--output", type=Path, help="guardar resultados en JSON")
+    parser.add_argument("--compare", type=Path, help="JSON de referencia con el que comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="tolerancia relativa (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    spec = build_corpus(args.corpus, args.files, args.seed)
+    print(f"Corpus listo en {time.perf_counter() - started:.1f} s: {args.corpus}", file=sys.stderr)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pillow": PIL_VERSION,
+            "pillow_heif": getattr(pillow_heif, "__version__", None),
+            "corpus": spec,
+            "repeat": args.repeat,
+        },
+        "results": run_benchmarks(args.corpus, args.repeat, args.seed),
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("corpus") != spec:
+            print("Aviso: la referencia se midió con otro corpus.", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"Regresiones: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
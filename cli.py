@@ -0,0 +1,191 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+from core import (
+    DELETED_DIRNAME,
+    INDEX_FILENAME,
+    MEDIA_EXTS,
+    DirectoryIndex,
+    StateJournal,
+    _safe_relative,
+    coerce_state_payload,
+    iter_media_batches,
+    iter_move_to_deleted,
+    iter_restore_deleted,
+    load_manifest,
+    new_batch_id,
+    select_manifest_entries,
+    sanitize_state_payload,
+    update_marks_after_move,
+)
+
+
+def _emit(event: str, **fields: object) -> None:
+    # Una línea JSON por evento, volcada al momento para poder encadenar con jq.
+    sys.stdout.write(json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def _folder_arg(value: str) -> Path:
+    folder = Path(value).expanduser().resolve()
+    if not folder.is_dir():
+        raise argparse.ArgumentTypeError(f"no es una carpeta: {value}")
+    return folder
+
+
+def _iter_scan(folder: Path, use_index: bool) -> Iterator[list[Path]]:
+    index_path = folder / INDEX_FILENAME
+    previous = DirectoryIndex.load(index_path, MEDIA_EXTS, DELETED_DIRNAME) if use_index else None
+    index = DirectoryIndex(MEDIA_EXTS, DELETED_DIRNAME)
+    yield from iter_media_batches(folder, MEDIA_EXTS, DELETED_DIRNAME, previous=previous, index=index)
+    if use_index:
+        index.save(index_path)
+
+
+def cmd_scan(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    total = 0
+    for batch in _iter_scan(args.folder, not args.no_index):
+        total += len(batch)
+        if args.list:
+            for path in batch:
+                _emit("file", path=_safe_relative(path, args.folder))
+        else:
+            _emit("progress", files=total)
+    _emit("done", files=total, seconds=round(time.perf_counter() - started, 3))
+    return 0
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    files = sorted(path for batch in _iter_scan(args.folder, not args.no_index) for path in batch)
+    state = sanitize_state_payload(StateJournal(args.folder).load(), files, args.folder)
+    _emit(
+        "status",
+        files=len(files),
+        index=state["index"],
+        kept=len(state["kept"]),
+        deleted=len(state["deleted"]),
+        pending=len(files) - len(state["kept"]) - len(state["deleted"]),
+    )
+    return 0
+
+
+def cmd_apply_deletions(args: argparse.Namespace) -> int:
+    # No hace falta escanear: basta con las rutas marcadas en el estado.
+    journal = StateJournal(args.folder)
+    state = coerce_state_payload(journal.load())
+    targets = state["deleted"]
+    if args.dry_run:
+        for rel in targets:
+            _emit("would-move", path=rel)
+        _emit("done", moved=0, failed=0, pending=len(targets), dry_run=True)
+        return 0
+    moved: list[str] = []
+    failed = 0
+    batch = new_batch_id()
+    try:
+        for rel, error in iter_move_to_deleted(args.folder, targets, DELETED_DIRNAME, batch=batch):
+            if error is None:
+                moved.append(rel)
+                _emit("moved", path=rel, done=len(moved) + failed, total=len(targets))
+            else:
+                failed += 1
+                _emit("failed", path=rel, error=error, done=len(moved) + failed, total=len(targets))
+    finally:
+        # También tras Ctrl+C: lo ya movido no debe quedar marcado como pendiente.
+        kept, deleted = update_marks_after_move(set(state["kept"]), set(state["deleted"]), set(moved))
+        journal.compact({"index": state["index"], "kept": sorted(kept), "deleted": sorted(deleted)})
+    _emit("done", moved=len(moved), failed=failed, batch=batch)
+    return 1 if failed else 0
+
+
+def cmd_list_deleted(args: argparse.Namespace) -> int:
+    entries = select_manifest_entries(load_manifest(args.folder / DELETED_DIRNAME), args.batch, args.under)
+    batches: dict[str, int] = {}
+    for entry in entries:
+        _emit("deleted", name=entry["name"], path=entry["rel"], batch=entry.get("batch"), moved_at=entry.get("moved_at"))
+        key = entry.get("batch") or ""
+        batches[key] = batches.get(key, 0) + 1
+    for batch, count in batches.items():
+        _emit("batch", batch=batch, files=count)
+    _emit("done", files=len(entries))
+    return 0
+
+
+def cmd_restore(args: argparse.Namespace) -> int:
+    if args.names and (args.batch or args.under):
+        _emit("error", error="los nombres no se combinan con --batch ni --under")
+        return 2
+    restored = 0
+    failed = 0
+    selection = iter_restore_deleted(
+        args.folder,
+        args.names or None,
+        DELETED_DIRNAME,
+        batch=args.batch,
+        under=args.under,
+    )
+    for name, rel, error in selection:
+        if error is None:
+            restored += 1
+            _emit("restored", name=name, path=rel)
+        else:
+            failed += 1
+            _emit("failed", name=name, error=error)
+    _emit("done", restored=restored, failed=failed)
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="trash-image-eraser-cli",
+        description="Modo por lotes sin interfaz. Emite un objeto JSON por línea en stdout.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scan = sub.add_parser("scan", help="escanear la carpeta y actualizar el índice de directorios")
+    scan.add_argument("folder", type=_folder_arg)
+    scan.add_argument("--list", action="store_true", help="emitir cada archivo encontrado")
+    scan.add_argument("--no-index", action="store_true", help="ignorar y no escribir el índice")
+    scan.set_defaults(func=cmd_scan)
+
+    status = sub.add_parser("status", help="resumen del estado guardado frente a los archivos reales")
+    status.add_argument("folder", type=_folder_arg)
+    status.add_argument("--no-index", action="store_true", help="ignorar y no escribir el índice")
+    status.set_defaults(func=cmd_status)
+
+    apply = sub.add_parser("apply-deletions", help=f"mover las marcadas para borrar a {DELETED_DIRNAME}")
+    apply.add_argument("folder", type=_folder_arg)
+    apply.add_argument("--dry-run", action="store_true", help="solo listar lo que se movería")
+    apply.set_defaults(func=cmd_apply_deletions)
+
+    listing = sub.add_parser("list-deleted", help=f"listar lo movido a {DELETED_DIRNAME} según el manifiesto")
+    listing.add_argument("folder", type=_folder_arg)
+    listing.add_argument("--batch", help="solo un lote (el valor que emite apply-deletions)")
+    listing.add_argument("--under", help="solo archivos que estaban en esta subcarpeta")
+    listing.set_defaults(func=cmd_list_deleted)
+
+    restore = sub.add_parser("restore", help=f"devolver archivos de {DELETED_DIRNAME} a su ruta original")
+    restore.add_argument("folder", type=_folder_arg)
+    restore.add_argument("names", nargs="*", help="nombres dentro de la papelera (por defecto, todos)")
+    restore.add_argument("--batch", help="restaurar solo un lote")
+    restore.add_argument("--under", help="restaurar solo lo que estaba en esta subcarpeta")
+    restore.set_defaults(func=cmd_restore)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        _emit("interrupted")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
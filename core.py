@@ -0,0 +1,715 @@
+# Lógica sin interfaz: escaneo, estado y movimientos. La importan tanto la app
+# como la CLI, así que no debe depender de Tk, customtkinter ni Pillow.
+import errno
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp", ".heic"}
+VIDEO_EXTS = {".mp4", ".mov", ".mkv", ".avi"}
+MEDIA_EXTS = IMAGE_EXTS | VIDEO_EXTS
+STATE_FILENAME = ".trash_image_eraser_state.json"
+JOURNAL_FILENAME = ".trash_image_eraser_state.journal"
+JOURNAL_COMPACT_EVENTS = 5000
+INDEX_FILENAME = ".trash_image_eraser_index.json"
+DELETED_DIRNAME = "_deleted_by_trash_image_eraser"
+MANIFEST_FILENAME = ".trash_image_eraser_manifest.jsonl"
+SCAN_BATCH_SIZE = 256
+SCAN_FLUSH_SECONDS = 0.2
+
+
+def _logging_base_dir() -> Path:
+    if os.name == "nt":
+        return Path(os.environ.get("LOCALAPPDATA") or Path.home())
+    state_home = os.environ.get("XDG_STATE_HOME")
+    if state_home:
+        return Path(state_home)
+    return Path.home() / ".local" / "state"
+
+
+def _app_state_dir() -> Path:
+    return _logging_base_dir() / "trash-image-eraser"
+
+
+def _configure_logger() -> logging.Logger:
+    logger = logging.getLogger("trash_image_eraser")
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    if multiprocessing.parent_process() is not None:
+        # Los hijos de los pools no rotan app.log: en Windows la rotación
+        # entre procesos falla con el archivo abierto por el principal.
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        logger.addHandler(stream_handler)
+        return logger
+    try:
+        log_dir = _app_state_dir()
+        log_dir.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_dir / "app.log",
+            maxBytes=1_000_000,
+            backupCount=3,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
+    except Exception:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        logger.addHandler(stream_handler)
+    return logger
+
+
+LOGGER = _configure_logger()
+
+
+def _safe_int(value: object, default: int = 0) -> int:
+    try:
+        return int(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    return max(minimum, _safe_int(os.environ.get(name), default))
+
+
+def _sorted_dir_entries(directory: str) -> list[os.DirEntry]:
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except OSError:
+        LOGGER.debug("No se pudo listar %s", directory, exc_info=True)
+        return []
+    # Ordenar por nombre normalizado en un recorrido en profundidad produce
+    # exactamente el orden de sorted() sobre las rutas completas.
+    entries.sort(key=lambda entry: os.path.normcase(entry.name))
+    return entries
+
+
+# (nombre, es_directorio, tamaño, mtime_ns); los directorios llevan 0, 0.
+ListingItem = tuple[str, bool, int, int]
+
+
+class DirectoryIndex:
+    VERSION = 1
+
+    def __init__(self, media_exts: set[str], deleted_dirname: str = DELETED_DIRNAME) -> None:
+        self.media_exts = sorted(media_exts)
+        self.deleted_dirname = deleted_dirname
+        self.dirs: dict[str, tuple[int, list[ListingItem]]] = {}
+        self.reused_dirs = 0
+        self.listed_dirs = 0
+        # Directorios listados en este escaneo: solo sus tamaños y mtimes son actuales.
+        self.fresh_dirs: set[str] = set()
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        media_exts: set[str],
+        deleted_dirname: str = DELETED_DIRNAME,
+    ) -> "DirectoryIndex":
+        index = cls(media_exts, deleted_dirname)
+        if not path.exists():
+            return index
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            if (
+                payload.get("version") != cls.VERSION
+                or payload.get("media_exts") != index.media_exts
+                or payload.get("deleted_dirname") != deleted_dirname
+            ):
+                return index
+            for rel_dir, (mtime_ns, items) in payload.get("dirs", {}).items():
+                index.dirs[str(rel_dir)] = (
+                    int(mtime_ns),
+                    [(str(name), bool(is_dir), int(size), int(mtime)) for name, is_dir, size, mtime in items],
+                )
+        except Exception:
+            LOGGER.exception("Índice de directorios inválido en %s; se reconstruirá", path)
+            return cls(media_exts, deleted_dirname)
+        return index
+
+    def file_stats(self, folder: Path) -> dict[Path, tuple[int, int]]:
+        # Editar un archivo no cambia el mtime de su directorio, así que los
+        # datos de un listado reutilizado pueden estar viejos: esos se omiten
+        # y quien los necesite hace su propio stat.
+        stats: dict[Path, tuple[int, int]] = {}
+        root = str(folder)
+        for rel_dir, (_mtime_ns, items) in self.dirs.items():
+            if rel_dir not in self.fresh_dirs:
+                continue
+            base = os.path.join(root, *rel_dir.split("/")) if rel_dir else root
+            for name, is_dir, size, mtime_ns in items:
+                if not is_dir:
+                    stats[Path(os.path.join(base, name))] = (size, mtime_ns)
+        return stats
+
+    def save(self, path: Path) -> None:
+        payload = {
+            "version": self.VERSION,
+            "media_exts": self.media_exts,
+            "deleted_dirname": self.deleted_dirname,
+            "dirs": {rel_dir: [mtime_ns, items] for rel_dir, (mtime_ns, items) in self.dirs.items()},
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            tmp_path.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except Exception:
+            LOGGER.exception("No se pudo guardar el índice de directorios en %s", path)
+
+
+def _directory_listing(
+    path: str,
+    rel_dir: str,
+    exts: set[str],
+    previous: DirectoryIndex | None,
+    index: DirectoryIndex | None,
+) -> list[ListingItem]:
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        LOGGER.debug("No se pudo leer %s", path, exc_info=True)
+        return []
+    # El mtime de un directorio solo cambia al añadir, quitar o renombrar
+    # entradas: si coincide, su listado anterior sigue siendo válido.
+    cached = previous.dirs.get(rel_dir) if previous is not None else None
+    if cached is not None and cached[0] == mtime_ns:
+        items = cached[1]
+        if index is not None:
+            index.reused_dirs += 1
+    else:
+        items = []
+        for entry in _sorted_dir_entries(path):
+            try:
+                if entry.is_dir() and not entry.is_symlink():
+                    items.append((entry.name, True, 0, 0))
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in exts or not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                LOGGER.debug("No se pudo inspeccionar %s", entry.path, exc_info=True)
+                continue
+            items.append((entry.name, False, st.st_size, st.st_mtime_ns))
+        if index is not None:
+            index.listed_dirs += 1
+            index.fresh_dirs.add(rel_dir)
+    if index is not None:
+        index.dirs[rel_dir] = (mtime_ns, items)
+    return items
+
+
+def iter_media_batches(
+    folder: Path,
+    media_exts: set[str] | None = None,
+    deleted_dirname: str = DELETED_DIRNAME,
+    batch_size: int = SCAN_BATCH_SIZE,
+    previous: DirectoryIndex | None = None,
+    index: DirectoryIndex | None = None,
+) -> Iterator[list[Path]]:
+    exts = media_exts or MEDIA_EXTS
+    root = str(folder)
+    stack: list[tuple[str, str, Iterator[ListingItem]]] = [
+        (root, "", iter(_directory_listing(root, "", exts, previous, index)))
+    ]
+    batch: list[Path] = []
+    yielded = False
+    last_flush = time.monotonic()
+    while stack:
+        dir_path, rel_dir, items = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        name, is_dir = item[0], item[1]
+        child_path = os.path.join(dir_path, name)
+        if is_dir:
+            if not rel_dir and name == deleted_dirname:
+                continue
+            child_rel = f"{rel_dir}/{name}" if rel_dir else name
+            stack.append((child_path, child_rel, iter(_directory_listing(child_path, child_rel, exts, previous, index))))
+            continue
+        batch.append(Path(child_path))
+        now = time.monotonic()
+        # El primer hallazgo sale solo para poder mostrarlo cuanto antes.
+        if not yielded or len(batch) >= batch_size or now - last_flush >= SCAN_FLUSH_SECONDS:
+            yield batch
+            batch = []
+            yielded = True
+            last_flush = now
+    if batch:
+        yield batch
+
+
+def scan_media_files(
+    folder: Path,
+    media_exts: set[str] | None = None,
+    deleted_dirname: str = DELETED_DIRNAME,
+) -> list[Path]:
+    results = [path for batch in iter_media_batches(folder, media_exts, deleted_dirname) for path in batch]
+    return sorted(results)
+
+
+def _safe_relative(path: Path, folder: Path) -> str:
+    try:
+        return str(path.relative_to(folder))
+    except Exception:
+        return str(path)
+
+
+def has_state_progress(state: dict) -> bool:
+    return bool(state.get("kept") or state.get("deleted") or _safe_int(state.get("index", 0), 0) > 0)
+
+
+def coerce_state_payload(state: dict) -> dict:
+    raw_deleted = state.get("deleted", [])
+    raw_kept = state.get("kept", [])
+    if not isinstance(raw_deleted, list):
+        raw_deleted = []
+    if not isinstance(raw_kept, list):
+        raw_kept = []
+    deleted = {str(rel) for rel in raw_deleted}
+    kept = {str(rel) for rel in raw_kept}
+    kept.difference_update(deleted)
+    return {
+        "index": max(0, _safe_int(state.get("index", 0), 0)),
+        "kept": sorted(kept),
+        "deleted": sorted(deleted),
+    }
+
+
+def sanitize_state_payload(state: dict, files: list[Path], folder: Path) -> dict:
+    valid_rel = {_safe_relative(path, folder) for path in files}
+    coerced = coerce_state_payload(state)
+    deleted = {rel for rel in coerced["deleted"] if rel in valid_rel}
+    kept = {rel for rel in coerced["kept"] if rel in valid_rel}
+    index = coerced["index"]
+    if files:
+        index = max(0, min(index, len(files) - 1))
+    else:
+        index = 0
+    return {
+        "index": index,
+        "kept": sorted(kept),
+        "deleted": sorted(deleted),
+    }
+
+
+def resolve_initial_index(
+    files: list[Path],
+    state: dict,
+    start_path: Path | None,
+) -> int:
+    if not files:
+        return 0
+    if has_state_progress(state):
+        return max(0, min(_safe_int(state.get("index", 0), 0), len(files) - 1))
+    if start_path is None:
+        return 0
+    for idx, candidate in enumerate(files):
+        try:
+            if candidate.samefile(start_path):
+                return idx
+        except Exception:
+            if candidate == start_path:
+                return idx
+    return 0
+
+
+def unique_target_path(target: Path) -> Path:
+    if not target.exists():
+        return target
+    stem = target.stem
+    suffix = target.suffix
+    parent = target.parent
+    i = 1
+    while True:
+        candidate = parent / f"{stem} ({i}){suffix}"
+        if not candidate.exists():
+            return candidate
+        i += 1
+
+
+class DeletedNameIndex:
+    # Nombres ya ocupados en la papelera, leídos con un solo listado, y el
+    # siguiente contador libre por nombre: elegir destino no cuesta un stat
+    # por intento aunque se repitan cientos de IMG_0001.JPG. Se compara sin
+    # distinguir mayúsculas para no pisar archivos en Windows o macOS.
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        try:
+            self._taken = {name.casefold() for name in os.listdir(directory)}
+        except FileNotFoundError:
+            self._taken = set()
+        self._next: dict[str, int] = {}
+
+    def reserve(self, name: str) -> Path:
+        key = name.casefold()
+        if key not in self._taken:
+            self._taken.add(key)
+            return self.directory / name
+        path = Path(name)
+        stem, suffix = path.stem, path.suffix
+        i = self._next.get(key, 1)
+        while f"{stem} ({i}){suffix}".casefold() in self._taken:
+            i += 1
+        candidate = f"{stem} ({i}){suffix}"
+        self._taken.add(candidate.casefold())
+        self._next[key] = i + 1
+        return self.directory / candidate
+
+    def release(self, name: str) -> None:
+        self._taken.discard(name.casefold())
+
+
+def update_marks_after_move(
+    kept: set[str],
+    deleted: set[str],
+    moved: set[str],
+    unselected: set[str] | None = None,
+) -> tuple[set[str], set[str]]:
+    next_kept = set(kept)
+    next_deleted = set(deleted)
+    unselected_set = set(unselected or set())
+
+    if unselected_set:
+        next_kept.update(unselected_set)
+    next_deleted.difference_update(moved | unselected_set)
+    next_kept.difference_update(moved)
+    return next_kept, next_deleted
+
+
+def load_state(folder: Path) -> dict:
+    state_path = folder / STATE_FILENAME
+    if not state_path.exists():
+        return {"index": 0, "kept": [], "deleted": []}
+    try:
+        return json.loads(state_path.read_text(encoding="utf-8"))
+    except Exception:
+        LOGGER.exception("No se pudo leer el estado en %s", state_path)
+        return {"index": 0, "kept": [], "deleted": []}
+
+
+def save_state(folder: Path, payload: dict) -> None:
+    # Escritura atómica: un corte a mitad deja el archivo anterior intacto.
+    state_path = folder / STATE_FILENAME
+    tmp_path = state_path.with_name(state_path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        handle.write(json.dumps(payload, ensure_ascii=False, indent=2))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, state_path)
+    _fsync_directory(folder)
+
+
+def _fsync_directory(folder: Path) -> None:
+    # Para que el rename sobreviva a un corte de luz. En Windows no se pueden abrir carpetas.
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def apply_journal_event(state: dict, kept: set[str], deleted: set[str], event: dict) -> None:
+    op = event.get("op")
+    if op == "index":
+        state["index"] = max(0, _safe_int(event.get("value"), 0))
+        return
+    rel = event.get("rel")
+    if not isinstance(rel, str):
+        return
+    if op == "keep":
+        deleted.discard(rel)
+        kept.add(rel)
+    elif op == "delete":
+        kept.discard(rel)
+        deleted.add(rel)
+    elif op == "unmark":
+        kept.discard(rel)
+        deleted.discard(rel)
+
+
+class StateJournal:
+    # El estado es la instantánea JSON de siempre más un diario de eventos
+    # (una línea JSON por decisión). La instantánea guarda su número de época
+    # y el diario empieza con la época sobre la que se escribió: si el proceso
+    # muere tras guardar una instantánea y antes de borrar el diario, ese
+    # diario ya está incluido y no se vuelve a aplicar.
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+        self.path = folder / JOURNAL_FILENAME
+        self.events = 0
+        self.epoch = 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.events >= JOURNAL_COMPACT_EVENTS
+
+    def load(self) -> dict:
+        raw = load_state(self.folder)
+        state = coerce_state_payload(raw)
+        self.epoch = max(0, _safe_int(raw.get("journal_epoch", 0), 0))
+        kept = set(state["kept"])
+        deleted = set(state["deleted"])
+        self.events = 0
+        try:
+            with self.path.open("r", encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Normalmente la última línea, cortada por un cierre abrupto.
+                        LOGGER.debug("Línea de diario ilegible en %s", self.path)
+                        continue
+                    if not isinstance(event, dict):
+                        continue
+                    if event.get("op") == "epoch":
+                        if _safe_int(event.get("value"), 0) != self.epoch:
+                            LOGGER.info("Diario %s ya incluido en la instantánea; se ignora", self.path)
+                            break
+                        continue
+                    apply_journal_event(state, kept, deleted, event)
+                    self.events += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            LOGGER.exception("No se pudo leer el diario de estado %s", self.path)
+        state["kept"] = sorted(kept)
+        state["deleted"] = sorted(deleted)
+        return state
+
+    def append(self, events: list[dict]) -> None:
+        if not events:
+            return
+        if self.events == 0:
+            # Diario nuevo, o uno de una época anterior que ya no vale.
+            events = [{"op": "epoch", "value": self.epoch}, *events]
+            mode = "w"
+        else:
+            mode = "a"
+        lines = "".join(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n" for event in events)
+        with self.path.open(mode, encoding="utf-8") as journal:
+            journal.write(lines)
+        self.events += len(events)
+
+    def compact(self, payload: dict) -> None:
+        self.epoch += 1
+        save_state(self.folder, {**payload, "journal_epoch": self.epoch})
+        self.path.unlink(missing_ok=True)
+        self.events = 0
+
+    def reset(self) -> None:
+        (self.folder / STATE_FILENAME).unlink(missing_ok=True)
+        self.path.unlink(missing_ok=True)
+        self.events = 0
+        self.epoch = 0
+
+
+def move_file(src: Path, target: Path, same_device: bool) -> None:
+    # En el mismo dispositivo basta con renombrar; si no, se copia, se comprueba
+    # el tamaño y solo entonces se borra el original.
+    if same_device:
+        try:
+            os.rename(src, target)
+            return
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+    shutil.copy2(src, target)
+    try:
+        copied = os.stat(target).st_size
+        expected = os.stat(src).st_size
+        if copied != expected:
+            raise OSError(f"copia incompleta ({copied} de {expected} bytes)")
+        os.unlink(src)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+
+
+def new_batch_id() -> str:
+    return datetime.now().isoformat(timespec="milliseconds")
+
+
+def _manifest_line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def load_manifest(deleted_dir: Path) -> dict[str, dict]:
+    # El manifiesto tiene una línea por archivo movido a la papelera y otra por
+    # cada restauración; el resultado es, por nombre dentro de la papelera, la
+    # entrada de lo que sigue allí (en orden de movimiento).
+    entries: dict[str, dict] = {}
+    try:
+        with (deleted_dir / MANIFEST_FILENAME).open("r", encoding="utf-8") as manifest:
+            for line in manifest:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict) or not isinstance(record.get("name"), str):
+                    continue
+                if record.get("op") in ("restore", "gone"):
+                    entries.pop(record["name"], None)
+                elif isinstance(record.get("rel"), str):
+                    entries[record["name"]] = record
+    except FileNotFoundError:
+        pass
+    except OSError:
+        LOGGER.exception("No se pudo leer el manifiesto de %s", deleted_dir)
+    return entries
+
+
+def iter_move_to_deleted(
+    folder: Path,
+    rel_paths: Iterable[str],
+    deleted_dirname: str = DELETED_DIRNAME,
+    batch: str | None = None,
+) -> Iterator[tuple[str, str | None]]:
+    # Produce (ruta relativa, error) por archivo; error es None si se movió.
+    # Quien consume puede dejar de iterar para cancelar entre archivos.
+    deleted_dir = folder / deleted_dirname
+    deleted_dir.mkdir(parents=True, exist_ok=True)
+    deleted_dev = os.stat(deleted_dir).st_dev
+    names = DeletedNameIndex(deleted_dir)
+    batch = batch or new_batch_id()
+    with (deleted_dir / MANIFEST_FILENAME).open("a", encoding="utf-8") as manifest:
+        for rel in rel_paths:
+            src = folder / rel
+            try:
+                st = os.stat(src)
+            except FileNotFoundError:
+                yield rel, "ya no existe"
+                continue
+            except OSError as exc:
+                yield rel, str(exc)
+                continue
+            target = names.reserve(src.name)
+            try:
+                move_file(src, target, same_device=st.st_dev == deleted_dev)
+            except Exception as exc:
+                names.release(target.name)
+                LOGGER.exception("No se pudo mover %s a %s", src, target)
+                yield rel, str(exc)
+                continue
+            # Se vuelca en cada archivo: tras un corte, el manifiesto cubre todo lo movido.
+            manifest.write(
+                _manifest_line(
+                    {
+                        "rel": rel,
+                        "name": target.name,
+                        "size": st.st_size,
+                        "mtime": st.st_mtime,
+                        "moved_at": datetime.now().isoformat(timespec="seconds"),
+                        "batch": batch,
+                    }
+                )
+            )
+            manifest.flush()
+            yield rel, None
+
+
+def select_manifest_entries(
+    entries: dict[str, dict],
+    batch: str | None = None,
+    under: str | None = None,
+) -> list[dict]:
+    prefix = Path(under).parts if under else ()
+    return [
+        entry
+        for entry in entries.values()
+        if (batch is None or entry.get("batch") == batch)
+        and (not prefix or Path(entry["rel"]).parts[: len(prefix)] == prefix)
+    ]
+
+
+def _is_inside(path: Path, root: Path) -> bool:
+    try:
+        return path.resolve().is_relative_to(root.resolve())
+    except OSError:
+        return False
+
+
+def iter_restore_deleted(
+    folder: Path,
+    names: list[str] | None = None,
+    deleted_dirname: str = DELETED_DIRNAME,
+    batch: str | None = None,
+    under: str | None = None,
+) -> Iterator[tuple[str, str | None, str | None]]:
+    # Produce (nombre en la papelera, ruta relativa restaurada, error). Con
+    # entrada en el manifiesto el archivo vuelve a su ruta original; los
+    # movidos antes de existir el manifiesto vuelven a la raíz de la carpeta.
+    deleted_dir = folder / deleted_dirname
+    entries = load_manifest(deleted_dir)
+    if names is not None:
+        selected = [(name, entries.get(name)) for name in names]
+    else:
+        selected = [(entry["name"], entry) for entry in select_manifest_entries(entries, batch, under)]
+        if batch is None and under is None:
+            # Solo al restaurar todo hace falta listar la papelera, por los archivos sin entrada.
+            selected.extend(
+                (entry.name, None)
+                for entry in _sorted_dir_entries(str(deleted_dir))
+                if entry.is_file() and entry.name != MANIFEST_FILENAME and entry.name not in entries
+            )
+    if not selected:
+        return
+    restored = 0
+    with (deleted_dir / MANIFEST_FILENAME).open("a", encoding="utf-8") as manifest:
+        for name, entry in selected:
+            src = deleted_dir / name
+            target = folder / entry["rel"] if entry is not None else folder / name
+            # El manifiesto y los nombres vienen de fuera: nada se saca de la papelera
+            # ni se restaura fuera de la carpeta revisada.
+            if (
+                src.parent.resolve() != deleted_dir.resolve()
+                or not _is_inside(target, folder)
+                or _is_inside(target, deleted_dir)
+            ):
+                LOGGER.warning("Restauración rechazada: %s -> %s", src, target)
+                yield name, None, "ruta fuera de la carpeta revisada"
+                continue
+            if not src.is_file():
+                if entry is not None:
+                    manifest.write(_manifest_line({"op": "gone", "name": name}))
+                yield name, None, "no está en la papelera"
+                continue
+            if os.path.lexists(target):
+                target = unique_target_path(target)
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                move_file(src, target, same_device=True)
+            except Exception as exc:
+                LOGGER.exception("No se pudo restaurar %s a %s", src, target)
+                yield name, None, str(exc)
+                continue
+            if entry is not None:
+                manifest.write(_manifest_line({"op": "restore", "name": name}))
+                manifest.flush()
+                restored += 1
+            yield name, _safe_relative(target, folder), None
+    if restored and not load_manifest(deleted_dir):
+        # Papelera vacía de entradas: el manifiesto no tiene nada que recordar.
+        (deleted_dir / MANIFEST_FILENAME).unlink(missing_ok=True)
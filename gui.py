@@ -0,0 +1,4389 @@
+import bisect
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import tkinter as tk
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from tkinter import filedialog, messagebox
+from typing import Callable, Generic, Hashable, Iterator, TypeVar
+
+import customtkinter as ctk
+
+from core import (
+    DELETED_DIRNAME,
+    INDEX_FILENAME,
+    LOGGER,
+    MEDIA_EXTS,
+    STATE_FILENAME,
+    StateJournal,
+    VIDEO_EXTS,
+    DirectoryIndex,
+    _app_state_dir,
+    _env_int,
+    _safe_int,
+    _safe_relative,
+    coerce_state_payload,
+    has_state_progress,
+    iter_media_batches,
+    iter_move_to_deleted,
+    resolve_initial_index,
+    sanitize_state_payload,
+    update_marks_after_move,
+)
+
+try:
+    from PIL import ExifTags, Image, ImageTk
+except Exception as exc:  # pragma: no cover
+    raise SystemExit(
+        "Falta Pillow. Instálalo con: pip install -r requirements.txt"
+    ) from exc
+
+from imaging import (
+    DECODE_STATS,
+    _ORIENTATION_TRANSPOSE,
+    DecodePayload,
+    QualityMetrics,
+    _exif_orientation,
+    decode_image,
+    decode_image_payload,
+    fit_frame,
+    quality_metrics,
+    quality_metrics_batch,
+)
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    import vlc
+except Exception:
+    vlc = None
+
+
+THUMB_STORE_FILENAME = "thumbnails.sqlite3"
+THUMB_STORE_BUDGET_MB = 512
+DISPLAY_CACHE_BUDGET_MB = 384
+THUMB_CACHE_BUDGET_MB = 64
+MASTER_CACHE_BUDGET_MB = 96
+# Parte del presupuesto del visor reservada a fotogramas ya convertidos a PhotoImage.
+PHOTO_CACHE_SHARE = 0.25
+PHOTO_STRIPE_ROWS = 256
+PREFETCH_AHEAD_DEFAULT = 6
+PREFETCH_BEHIND_DEFAULT = 1
+READ_AHEAD_FILES_DEFAULT = 16
+READ_AHEAD_BUDGET_MB = 128
+READ_AHEAD_INFLIGHT_DEFAULT = 4
+SIMILAR_MAX_DISTANCE = 6
+SIGNATURE_CHUNK_SIZE = 64
+PARTIAL_HASH_BYTES = 64 * 1024
+EXACT_HASH_WORKERS = 4
+QUALITY_STORE_FILENAME = "quality.sqlite3"
+QUALITY_CHUNK_SIZE = 32
+QUALITY_SHARP_REFERENCE = 300.0
+BURST_MAX_GAP_SECONDS = 2.0
+BURST_MAX_DISTANCE = 10
+BURST_CHUNK_SIZE = 64
+LATENCY_WINDOW = 2048
+LATENCY_DUMP_SECONDS = 60
+LATENCY_FILENAME = "latency.json"
+MOVE_CHUNK_FILES = 64
+MOVE_CHUNK_SECONDS = 0.25
+REVIEW_TILE_WIDTH = 180
+REVIEW_TILE_HEIGHT = 250
+REVIEW_OVERSCAN_ROWS = 1
+STRIP_THUMB_SIZE = 64
+STRIP_PAD = 10
+
+
+def prefetch_window(max_ahead: int, decode_seconds: float, nav_interval: float | None) -> int:
+    if max_ahead <= 0:
+        return 0
+    if not nav_interval or nav_interval <= 0:
+        return min(max_ahead, 2)
+    needed = math.ceil(max(0.0, decode_seconds) / nav_interval) + 1
+    return max(1, min(max_ahead, needed))
+
+
+def prefetch_order(index: int, total: int, direction: int, ahead: int, behind: int) -> list[int]:
+    step = 1 if direction >= 0 else -1
+    forward = [index + step * offset for offset in range(1, ahead + 1)]
+    backward = [index - step * offset for offset in range(1, behind + 1)]
+    return [i for i in forward + backward if 0 <= i < total]
+
+
+def grid_window(
+    count: int,
+    columns: int,
+    top: float,
+    height: float,
+    row_height: int,
+    overscan: int,
+) -> tuple[range, range]:
+    # (índices a instanciar, índices visibles)
+    rows = (count + columns - 1) // columns
+    first_visible = max(0, int(top // row_height))
+    last_visible = int((top + height) // row_height)
+    first_row = max(0, first_visible - overscan)
+    last_row = min(rows - 1, last_visible + overscan)
+    wanted = range(first_row * columns, min(count, (last_row + 1) * columns))
+    visible = range(first_visible * columns, min(count, (last_visible + 1) * columns))
+    return wanted, visible
+
+
+def _prepend_env_path(path: Path) -> None:
+    value = str(path)
+    current = os.environ.get("PATH", "")
+    parts = current.split(os.pathsep) if current else []
+    if value not in parts:
+        os.environ["PATH"] = value + (os.pathsep + current if current else "")
+
+
+def _vlc_candidate_dirs() -> list[Path]:
+    dirs: list[Path] = []
+    if getattr(sys, "frozen", False):
+        exe_dir = Path(sys.executable).parent
+        dirs.append(exe_dir)
+        vlcbin_dir = exe_dir / "vlcbin"
+        if vlcbin_dir not in dirs:
+            dirs.append(vlcbin_dir)
+        meipass = getattr(sys, "_MEIPASS", None)
+        if meipass:
+            meipass_dir = Path(meipass)
+            if meipass_dir != exe_dir:
+                dirs.append(meipass_dir)
+            vlcbin_meipass = meipass_dir / "vlcbin"
+            if vlcbin_meipass not in dirs and vlcbin_meipass != meipass_dir:
+                dirs.append(vlcbin_meipass)
+    else:
+        root = Path(__file__).resolve().parent
+        local_vlc = root / "dependencias" / "vlc"
+        if local_vlc.exists():
+            dirs.append(local_vlc)
+
+    env_vlc_home = os.environ.get("VLC_HOME")
+    if env_vlc_home:
+        env_path = Path(env_vlc_home)
+        if env_path not in dirs:
+            dirs.append(env_path)
+    return dirs
+
+
+def _prepare_vlc_environment() -> Path | None:
+    plugin_path: Path | None = None
+
+    for base in _vlc_candidate_dirs():
+        if (base / "libvlc.dll").exists():
+            _prepend_env_path(base)
+
+    for base in _vlc_candidate_dirs():
+        candidate = base / "plugins"
+        if candidate.is_dir():
+            plugin_path = candidate
+            os.environ["VLC_PLUGIN_PATH"] = str(candidate)
+            break
+
+    if plugin_path is None:
+        env = os.environ.get("VLC_PLUGIN_PATH", "")
+        if env:
+            first = env.split(os.pathsep)[0]
+            try:
+                first_path = Path(first)
+                if first_path.is_dir():
+                    plugin_path = first_path
+            except Exception:
+                LOGGER.exception("Error preparando VLC_PLUGIN_PATH")
+                plugin_path = None
+
+    return plugin_path
+
+
+def _resource_path(*parts: str | Path) -> Path:
+    if getattr(sys, "frozen", False):
+        meipass = getattr(sys, "_MEIPASS", None)
+        base = Path(meipass) if meipass else Path(__file__).resolve().parent
+    else:
+        base = Path(__file__).resolve().parent
+    return base.joinpath(*parts)
+
+
+def _resolve_icon_path() -> Path | None:
+    icon_name = "trash_image_eraser.ico"
+    root = Path(__file__).resolve().parent
+    candidates = [
+        _resource_path("dependencias", "media", icon_name),
+        _resource_path(icon_name),
+        root / "dependencias" / "media" / icon_name,
+        root / icon_name,
+    ]
+    if getattr(sys, "frozen", False):
+        exe_dir = Path(sys.executable).parent
+        candidates.extend(
+            [
+                exe_dir / "dependencias" / "media" / icon_name,
+                exe_dir / icon_name,
+            ]
+        )
+
+    seen: set[Path] = set()
+    for candidate in candidates:
+        if candidate in seen:
+            continue
+        seen.add(candidate)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self.window = max(1, window)
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    def since(self, stage: str, started: float) -> None:
+        self.record(stage, time.perf_counter() - started)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            copies = {stage: sorted(samples) for stage, samples in self._samples.items()}
+            counts = dict(self._counts)
+
+        def _pct(ordered: list[float], q: float) -> float:
+            return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))] * 1000
+
+        return {
+            stage: {
+                "count": counts[stage],
+                "p50_ms": _pct(ordered, 0.50),
+                "p95_ms": _pct(ordered, 0.95),
+                "p99_ms": _pct(ordered, 0.99),
+                "max_ms": ordered[-1] * 1000,
+            }
+            for stage, ordered in sorted(copies.items())
+        }
+
+
+def timed_call(
+    tracker: LatencyTracker,
+    stage: str,
+    submitted: float,
+    fn: Callable[..., object],
+    *args: object,
+) -> object:
+    # Separa la espera en la cola del pool (".queue") del trabajo en sí (".work").
+    started = time.perf_counter()
+    tracker.record(f"{stage}.queue", started - submitted)
+    try:
+        return fn(*args)
+    finally:
+        tracker.since(f"{stage}.work", started)
+
+
+def frame_from_payload(payload: DecodePayload) -> tuple[Image.Image | None, str | None, str]:
+    mode, size, data, err, strategy, seconds = payload
+    if data is None:
+        return None, err, strategy
+    DECODE_STATS.record(strategy, seconds)
+    return Image.frombytes(mode, size, data), None, strategy
+
+
+DecodeFn = Callable[[Path, tuple[int, int]], tuple[Image.Image | None, str | None, str]]
+
+
+PRIORITY_VIEW = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_STRIP = 2
+PRIORITY_REVIEW = 3
+
+
+class PriorityExecutor:
+    # Un trabajo cuyo `stale` devuelve True al llegar su turno se cancela sin ejecutarse.
+    def __init__(self, workers: int, name: str) -> None:
+        self._heap: list[tuple[int, int, Future, Callable[..., object], tuple, Callable[[], bool] | None]] = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._closed = False
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True).start()
+
+    def submit(
+        self,
+        fn: Callable[..., object],
+        *args: object,
+        priority: int = PRIORITY_VIEW,
+        stale: Callable[[], bool] | None = None,
+    ) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("cola de carga cerrada")
+            heapq.heappush(self._heap, (priority, next(self._seq), future, fn, args, stale))
+            self._cond.notify()
+        return future
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def cancel_pending(self) -> int:
+        with self._cond:
+            jobs, self._heap = self._heap, []
+        for job in jobs:
+            job[2].cancel()
+        return len(jobs)
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.cancel_pending()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap:
+                    return
+                _priority, _seq, future, fn, args, stale = heapq.heappop(self._heap)
+            if stale is not None:
+                try:
+                    dropped = stale()
+                except Exception:
+                    LOGGER.debug("Error comprobando si un trabajo sigue vigente", exc_info=True)
+                    dropped = False
+                if dropped:
+                    future.cancel()
+                    continue
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+class DecodeBackend:
+    # Con "process" los hilos de carga solo esperan al proceso hijo; la prioridad se decide en sus colas.
+    def __init__(self, mode: str = "thread", workers: int = 2) -> None:
+        self.workers = max(1, workers)
+        self._processes: ProcessPoolExecutor | None = None
+        self._closed = False
+        if mode == "process":
+            try:
+                # Nunca fork: la app tiene hilos y locks de logging vivos que el hijo heredaría.
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except Exception:
+                LOGGER.exception("No se pudo crear el pool de decodificación; se usan hilos")
+        self._threads = PriorityExecutor(self.workers, "media-loader")
+
+    @property
+    def mode(self) -> str:
+        return "process" if self._processes is not None else "thread"
+
+    def submit(
+        self,
+        fn: Callable[..., object],
+        *args: object,
+        priority: int = PRIORITY_VIEW,
+        stale: Callable[[], bool] | None = None,
+    ) -> Future:
+        return self._threads.submit(fn, *args, priority=priority, stale=stale)
+
+    def cancel_pending(self) -> int:
+        return self._threads.cancel_pending()
+
+    def decode(
+        self,
+        path: Path,
+        box: tuple[int, int],
+        data: bytes | None = None,
+    ) -> tuple[Image.Image | None, str | None, str]:
+        pool = self._processes
+        if pool is None:
+            return decode_image(path, box, data=data)
+        try:
+            payload = pool.submit(decode_image_payload, str(path), box, data).result()
+        except BrokenProcessPool:
+            if self._closed:
+                return None, "cancelado", "process"
+            LOGGER.exception("El pool de decodificación se rompió; se sigue con hilos")
+            self._processes = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            return decode_image(path, box, data=data)
+        except Exception as exc:
+            if self._closed:
+                return None, "cancelado", "process"
+            LOGGER.debug("Error decodificando %s en proceso", path, exc_info=True)
+            return None, str(exc), "process"
+        return frame_from_payload(payload)
+
+    def shutdown(self) -> None:
+        self._closed = True
+        self._threads.shutdown()
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+class ReadAhead:
+    def __init__(
+        self,
+        budget_bytes: int,
+        max_inflight: int,
+        latency: LatencyTracker | None = None,
+    ) -> None:
+        self.budget_bytes = max(1, budget_bytes)
+        self.max_inflight = max(1, max_inflight)
+        self._latency = latency
+        # Reentrante: si una lectura acaba antes de registrar su callback,
+        # _finish se ejecuta dentro de _fill con el lock ya tomado.
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="read-ahead")
+        self._hinter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="read-ahead-hint")
+        # ruta -> (bytes, segundos que costó leerlos)
+        self._buffers: OrderedDict[Path, tuple[bytes, float]] = OrderedDict()
+        self._inflight: dict[Path, Future] = {}
+        self._window: list[Path] = []
+        self._wanted: set[Path] = set()
+        # Ya entregados o descartados: no se vuelven a leer mientras sigan en la ventana.
+        self._done: set[Path] = set()
+        self._hinted: set[Path] = set()
+        self._closed = False
+        self.buffered_bytes = 0
+        self.inflight_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def __iter__(self) -> Iterator[Path]:
+        with self._lock:
+            return iter(list(self._buffers) + list(self._inflight))
+
+    def schedule(self, paths: list[Path]) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._window = list(dict.fromkeys(paths))
+            self._wanted = set(self._window)
+            self._done &= self._wanted
+            self._hinted &= self._wanted
+            for path in [path for path in self._buffers if path not in self._wanted]:
+                self._release(path)
+            hints = [
+                path
+                for path in self._window
+                if path not in self._hinted and path not in self._buffers and path not in self._done
+            ]
+            self._hinted.update(hints)
+            self._fill()
+        if hints and hasattr(os, "posix_fadvise"):
+            self._hinter.submit(self._advise, hints)
+
+    def take(self, path: Path) -> bytes | None:
+        # Si la lectura está en vuelo se espera a ella en vez de leer otra vez.
+        with self._lock:
+            entry = self._buffers.get(path)
+            if entry is not None:
+                self._release(path)
+                self._done.add(path)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+                return entry[0]
+            future = self._inflight.get(path)
+            if future is None:
+                # Ya se leyó del disco: traerlo ahora solo gastaría red.
+                self._done.add(path)
+                self.misses += 1
+                return None
+        started = time.perf_counter()
+        try:
+            data, seconds, _reserved = future.result()
+        except Exception:
+            data, seconds = None, 0.0
+        waited = time.perf_counter() - started
+        if self._latency is not None:
+            self._latency.record("readahead.wait", waited)
+        with self._lock:
+            # _finish pudo guardarlo ya en el búfer o llegar después: en ambos casos no se conserva.
+            self._done.add(path)
+            if path in self._buffers:
+                self._release(path)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.wait_seconds += waited
+            self.saved_seconds += max(0.0, seconds - waited)
+        return data
+
+    def discard(self, path: Path) -> None:
+        with self._lock:
+            if path in self._buffers:
+                self._release(path)
+            self._done.add(path)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._buffers),
+                "bytes": self.buffered_bytes,
+                "inflight": len(self._inflight),
+                "inflight_bytes": self.inflight_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._window = []
+            self._wanted = set()
+            self._buffers.clear()
+            self.buffered_bytes = 0
+        self._hinter.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, path: Path) -> None:
+        data, _seconds = self._buffers.pop(path)
+        self.buffered_bytes -= len(data)
+
+    def _fill(self) -> None:
+        # Con el lock tomado.
+        for path in self._window:
+            if len(self._inflight) >= self.max_inflight:
+                return
+            if self.buffered_bytes + self.inflight_bytes >= self.budget_bytes:
+                return
+            if path in self._buffers or path in self._inflight or path in self._done:
+                continue
+            future = self._pool.submit(self._read, path)
+            self._inflight[path] = future
+            future.add_done_callback(lambda fut, path=path: self._finish(path, fut))
+
+    def _read(self, path: Path) -> tuple[bytes | None, float, int]:
+        started = time.perf_counter()
+        reserved = 0
+        try:
+            with open(path, "rb", buffering=0) as fh:
+                size = os.fstat(fh.fileno()).st_size
+                with self._lock:
+                    if self._closed or path not in self._wanted:
+                        return None, 0.0, 0
+                    if self.buffered_bytes + self.inflight_bytes + size > self.budget_bytes:
+                        return None, 0.0, 0
+                    self.inflight_bytes += size
+                    reserved = size
+                data = fh.read()
+        except OSError:
+            LOGGER.debug("Lectura anticipada fallida para %s", path, exc_info=True)
+            return None, 0.0, reserved
+        seconds = time.perf_counter() - started
+        if self._latency is not None:
+            self._latency.record("readahead.read", seconds)
+        return data, seconds, reserved
+
+    def _finish(self, path: Path, future: Future) -> None:
+        try:
+            data, seconds, reserved = future.result()
+        except Exception:
+            data, seconds, reserved = None, 0.0, 0
+        with self._lock:
+            self._inflight.pop(path, None)
+            self.inflight_bytes -= reserved
+            if self._closed:
+                return
+            if data is None:
+                # No cabe en el presupuesto o es ilegible: se leerá del disco.
+                self._done.add(path)
+            elif path in self._wanted and path not in self._done:
+                self._buffers[path] = (data, seconds)
+                self.buffered_bytes += len(data)
+            self._fill()
+
+    def _advise(self, paths: list[Path]) -> None:
+        for path in paths:
+            with self._lock:
+                if self._closed or path not in self._wanted:
+                    continue
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                LOGGER.debug("posix_fadvise no disponible para %s", path, exc_info=True)
+            finally:
+                os.close(fd)
+
+
+PREVIEW_MIN_EDGE = 160
+_EXIF_THUMB_OFFSET_TAG = 0x0201
+_EXIF_THUMB_LENGTH_TAG = 0x0202
+_TIFF_SUBFILE_TYPE_TAG = 254
+
+
+def _exif_thumbnail(img: Image.Image) -> Image.Image | None:
+    raw = img.info.get("exif")
+    if not isinstance(raw, bytes):
+        return None
+    ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+    offset = _safe_int(ifd1.get(_EXIF_THUMB_OFFSET_TAG), -1)
+    length = _safe_int(ifd1.get(_EXIF_THUMB_LENGTH_TAG), 0)
+    if offset < 0 or length <= 0:
+        return None
+    # Los offsets de IFD1 son relativos a la cabecera TIFF, que va tras "Exif\0\0".
+    header = 6 if raw.startswith(b"Exif\x00\x00") else 0
+    data = raw[header + offset : header + offset + length]
+    if len(data) != length:
+        return None
+    with Image.open(io.BytesIO(data)) as thumb:
+        thumb.load()
+        return thumb.copy()
+
+
+def _tiff_reduced_subfile(img: Image.Image) -> Image.Image | None:
+    best: tuple[int, int] | None = None
+    main_area = img.width * img.height
+    for index in range(1, getattr(img, "n_frames", 1)):
+        img.seek(index)
+        if not _safe_int(img.tag_v2.get(_TIFF_SUBFILE_TYPE_TAG), 0) & 1:
+            continue
+        area = img.width * img.height
+        if area < main_area and (best is None or area < best[1]):
+            best = (index, area)
+    if best is None:
+        return None
+    img.seek(best[0])
+    img.load()
+    return img.copy()
+
+
+def extract_embedded_preview(path: Path, box: tuple[int, int]) -> Image.Image | None:
+    try:
+        with Image.open(path) as img:
+            orientation = _exif_orientation(img)
+            preview: Image.Image | None = None
+            if img.format in {"JPEG", "TIFF"}:
+                preview = _exif_thumbnail(img)
+                if preview is None and img.format == "TIFF":
+                    preview = _tiff_reduced_subfile(img)
+            elif img.format in {"HEIF", "AVIF"}:
+                if img.draft(None, (PREVIEW_MIN_EDGE, PREVIEW_MIN_EDGE)) is not None:
+                    img.load()
+                    preview = img.copy()
+                    # pillow_heif ya entrega las miniaturas orientadas.
+                    orientation = 1
+            if preview is None:
+                return None
+    except Exception:
+        LOGGER.debug("No se pudo extraer la vista previa embebida de %s", path, exc_info=True)
+        return None
+    if preview.mode not in {"RGB", "RGBA"}:
+        preview = preview.convert("RGB")
+    method = _ORIENTATION_TRANSPOSE.get(orientation)
+    if method is not None:
+        preview = preview.transpose(method)
+    # Filtro barato: solo se ve hasta que llega el fotograma definitivo.
+    box = (max(1, box[0]), max(1, box[1]))
+    scale = min(box[0] / preview.width, box[1] / preview.height)
+    target = (max(1, round(preview.width * scale)), max(1, round(preview.height * scale)))
+    if target != preview.size:
+        preview = preview.resize(target, Image.Resampling.BILINEAR)
+    return preview
+
+
+def _decode_image_for_view(
+    path: Path,
+    max_w: int,
+    max_h: int,
+    decode: DecodeFn = decode_image,
+) -> tuple[Image.Image | None, str | None]:
+    frame, err, _strategy = decode(path, (max_w - 20, max_h - 20))
+    return frame, err
+
+
+def _view_from_master(
+    master: Image.Image,
+    max_w: int,
+    max_h: int,
+) -> tuple[Image.Image | None, str | None]:
+    return fit_frame(master, (max_w - 20, max_h - 20), Image.Resampling.LANCZOS), None
+
+
+def _decode_image_for_thumb(
+    path: Path,
+    size: int,
+    decode: DecodeFn = decode_image,
+) -> tuple[Image.Image | None, str | None]:
+    frame, err, _strategy = decode(path, (size, size))
+    return frame, err
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+def image_nbytes(frame: Image.Image) -> int:
+    return frame.width * frame.height * len(frame.getbands())
+
+
+class LRUCache(Generic[K, V]):
+    def __init__(self, budget_bytes: int, sizeof: Callable[[V], int] | None = None) -> None:
+        self.budget_bytes = max(1, budget_bytes)
+        self._sizeof = sizeof
+        self._items: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(list(self._items))
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        entry = self._items.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._items.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: K, value: V, nbytes: int | None = None) -> None:
+        if nbytes is None:
+            nbytes = self._sizeof(value) if self._sizeof else 0
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous[1]
+        self._items[key] = (value, nbytes)
+        self.total_bytes += nbytes
+        # La entrada recién insertada nunca se desaloja a sí misma, aunque
+        # por sí sola supere el presupuesto.
+        while self.total_bytes > self.budget_bytes and len(self._items) > 1:
+            _old_key, (_old_value, old_bytes) = self._items.popitem(last=False)
+            self.total_bytes -= old_bytes
+            self.evictions += 1
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        entry = self._items.pop(key, None)
+        if entry is None:
+            return default
+        self.total_bytes -= entry[1]
+        return entry[0]
+
+    def clear(self) -> None:
+        self._items.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._items),
+            "bytes": self.total_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _encode_thumb(frame: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    if frame.mode == "RGBA":
+        frame.save(buffer, format="PNG", optimize=False)
+    else:
+        frame.convert("RGB").save(buffer, format="JPEG", quality=88)
+    return buffer.getvalue()
+
+
+class ThumbnailStore:
+    # Si el tamaño o el mtime del archivo no coinciden con los guardados, cuenta como fallo.
+    def __init__(self, db_path: Path, budget_bytes: int) -> None:
+        self.db_path = db_path
+        self.budget_bytes = max(1, budget_bytes)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._total_bytes = 0
+        self._disabled = False
+
+    def _connection(self) -> sqlite3.Connection | None:
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS thumbs ("
+                " root TEXT NOT NULL,"
+                " rel TEXT NOT NULL,"
+                " thumb_size INTEGER NOT NULL,"
+                " file_size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " nbytes INTEGER NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " data BLOB NOT NULL,"
+                " PRIMARY KEY (root, rel, thumb_size))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS thumbs_last_used ON thumbs (last_used)")
+            conn.commit()
+            self._total_bytes = int(conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbs").fetchone()[0])
+        except Exception:
+            LOGGER.exception("No se pudo abrir la caché de miniaturas %s", self.db_path)
+            self._disabled = True
+            return None
+        self._conn = conn
+        return conn
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            self._connection()
+            return self._total_bytes
+
+    def get(self, root: str, rel: str, thumb_size: int, stamp: tuple[int, int]) -> Image.Image | None:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT data FROM thumbs WHERE root = ? AND rel = ? AND thumb_size = ?"
+                    " AND file_size = ? AND mtime_ns = ?",
+                    (root, rel, thumb_size, stamp[0], stamp[1]),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE thumbs SET last_used = ? WHERE root = ? AND rel = ? AND thumb_size = ?",
+                    (time.time(), root, rel, thumb_size),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                LOGGER.debug("Error leyendo miniatura de %s", rel, exc_info=True)
+                return None
+        try:
+            with Image.open(io.BytesIO(row[0])) as img:
+                img.load()
+                return img.copy()
+        except Exception:
+            LOGGER.debug("Miniatura persistida corrupta para %s", rel, exc_info=True)
+            return None
+
+    def put(
+        self,
+        root: str,
+        rel: str,
+        thumb_size: int,
+        stamp: tuple[int, int],
+        frame: Image.Image,
+    ) -> None:
+        try:
+            data = _encode_thumb(frame)
+        except Exception:
+            LOGGER.debug("No se pudo codificar miniatura de %s", rel, exc_info=True)
+            return
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                previous = conn.execute(
+                    "SELECT nbytes FROM thumbs WHERE root = ? AND rel = ? AND thumb_size = ?",
+                    (root, rel, thumb_size),
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO thumbs"
+                    " (root, rel, thumb_size, file_size, mtime_ns, nbytes, last_used, data)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (root, rel, thumb_size, stamp[0], stamp[1], len(data), time.time(), data),
+                )
+                self._total_bytes += len(data) - (previous[0] if previous else 0)
+                if self._total_bytes > self.budget_bytes:
+                    self._evict(conn)
+                conn.commit()
+            except sqlite3.Error:
+                LOGGER.debug("Error guardando miniatura de %s", rel, exc_info=True)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Se libera hasta el 90% del presupuesto para no desalojar en cada escritura.
+        target = int(self.budget_bytes * 0.9)
+        rows = conn.execute("SELECT rowid, nbytes FROM thumbs ORDER BY last_used ASC")
+        doomed: list[tuple[int]] = []
+        for rowid, nbytes in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self._total_bytes -= nbytes
+        conn.executemany("DELETE FROM thumbs WHERE rowid = ?", doomed)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except sqlite3.Error:
+                    LOGGER.debug("No se pudo cerrar la caché de miniaturas", exc_info=True)
+            self._conn = None
+            self._disabled = True
+
+
+def load_thumbnail(
+    path: Path,
+    thumb_size: int,
+    store: ThumbnailStore | None = None,
+    root: str = "",
+    rel: str = "",
+    decode: DecodeFn = decode_image,
+) -> tuple[Image.Image | None, str | None, tuple[int, int] | None]:
+    # Devuelve (miniatura, error, sello). El sello solo se informa cuando la
+    # miniatura se decodificó de nuevo y conviene escribirla en la caché.
+    stamp = _file_stamp(path) if store is not None else None
+    if store is not None and stamp is not None:
+        stored = store.get(root, rel, thumb_size, stamp)
+        if stored is not None:
+            return stored, None, None
+    frame, err = _decode_image_for_thumb(path, thumb_size, decode)
+    return frame, err, stamp if frame is not None else None
+
+
+# (dHash de 64 bits, píxeles de la imagen original, tamaño del archivo en bytes)
+Signature = tuple[int, int, int]
+
+
+def dhash(frame: Image.Image) -> int:
+    gray = frame.convert("L").resize((9, 8), Image.Resampling.BOX)
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(8):
+        base = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[base + col] > pixels[base + col + 1])
+    return value
+
+
+def perceptual_signature(path: Path) -> Signature | None:
+    stamp = _file_stamp(path)
+    if stamp is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            pixels = img.width * img.height
+            orientation = _exif_orientation(img)
+            # Solo luminancia y a escala DCT mínima cuando el formato lo permite.
+            img.draft("L", (64, 64))
+            frame = img.convert("L")
+    except Exception:
+        LOGGER.debug("No se pudo calcular la huella de %s", path, exc_info=True)
+        return None
+    method = _ORIENTATION_TRANSPOSE.get(orientation)
+    if method is not None:
+        frame = frame.transpose(method)
+    return dhash(frame), pixels, stamp[0]
+
+
+def signatures_for(paths: list[Path], cancelled: Callable[[], bool] | None = None) -> list[Signature | None]:
+    results: list[Signature | None] = []
+    for path in paths:
+        if cancelled is not None and cancelled():
+            results.extend([None] * (len(paths) - len(results)))
+            break
+        results.append(perceptual_signature(path))
+    return results
+
+
+def _popcount64(values: "np.ndarray") -> "np.ndarray":
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1)
+
+
+def _similar_pairs_numpy(
+    hashes: list[int],
+    bounds: list[tuple[int, int]],
+    max_distance: int,
+    union: Callable[[int, int], None],
+) -> None:
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    block = 1024
+    for lo, hi in bounds:
+        keys = (values >> np.uint64(lo)) & np.uint64((1 << (hi - lo)) - 1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if end - start < 2:
+                continue
+            members = order[start:end]
+            member_values = values[members]
+            # Por bloques de filas para acotar la memoria en cubos muy grandes.
+            for offset in range(0, len(members), block):
+                rows = members[offset : offset + block]
+                distances = _popcount64(member_values[offset : offset + block, None] ^ member_values[None, :])
+                row_idx, col_idx = np.nonzero(distances <= max_distance)
+                for a, b in zip(rows[row_idx].tolist(), members[col_idx].tolist()):
+                    if a < b:
+                        union(a, b)
+
+
+def _similar_pairs_python(
+    hashes: list[int],
+    bounds: list[tuple[int, int]],
+    max_distance: int,
+    union: Callable[[int, int], None],
+) -> None:
+    for lo, hi in bounds:
+        mask = (1 << (hi - lo)) - 1
+        buckets: dict[int, list[int]] = {}
+        for idx, value in enumerate(hashes):
+            buckets.setdefault((value >> lo) & mask, []).append(idx)
+        for members in buckets.values():
+            for pos, a in enumerate(members):
+                for b in members[pos + 1 :]:
+                    if (hashes[a] ^ hashes[b]).bit_count() <= max_distance:
+                        union(a, b)
+
+
+def find_similar_groups(hashes: list[int], max_distance: int = SIMILAR_MAX_DISTANCE) -> list[list[int]]:
+    # Principio del palomar: si dos huellas difieren en <= d bits, al partir
+    # los 64 bits en d + 1 tramos al menos uno coincide exactamente. Solo se
+    # comparan huellas que comparten algún tramo.
+    parent = list(range(len(hashes)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(a: int, b: int) -> None:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    chunks = max(1, min(64, max_distance + 1))
+    bounds = [(64 * c // chunks, 64 * (c + 1) // chunks) for c in range(chunks)]
+    if np is not None:
+        _similar_pairs_numpy(hashes, bounds, max_distance, union)
+    else:
+        _similar_pairs_python(hashes, bounds, max_distance, union)
+
+    groups: dict[int, list[int]] = {}
+    for idx in range(len(hashes)):
+        groups.setdefault(find(idx), []).append(idx)
+    return [members for _root, members in sorted(groups.items()) if len(members) > 1]
+
+
+def choose_keeper(signatures: list[Signature]) -> int:
+    # La mejor copia es la de más resolución y, a igualdad, la más pesada.
+    return max(range(len(signatures)), key=lambda i: (signatures[i][1], signatures[i][2]))
+
+
+def partial_file_hash(path: Path) -> tuple[int, str] | None:
+    # Primeros y últimos 64 KB. El tamaño sale del archivo abierto: el del índice puede ser viejo.
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with path.open("rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            digest.update(handle.read(PARTIAL_HASH_BYTES))
+            if size > 2 * PARTIAL_HASH_BYTES:
+                handle.seek(size - PARTIAL_HASH_BYTES)
+            digest.update(handle.read(PARTIAL_HASH_BYTES))
+    except OSError:
+        LOGGER.debug("No se pudo leer %s para el hash parcial", path, exc_info=True)
+        return None
+    return size, digest.hexdigest()
+
+
+def full_file_hash(path: Path) -> str | None:
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with path.open("rb") as handle:
+            for block in iter(lambda: handle.read(1024 * 1024), b""):
+                digest.update(block)
+    except OSError:
+        LOGGER.debug("No se pudo leer %s para el hash completo", path, exc_info=True)
+        return None
+    return digest.hexdigest()
+
+
+def _bucket_members(pairs: Iterator[tuple[Hashable, Path]]) -> list[list[Path]]:
+    buckets: dict[Hashable, list[Path]] = {}
+    for key, path in pairs:
+        buckets.setdefault(key, []).append(path)
+    return [members for members in buckets.values() if len(members) > 1]
+
+
+def find_exact_duplicates(
+    files: list[tuple[Path, int]],
+    max_workers: int = EXACT_HASH_WORKERS,
+    cancelled: Callable[[], bool] | None = None,
+) -> list[list[Path]]:
+    def _is_cancelled() -> bool:
+        return cancelled is not None and cancelled()
+
+    # Etapa 1: el tamaño sale gratis de los datos del escaneo.
+    sizes = {path: size for path, size in files if size > 0}
+    candidates = [
+        path for group in _bucket_members((size, path) for path, size in sizes.items()) for path in group
+    ]
+
+    def _partial(path: Path) -> tuple[int, str] | None:
+        return None if _is_cancelled() else partial_file_hash(path)
+
+    def _full(path: Path) -> str | None:
+        return None if _is_cancelled() else full_file_hash(path)
+
+    # max_workers limita las lecturas simultáneas, que en un NAS importan más que la CPU.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="exact-hash") as pool:
+        # Etapa 2: primeros y últimos 64 KB de cada candidato.
+        partials = dict(zip(candidates, pool.map(_partial, candidates)))
+        partial_groups = _bucket_members(
+            (partial, path) for path, partial in partials.items() if partial is not None
+        )
+        # Si el hash parcial ya cubrió el archivo entero (según su tamaño real) no hace falta releerlo.
+        confirmed = [group for group in partial_groups if partials[group[0]][0] <= 2 * PARTIAL_HASH_BYTES]
+        pending = [group for group in partial_groups if partials[group[0]][0] > 2 * PARTIAL_HASH_BYTES]
+        # Etapa 3: hash completo solo cuando los parciales coinciden.
+        to_hash = [path for group in pending for path in group]
+        full = dict(zip(to_hash, pool.map(_full, to_hash)))
+        for group in pending:
+            confirmed.extend(
+                _bucket_members((full[path], path) for path in group if full.get(path) is not None)
+            )
+    if _is_cancelled():
+        return []
+    LOGGER.info(
+        "Duplicados exactos: %d archivos, %d candidatos por tamaño, %d con hash completo, %d grupos",
+        len(files),
+        len(candidates),
+        len(to_hash),
+        len(confirmed),
+    )
+    return sorted((sorted(group) for group in confirmed), key=lambda group: group[0])
+
+
+def quality_score(metrics: QualityMetrics) -> float:
+    # 0 = peor, 1 = mejor. La nitidez va en escala logarítmica y la exposición
+    # penaliza la fracción recortada: con media imagen quemada o negra vale 0.
+    sharpness, dark, bright = metrics
+    sharp = min(1.0, math.log1p(max(0.0, sharpness)) / math.log1p(QUALITY_SHARP_REFERENCE))
+    exposure = 1.0 - min(1.0, 2.0 * max(dark, bright))
+    return sharp * exposure
+
+
+def quality_order(paths: list[Path], scores: dict[Path, float]) -> list[Path]:
+    # Peores primero; lo que no tiene puntuación (videos, errores) queda al final
+    # en su orden original.
+    return sorted(paths, key=lambda path: (path not in scores, scores.get(path, 0.0)))
+
+
+def sharpest_index(paths: list[Path]) -> int:
+    best, best_value = 0, -1.0
+    for pos, path in enumerate(paths):
+        metrics = quality_metrics(path)
+        if metrics is not None and metrics[0] > best_value:
+            best, best_value = pos, metrics[0]
+    return best
+
+
+# (instante de captura EXIF en segundos, dHash); cualquiera puede faltar.
+BurstSignature = tuple[float | None, int | None]
+
+
+def _capture_time(img: Image.Image) -> float | None:
+    try:
+        exif = img.getexif().get_ifd(ExifTags.IFD.Exif)
+    except Exception:
+        return None
+    # DateTimeOriginal, o DateTimeDigitized si la cámara no escribe el primero.
+    raw = exif.get(0x9003) or exif.get(0x9004)
+    if not isinstance(raw, str):
+        return None
+    try:
+        taken = datetime.strptime(raw.strip("\x00 ")[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    seconds = (taken - datetime(1970, 1, 1)).total_seconds()
+    # Las ráfagas escriben varias fotos por segundo: sin SubSecTimeOriginal todas empatan.
+    subsec = exif.get(0x9291)
+    if isinstance(subsec, str) and subsec.strip("\x00 ").isdigit():
+        seconds += float("0." + subsec.strip("\x00 "))
+    return seconds
+
+
+def burst_signature(path: Path) -> BurstSignature:
+    try:
+        with Image.open(path) as img:
+            taken = _capture_time(img)
+            orientation = _exif_orientation(img)
+            img.draft("L", (64, 64))
+            frame = img.convert("L")
+    except Exception:
+        LOGGER.debug("No se pudo leer la firma de ráfaga de %s", path, exc_info=True)
+        return None, None
+    method = _ORIENTATION_TRANSPOSE.get(orientation)
+    if method is not None:
+        frame = frame.transpose(method)
+    return taken, dhash(frame)
+
+
+def burst_signatures(paths: list[Path]) -> list[BurstSignature]:
+    return [(None, None) if path.suffix.lower() in VIDEO_EXTS else burst_signature(path) for path in paths]
+
+
+class BurstGrouper:
+    # Se alimenta en el orden de revisión. Una foto continúa la ráfaga abierta
+    # si se tomó a pocos segundos de la anterior y su dHash apenas difiere.
+    def __init__(
+        self,
+        max_gap: float = BURST_MAX_GAP_SECONDS,
+        max_distance: int = BURST_MAX_DISTANCE,
+    ) -> None:
+        self.max_gap = max_gap
+        self.max_distance = max_distance
+        self._run: list[Path] = []
+        self._last: BurstSignature = (None, None)
+
+    def _continues(self, signature: BurstSignature) -> bool:
+        prev_time, prev_hash = self._last
+        taken, value = signature
+        if None in (prev_time, prev_hash, taken, value):
+            return False
+        if abs(taken - prev_time) > self.max_gap:  # type: ignore[operator]
+            return False
+        return (prev_hash ^ value).bit_count() <= self.max_distance  # type: ignore[operator]
+
+    def _close(self) -> list[Path] | None:
+        run = self._run
+        self._run = []
+        return run if len(run) > 1 else None
+
+    def feed(self, path: Path, signature: BurstSignature) -> list[Path] | None:
+        # Devuelve la ráfaga que queda cerrada por esta foto, si la había.
+        closed = None if self._continues(signature) else self._close()
+        self._run.append(path)
+        self._last = signature
+        return closed
+
+    def finish(self) -> list[Path] | None:
+        self._last = (None, None)
+        return self._close()
+
+
+class QualityStore:
+    # Invalidadas por tamaño y mtime, como las miniaturas.
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._disabled = False
+
+    def _connection(self) -> sqlite3.Connection | None:
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                " root TEXT NOT NULL,"
+                " rel TEXT NOT NULL,"
+                " file_size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " sharpness REAL NOT NULL,"
+                " dark REAL NOT NULL,"
+                " bright REAL NOT NULL,"
+                " PRIMARY KEY (root, rel))"
+            )
+            conn.commit()
+        except Exception:
+            LOGGER.exception("No se pudo abrir la caché de calidad %s", self.db_path)
+            self._disabled = True
+            return None
+        self._conn = conn
+        return conn
+
+    def get_many(self, root: str, stamps: dict[str, tuple[int, int]]) -> dict[str, QualityMetrics]:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return {}
+            try:
+                rows = conn.execute(
+                    "SELECT rel, file_size, mtime_ns, sharpness, dark, bright FROM scores WHERE root = ?",
+                    (root,),
+                ).fetchall()
+            except sqlite3.Error:
+                LOGGER.debug("Error leyendo puntuaciones de %s", root, exc_info=True)
+                return {}
+        found: dict[str, QualityMetrics] = {}
+        for rel, file_size, mtime_ns, sharpness, dark, bright in rows:
+            if stamps.get(rel) == (file_size, mtime_ns):
+                found[rel] = (sharpness, dark, bright)
+        return found
+
+    def put_many(self, root: str, rows: list[tuple[str, tuple[int, int], QualityMetrics]]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO scores"
+                    " (root, rel, file_size, mtime_ns, sharpness, dark, bright)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(root, rel, stamp[0], stamp[1], *metrics) for rel, stamp, metrics in rows],
+                )
+                conn.commit()
+            except sqlite3.Error:
+                LOGGER.debug("Error guardando puntuaciones de %s", root, exc_info=True)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except sqlite3.Error:
+                    LOGGER.debug("No se pudo cerrar la caché de calidad", exc_info=True)
+            self._conn = None
+            self._disabled = True
+
+
+@dataclass
+class Action:
+    kind: str  # "keep" | "delete"
+    src: Path
+    was_kept: bool
+    was_deleted: bool
+    index_before: int
+
+
+@dataclass
+class StripedPhoto:
+    size: tuple[int, int]
+    stripes: list[tuple[int, ImageTk.PhotoImage]]
+
+    @property
+    def nbytes(self) -> int:
+        # Tk guarda las fotos como RGBA.
+        return self.size[0] * self.size[1] * 4
+
+
+@dataclass
+class StripSlot:
+    image: int
+    video: int
+    badge: int
+    badge_text: int
+    path: Path | None = None
+    photo: object = None
+    state: str = ""
+
+
+@dataclass
+class ReviewTile:
+    # index = -1 si la casilla está libre.
+    frame: ctk.CTkFrame
+    var: tk.BooleanVar
+    preview: ctk.CTkLabel
+    name: ctk.CTkLabel
+    rel: ctk.CTkLabel
+    item: int
+    index: int = -1
+
+
+class App(ctk.CTk):
+    def __init__(self) -> None:
+        super().__init__()
+        self.title("Trash Image Eraser")
+        self.geometry("1100x750")
+        self.minsize(800, 550)
+        self._icon_image: ImageTk.PhotoImage | None = None
+        icon_path = _resolve_icon_path()
+        if icon_path:
+            try:
+                self.iconbitmap(default=str(icon_path))
+            except Exception:
+                LOGGER.debug("No se pudo aplicar iconbitmap desde %s", icon_path, exc_info=True)
+            try:
+                with Image.open(icon_path) as icon_file:
+                    self._icon_image = ImageTk.PhotoImage(icon_file.copy())
+                self.iconphoto(True, self._icon_image)
+            except Exception:
+                LOGGER.debug("No se pudo aplicar iconphoto desde %s", icon_path, exc_info=True)
+
+        self.folder: Path | None = None
+        self.images: list[Path] = []
+        self.index: int = 0
+
+        self._photo: StripedPhoto | None = None
+        self._history: list[Action] = []
+        self._review_window: tk.Toplevel | None = None
+        self._review_selection: dict[str, bool] = {}
+        self._group_window: tk.Toplevel | None = None
+        self._similar_job: dict | None = None
+        self._duplicate_job: Future | None = None
+        self._file_stats: dict[Path, tuple[int, int]] = {}
+        self._quality_job: dict | None = None
+        self._quality_pool: ProcessPoolExecutor | None = None
+        self._quality_sorted = False
+        self._name_order: list[Path] = []
+        self._burst_job: dict | None = None
+        self._bursts: list[list[Path]] = []
+        self._burst_keepers: list[int] = []
+        self._burst_of: dict[Path, int] = {}
+        self._thumb_cache: LRUCache[tuple[Path, int], ImageTk.PhotoImage] = LRUCache(
+            _env_int("TRASH_IMAGE_ERASER_THUMB_MEMORY_MB", THUMB_CACHE_BUDGET_MB, minimum=1) * 1024 * 1024
+        )
+        self._thumb_waiters: dict[tuple[Path, int], list[Callable[[ImageTk.PhotoImage], None]]] = {}
+        self._thumb_wanted: dict[tuple[Path, int], list[tuple[Callable[[], bool], Callable | None]]] = {}
+        self._thumb_placeholder = ImageTk.PhotoImage(Image.new("RGB", (64, 64), "#333333"))
+        self._review_thumb_placeholder = ImageTk.PhotoImage(Image.new("RGB", (150, 150), "#333333"))
+        self._thumb_pending: set[tuple[Path, int]] = set()
+        display_budget = _env_int("TRASH_IMAGE_ERASER_DISPLAY_CACHE_MB", DISPLAY_CACHE_BUDGET_MB, minimum=1) * 1024 * 1024
+        photo_budget = int(display_budget * PHOTO_CACHE_SHARE)
+        self._display_cache: LRUCache[tuple[Path, int, int], Image.Image] = LRUCache(
+            display_budget - photo_budget,
+            sizeof=image_nbytes,
+        )
+        self._photo_cache: LRUCache[tuple[Path, int, int], StripedPhoto] = LRUCache(
+            photo_budget,
+            sizeof=lambda photo: photo.nbytes,
+        )
+        # (clave, fotograma, franjas ya convertidas) pendientes de convertir en ratos ociosos.
+        self._photo_builds: deque[tuple[tuple[Path, int, int], Image.Image, list[tuple[int, ImageTk.PhotoImage]]]] = deque()
+        self._photo_build_job: str | None = None
+        self._photo_wanted: set[tuple[Path, int, int]] = set()
+        # Maestros a tamaño de pantalla de la imagen actual y vecinas, con su caja de decodificación.
+        self._master_cache: LRUCache[Path, tuple[Image.Image, tuple[int, int]]] = LRUCache(
+            max(1, _env_int("TRASH_IMAGE_ERASER_MASTER_CACHE_MB", MASTER_CACHE_BUDGET_MB, minimum=0)) * 1024 * 1024,
+            sizeof=lambda entry: image_nbytes(entry[0]),
+        )
+        self._master_pending: set[Path] = set()
+        self._masters_enabled = _env_int("TRASH_IMAGE_ERASER_MASTER_CACHE_MB", MASTER_CACHE_BUDGET_MB, minimum=0) > 0
+        self._display_loading_token = 0
+        self._display_final_token = 0
+        self._media_generation = 0
+        self._scan_generation = 0
+        self._scan_in_progress = False
+        self._scan_pending_start: tuple[str, int | Path] | None = None
+        self._scan_saved_index = 0
+        self._resize_job: str | None = None
+        self._resize_quick_job: str | None = None
+        self._show_job: str | None = None
+        self._strip_render_job: str | None = None
+        self._strip_slots: list[StripSlot] = []
+        self._strip_layout: tuple[int, int] | None = None
+        self._strip_cursor: int | None = None
+        self._strip_slot_of: dict[Path, StripSlot] = {}
+        self._current_image_path: Path | None = None
+        self._prefetch_ahead = _env_int("TRASH_IMAGE_ERASER_PREFETCH", PREFETCH_AHEAD_DEFAULT)
+        self._prefetch_behind = _env_int("TRASH_IMAGE_ERASER_PREFETCH_BEHIND", PREFETCH_BEHIND_DEFAULT)
+        self._prefetch_generation = 0
+        self._prefetch_queue: list[Path] = []
+        self._prefetch_size = (1, 1)
+        self._prefetch_inflight: dict[tuple[Path, int, int], Future] = {}
+        self._nav_direction = 1
+        self._nav_last_at: float | None = None
+        self._nav_interval: float | None = None
+        self._decode_seconds = 0.15
+        self._latency = LatencyTracker()
+        self._nav_started: float | None = None
+        self._scan_started = 0.0
+        self._scan_first_batch = False
+        self._overlay: tk.Label | None = None
+        self._overlay_job: str | None = None
+        self._latency_dump_job: str | None = None
+        self._latency_dump_seconds = _env_int("TRASH_IMAGE_ERASER_LATENCY_DUMP_SECONDS", LATENCY_DUMP_SECONDS)
+        decode_mode = os.environ.get("TRASH_IMAGE_ERASER_DECODE_BACKEND", "auto").strip().lower()
+        cpu_count = os.cpu_count() or 2
+        if decode_mode not in {"thread", "process"}:
+            decode_mode = "process" if cpu_count >= 4 else "thread"
+        self._decoder = DecodeBackend(
+            decode_mode,
+            _env_int(
+                "TRASH_IMAGE_ERASER_DECODE_WORKERS",
+                max(2, cpu_count - 1) if decode_mode == "process" else 2,
+                minimum=1,
+            ),
+        )
+        LOGGER.info("Decodificación con %s (%d workers)", self._decoder.mode, self._decoder.workers)
+        self._read_ahead_files = _env_int("TRASH_IMAGE_ERASER_READ_AHEAD", READ_AHEAD_FILES_DEFAULT)
+        self._read_ahead: ReadAhead | None = None
+        if self._read_ahead_files > 0:
+            self._read_ahead = ReadAhead(
+                _env_int("TRASH_IMAGE_ERASER_READ_AHEAD_MB", READ_AHEAD_BUDGET_MB, minimum=1) * 1024 * 1024,
+                _env_int("TRASH_IMAGE_ERASER_READ_AHEAD_INFLIGHT", READ_AHEAD_INFLIGHT_DEFAULT, minimum=1),
+                self._latency,
+            )
+        self._scan_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="media-scan")
+        self._mover = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mover")
+        self._move_generation = 0
+        self._move_cancel: threading.Event | None = None
+        self._move_moved: list[str] = []
+        self._move_failed: list[str] = []
+        # Archivos desmarcados (K, deshacer...) durante el movimiento; el hilo los salta.
+        self._move_unmarked: set[str] = set()
+        self._move_lock = threading.Lock()
+        self._move_window: ctk.CTkToplevel | None = None
+        self._move_progress: ctk.CTkProgressBar | None = None
+        self._move_text = tk.StringVar(value="")
+        self._analysis_worker = ThreadPoolExecutor(
+            max_workers=max(2, min(4, os.cpu_count() or 2)),
+            thread_name_prefix="media-analysis",
+        )
+        self._thumb_store = ThumbnailStore(
+            _app_state_dir() / THUMB_STORE_FILENAME,
+            _env_int("TRASH_IMAGE_ERASER_THUMB_CACHE_MB", THUMB_STORE_BUDGET_MB, minimum=1) * 1024 * 1024,
+        )
+        self._thumb_store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumb-store")
+        self._quality_store = QualityStore(_app_state_dir() / QUALITY_STORE_FILENAME)
+        self._kept_set: set[str] = set()
+        self._deleted_set: set[str] = set()
+        self._state_save_job: str | None = None
+        self._state_dirty = False
+        self._journal: StateJournal | None = None
+        self._journal_events: list[dict] = []
+        self._journal_index = 0
+        # Cambios masivos (depuración, movimientos) se guardan como instantánea.
+        self._state_compact = False
+        self._is_closing = False
+        self._video_available = False
+        self._vlc_instance = None
+        self._vlc_player = None
+        self._vlc_event_manager = None
+        self._vlc_events: queue.SimpleQueue[tuple[str, int]] = queue.SimpleQueue()
+        self._vlc_event_job: str | None = None
+        self._video_path: Path | None = None
+        self._video_update_job: str | None = None
+        self._video_session = 0
+        self._seeking = False
+        self._duration_ms = 0
+        self._progress_var = tk.DoubleVar(value=0.0)
+        self._volume_var = tk.IntVar(value=70)
+        self._time_var = tk.StringVar(value="00:00 / 00:00")
+
+        if vlc is not None:
+            try:
+                plugin_path = _prepare_vlc_environment()
+                args = []
+                if plugin_path:
+                    args.append(f"--plugin-path={plugin_path}")
+                self._vlc_instance = vlc.Instance(args)
+                self._vlc_player = self._vlc_instance.media_player_new()
+                self._vlc_event_manager = self._vlc_player.event_manager()
+                self._vlc_event_manager.event_attach(
+                    vlc.EventType.MediaPlayerEndReached, self._on_vlc_end
+                )
+                self._video_available = True
+            except Exception:
+                LOGGER.exception("No se pudo inicializar VLC")
+                self._vlc_instance = None
+                self._vlc_player = None
+                self._vlc_event_manager = None
+
+        self._build_ui()
+        self._bind_keys()
+        if os.environ.get("TRASH_IMAGE_ERASER_DEBUG_OVERLAY") == "1":
+            self.toggle_debug_overlay()
+        if self._latency_dump_seconds > 0:
+            self._latency_dump_job = self.after(self._latency_dump_seconds * 1000, self._dump_latency)
+        if self._video_available:
+            self._start_vlc_event_poller()
+
+    # ---------------- UI ----------------
+    def _build_ui(self) -> None:
+        ctk.set_appearance_mode("dark")
+        ctk.set_default_color_theme("dark-blue")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        top = ctk.CTkFrame(self)
+        top.grid(row=0, column=0, sticky="ew", padx=12, pady=(10, 5))
+        top.grid_columnconfigure(0, weight=1)
+
+        self.folder_var = tk.StringVar(value="(Selecciona una carpeta)")
+        ctk.CTkLabel(top, textvariable=self.folder_var, anchor="w").grid(row=0, column=0, sticky="ew", padx=(0, 8))
+        ctk.CTkButton(top, text="Elegir archivo o carpeta...", command=self.choose_folder).grid(row=0, column=1, padx=4)
+        ctk.CTkButton(top, text="Reanudar", command=self.resume_if_possible).grid(row=0, column=2, padx=4)
+        ctk.CTkButton(top, text="Reiniciar", command=self.reset_state).grid(row=0, column=3, padx=4)
+        ctk.CTkButton(top, text="Borrar marcadas ahora", command=self._flush_deleted_items).grid(row=0, column=4, padx=4)
+        ctk.CTkButton(top, text="Similares", command=self.find_similar_images).grid(row=0, column=5, padx=4)
+        ctk.CTkButton(top, text="Duplicados", command=self.find_duplicate_files).grid(row=0, column=6, padx=4)
+        self.quality_button = ctk.CTkButton(top, text="Peores primero", command=self.toggle_quality_order)
+        self.quality_button.grid(row=0, column=7, padx=4)
+        ctk.CTkButton(top, text="Ráfagas", command=self.review_bursts).grid(row=0, column=8, padx=4)
+        ctk.CTkButton(top, text="Acerca de", command=self._show_about).grid(row=0, column=9, padx=4)
+
+        mid = ctk.CTkFrame(self)
+        mid.grid(row=1, column=0, sticky="nsew", padx=12, pady=(0, 10))
+        mid.grid_rowconfigure(1, weight=1)
+        mid.grid_columnconfigure(0, weight=1)
+
+        strip_frame = ctk.CTkFrame(mid, fg_color="#1a1a1a")
+        strip_frame.grid(row=0, column=0, sticky="ew", pady=(0, 8))
+        strip_frame.grid_columnconfigure(0, weight=1)
+
+        self.strip_canvas = tk.Canvas(strip_frame, height=90, bg="#1a1a1a", highlightthickness=0)
+        self.strip_canvas.grid(row=0, column=0, sticky="ew")
+
+        self.canvas = tk.Canvas(mid, bg="#111111", highlightthickness=0)
+        self.canvas.grid(row=1, column=0, sticky="nsew")
+
+        self.video_controls = ctk.CTkFrame(mid)
+        self.video_controls.grid(row=2, column=0, sticky="ew", pady=(8, 0))
+        self.video_controls.grid_columnconfigure(2, weight=1)
+
+        self.play_pause_text = tk.StringVar(value="Play")
+        self.play_pause_btn = ctk.CTkButton(
+            self.video_controls,
+            textvariable=self.play_pause_text,
+            command=self.toggle_play_pause,
+            state="normal",
+        )
+        self.play_pause_btn.grid(row=0, column=0, padx=(8, 0))
+
+        ctk.CTkLabel(self.video_controls, textvariable=self._time_var).grid(row=0, column=1, padx=(8, 8))
+
+        self.progress_scale = ctk.CTkSlider(
+            self.video_controls,
+            from_=0,
+            to=1,
+            command=self._on_seek_change,
+            variable=self._progress_var,
+        )
+        self.progress_scale.grid(row=0, column=2, sticky="ew")
+        self.progress_scale.bind("<ButtonPress-1>", self._on_seek_start)
+        self.progress_scale.bind("<ButtonRelease-1>", self._on_seek_end)
+
+        ctk.CTkLabel(self.video_controls, text="Vol").grid(row=0, column=3, padx=(8, 0))
+        self.volume_scale = ctk.CTkSlider(
+            self.video_controls,
+            from_=0,
+            to=100,
+            command=self._on_volume_change,
+            variable=self._volume_var,
+        )
+        self.volume_scale.grid(row=0, column=4, sticky="ew", padx=(4, 8))
+        self.video_controls.grid_columnconfigure(4, weight=0)
+        self.video_controls.grid_remove()
+
+        bottom = ctk.CTkFrame(self)
+        bottom.grid(row=3, column=0, sticky="ew", padx=12, pady=(0, 10))
+        bottom.grid_columnconfigure(0, weight=1)
+
+        self.status_var = tk.StringVar(value="Listo.")
+        ctk.CTkLabel(bottom, textvariable=self.status_var, anchor="w").grid(row=0, column=0, sticky="ew")
+        hints = "Teclas: [D] marcar para borrar | [K] conservar | [U] deshacer | [Esc] salir"
+        ctk.CTkLabel(bottom, text=hints, anchor="e").grid(row=0, column=1, sticky="e")
+
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        self.strip_canvas.bind("<Configure>", lambda _e: self._schedule_strip_render())
+
+    def _bind_keys(self) -> None:
+        self.bind("<Escape>", lambda _e: self._on_close())
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        self.bind("d", lambda _e: self.delete_current())
+        self.bind("D", lambda _e: self.delete_current())
+        self.bind("<Delete>", lambda _e: self.delete_current())
+
+        self.bind("k", lambda _e: self.keep_current())
+        self.bind("K", lambda _e: self.keep_current())
+        self.bind("<space>", lambda _e: self.keep_current())
+
+        self.bind("u", lambda _e: self.undo())
+        self.bind("U", lambda _e: self.undo())
+
+        self.bind("b", lambda _e: self.review_current_burst())
+        self.bind("B", lambda _e: self.review_current_burst())
+
+        self.bind("<F12>", lambda _e: self.toggle_debug_overlay())
+
+        self.bind("<Left>", lambda _e: self.prev_image())
+        self.bind("<Right>", lambda _e: self.next_image())
+
+    # ------------- State / files -------------
+    def _state_path(self) -> Path | None:
+        if not self.folder:
+            return None
+        return self.folder / STATE_FILENAME
+
+    def _deleted_dir(self) -> Path | None:
+        if not self.folder:
+            return None
+        return self.folder / DELETED_DIRNAME
+
+    def _load_state(self) -> dict:
+        if not self.folder:
+            return {"index": 0, "kept": [], "deleted": []}
+        if self._journal is None or self._journal.folder != self.folder:
+            self._journal = StateJournal(self.folder)
+            self._journal_events = []
+        return self._journal.load()
+
+    def _state_index(self) -> int:
+        # Mientras el escaneo no ha alcanzado la imagen guardada se conserva su índice.
+        index = self._scan_saved_index if self._scan_pending_start is not None else self.index
+        if self._quality_sorted and self.images and self._scan_pending_start is None:
+            # El índice guardado siempre se refiere al orden por nombre.
+            index = bisect.bisect_left(self._name_order, self.images[self.index])
+        return index
+
+    def _state_payload(self) -> dict:
+        return {
+            "index": self._state_index(),
+            "kept": sorted(self._kept_set),
+            "deleted": sorted(self._deleted_set),
+        }
+
+    def _apply_state(self, state: dict) -> None:
+        self._kept_set = set(state.get("kept", []))
+        self._deleted_set = set(state.get("deleted", []))
+        self._state_compact = True
+
+    def _set_mark(self, rel: str, kept: bool, deleted: bool) -> None:
+        # Toda marca individual pasa por aquí para quedar anotada en el diario.
+        if kept:
+            self._kept_set.add(rel)
+        else:
+            self._kept_set.discard(rel)
+        if deleted:
+            self._deleted_set.add(rel)
+        else:
+            self._deleted_set.discard(rel)
+        if kept and deleted:
+            self._state_compact = True
+        op = "keep" if kept else ("delete" if deleted else "unmark")
+        self._journal_events.append({"op": op, "rel": rel})
+        if self._move_cancel is not None:
+            with self._move_lock:
+                if deleted:
+                    self._move_unmarked.discard(rel)
+                else:
+                    self._move_unmarked.add(rel)
+
+    def _flush_state_to_disk(self) -> None:
+        self._state_save_job = None
+        if not self._state_dirty:
+            return
+        if not self.folder or self._journal is None:
+            return
+        index = self._state_index()
+        try:
+            if self._state_compact or self._journal.needs_compaction:
+                self._journal.compact(self._state_payload())
+                self._state_compact = False
+            else:
+                events = self._journal_events
+                if index != self._journal_index:
+                    events = events + [{"op": "index", "value": index}]
+                self._journal.append(events)
+            self._journal_events = []
+            self._journal_index = index
+            self._state_dirty = False
+        except Exception:
+            LOGGER.exception("No se pudo guardar el estado en %s", self._state_path())
+
+    def _schedule_state_save(self, immediate: bool = False) -> None:
+        self._state_dirty = True
+        if immediate:
+            # Al cerrar o cambiar de carpeta se deja una instantánea limpia.
+            self._state_compact = True
+            if self._state_save_job is not None:
+                try:
+                    self.after_cancel(self._state_save_job)
+                except Exception:
+                    LOGGER.debug("No se pudo cancelar _state_save_job", exc_info=True)
+                self._state_save_job = None
+            self._flush_state_to_disk()
+            return
+        if self._state_save_job is not None:
+            return
+        self._state_save_job = self.after(220, self._flush_state_to_disk)
+
+    def _save_state(self) -> None:
+        self._schedule_state_save()
+
+    # ------------- Folder / scanning -------------
+    def choose_folder(self) -> None:
+        filetypes = [
+            ("Todos", "*.*"),
+            (
+                "Media",
+                "*.jpg;*.jpeg;*.png;*.heic;*.webp;*.gif;*.bmp;*.tif;*.tiff;*.mp4;*.mov;*.mkv;*.avi",
+            ),
+        ]
+        file_path = filedialog.askopenfilename(
+            title="Selecciona un archivo dentro de la carpeta",
+            filetypes=filetypes,
+        )
+        if file_path:
+            self.open_folder(Path(file_path).parent, start_path=Path(file_path))
+            return
+        folder = filedialog.askdirectory(title="Selecciona una carpeta")
+        if not folder:
+            return
+        self.open_folder(Path(folder))
+
+    def open_folder(self, folder: Path, start_path: Path | None = None) -> None:
+        if self.folder and self.folder != folder:
+            self._schedule_state_save(immediate=True)
+        self._close_review_window()
+        self._close_group_window()
+        self._similar_job = None
+        self._duplicate_job = None
+        self._file_stats = {}
+        self._cancel_quality_job()
+        self._cancel_move()
+        self._quality_sorted = False
+        self._name_order = []
+        self.quality_button.configure(text="Peores primero")
+        self._burst_job = None
+        self._bursts = []
+        self._burst_keepers = []
+        self._burst_of = {}
+        self.folder = folder
+        self.folder_var.set(str(folder))
+        self._history.clear()
+        self._thumb_cache.clear()
+        self._thumb_waiters.clear()
+        self._thumb_wanted.clear()
+        self._thumb_pending.clear()
+        self._display_cache.clear()
+        self._photo_cache.clear()
+        self._photo_builds.clear()
+        self._master_cache.clear()
+        self._master_pending.clear()
+        self._cancel_prefetch()
+        self._prefetch_inflight.clear()
+        self._display_loading_token += 1
+        self._media_generation += 1
+        self._decoder.cancel_pending()
+        if self._read_ahead is not None:
+            self._read_ahead.schedule([])
+        self._scan_generation += 1
+        current_scan = self._scan_generation
+        self._stop_video()
+
+        deleted_dir = self._deleted_dir()
+        if deleted_dir:
+            deleted_dir.mkdir(parents=True, exist_ok=True)
+
+        self.images = []
+        self.index = 0
+        # El estado guardado se aplica ya para que las marcas se vean mientras
+        # avanza el escaneo; se depura contra los archivos reales al terminar.
+        initial_state = coerce_state_payload(self._load_state())
+        self._apply_state(initial_state)
+        self._journal_index = initial_state["index"]
+        self._scan_saved_index = initial_state["index"]
+        if has_state_progress(initial_state):
+            self._scan_pending_start = ("index", initial_state["index"])
+        elif start_path is not None:
+            self._scan_pending_start = ("path", start_path)
+        else:
+            self._scan_pending_start = ("index", 0)
+        self._scan_in_progress = True
+        self._scan_started = time.perf_counter()
+        self._scan_first_batch = False
+        self._clear_strip()
+        self._clear_canvas("Escaneando medios...")
+        self.status_var.set("Escaneando carpeta...")
+
+        future = self._scan_worker.submit(self._stream_scan, current_scan, folder)
+
+        def _apply_scan() -> None:
+            if self._is_closing or current_scan != self._scan_generation:
+                return
+            if self.folder != folder:
+                return
+            try:
+                future.result()
+            except Exception:
+                LOGGER.exception("Error escaneando carpeta %s", folder)
+                if not self.images:
+                    self._scan_in_progress = False
+                    self.folder_var.set(str(folder))
+                    self.status_var.set("No se pudo escanear la carpeta seleccionada.")
+                    self._clear_canvas("Error al escanear")
+                    self._clear_strip()
+                    return
+            self._latency.since("scan.total", self._scan_started)
+            self._finalize_open_folder(folder, sorted(self.images), start_path)
+            self._start_burst_grouping()
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, _apply_scan)
+            except Exception:
+                LOGGER.debug("No se pudo despachar el resultado del escaneo", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+
+    def _stream_scan(self, scan_id: int, folder: Path) -> None:
+        index_path = folder / INDEX_FILENAME
+        started = time.perf_counter()
+        previous = DirectoryIndex.load(index_path, MEDIA_EXTS, DELETED_DIRNAME)
+        index = DirectoryIndex(MEDIA_EXTS, DELETED_DIRNAME)
+        batches = iter_media_batches(folder, MEDIA_EXTS, DELETED_DIRNAME, previous=previous, index=index)
+        for batch in batches:
+            if self._is_closing or scan_id != self._scan_generation:
+                return
+            self.after(0, self._apply_scan_batch, scan_id, folder, batch)
+        self.after(0, self._apply_scan_stats, scan_id, folder, index.file_stats(folder))
+        index.save(index_path)
+        LOGGER.info(
+            "Escaneo de %s en %.2f s: %d directorios reutilizados del índice, %d listados",
+            folder,
+            time.perf_counter() - started,
+            index.reused_dirs,
+            index.listed_dirs,
+        )
+
+    def _apply_scan_stats(self, scan_id: int, folder: Path, stats: dict[Path, tuple[int, int]]) -> None:
+        if self._is_closing or scan_id != self._scan_generation or self.folder != folder:
+            return
+        self._file_stats = stats
+
+    def _apply_scan_batch(self, scan_id: int, folder: Path, batch: list[Path]) -> None:
+        if self._is_closing or scan_id != self._scan_generation or self.folder != folder:
+            return
+        if not self._scan_first_batch:
+            self._scan_first_batch = True
+            self._latency.since("scan.first_batch", self._scan_started)
+        applied = time.perf_counter()
+        self._apply_scan_batch_items(folder, batch)
+        self._latency.since("scan.batch_apply", applied)
+
+    def _apply_scan_batch_items(self, folder: Path, batch: list[Path]) -> None:
+        offset = len(self.images)
+        self.images.extend(batch)
+        self.folder_var.set(f"{folder} (escaneando... {len(self.images)} archivos)")
+        pending = self._scan_pending_start
+        if pending is None:
+            self._schedule_strip_render()
+            return
+        kind, target = pending
+        found: int | None = None
+        if kind == "index":
+            if len(self.images) > int(target):
+                found = int(target)
+        else:
+            for pos, path in enumerate(batch):
+                if path == target:
+                    found = offset + pos
+                    break
+        if found is None:
+            self.status_var.set(f"Escaneando carpeta... {len(self.images)} archivos encontrados.")
+            return
+        self._scan_pending_start = None
+        self.index = found
+        self._schedule_show_current()
+
+    def _finalize_open_folder(
+        self,
+        folder: Path,
+        media_files: list[Path],
+        start_path: Path | None,
+    ) -> None:
+        if self._is_closing or self.folder != folder:
+            return
+
+        self._scan_in_progress = False
+        self.folder_var.set(str(folder))
+        pending = self._scan_pending_start
+        self._scan_pending_start = None
+        current = self.images[self.index] if self.images and pending is None else None
+        ordered_changed = media_files != self.images
+        self.images = media_files
+        if not self.images:
+            self.index = 0
+            self._kept_set.clear()
+            self._deleted_set.clear()
+            self._state_compact = True
+            self.status_var.set("No encontré archivos compatibles en esa carpeta.")
+            self._clear_canvas("Sin medios")
+            self._clear_strip()
+            return
+
+        if pending is None:
+            # Ya se está mostrando una imagen: se conserva aunque el orden final
+            # se haya corregido, y solo se depuran las marcas.
+            if ordered_changed and current is not None:
+                try:
+                    self.index = self.images.index(current)
+                except ValueError:
+                    self.index = min(self.index, len(self.images) - 1)
+            state = sanitize_state_payload(self._state_payload(), self.images, folder)
+            self._apply_state(state)
+            if ordered_changed:
+                self._schedule_show_current()
+            else:
+                self._schedule_strip_render()
+            return
+
+        self._scan_pending_start = pending
+        state = sanitize_state_payload(self._state_payload(), self.images, folder)
+        self._scan_pending_start = None
+        self._apply_state(state)
+        self.index = resolve_initial_index(self.images, state, start_path)
+        resumed = has_state_progress(state)
+
+        if resumed:
+            self.status_var.set(
+                f"{len(self.images)} archivos encontrados. Reanudado automáticamente en {self.index + 1}/{len(self.images)}."
+            )
+        elif start_path:
+            self.status_var.set(
+                f"{len(self.images)} archivos encontrados. Empezando desde el seleccionado."
+            )
+        else:
+            self.status_var.set(
+                f"{len(self.images)} archivos encontrados. Empezando desde el primero."
+            )
+        self._schedule_show_current()
+
+    def resume_if_possible(self) -> None:
+        if not self.folder:
+            messagebox.showinfo("Reanudar", "Primero elige una carpeta.")
+            return
+        if not self.images:
+            messagebox.showinfo("Reanudar", "No hay medios cargados todavía.")
+            return
+        state = sanitize_state_payload(self._load_state(), self.images, self.folder)
+        if not has_state_progress(state):
+            messagebox.showinfo("Reanudar", "No hay progreso guardado para esta carpeta.")
+            return
+        self._apply_state(state)
+        saved_index = _safe_int(state.get("index", 0), 0)
+        saved_index = max(0, min(saved_index, max(0, len(self.images) - 1)))
+        if self._quality_sorted and self._name_order:
+            # El índice guardado se refiere al orden por nombre (ver _state_index).
+            saved_path = self._name_order[min(saved_index, len(self._name_order) - 1)]
+            try:
+                saved_index = self.images.index(saved_path)
+            except ValueError:
+                saved_index = 0
+        self.index = saved_index
+        self.status_var.set(f"Reanudado en {self.index + 1}/{len(self.images)}.")
+        self._schedule_show_current()
+
+    def reset_state(self) -> None:
+        if not self.folder:
+            return
+        if not messagebox.askyesno("Reiniciar", "¿Reiniciar el progreso guardado para esta carpeta?"):
+            return
+        self._close_review_window()
+        if self._journal is not None:
+            try:
+                self._journal.reset()
+            except Exception:
+                LOGGER.exception("No se pudo borrar estado %s", self._state_path())
+        self.index = 0
+        self._history.clear()
+        self._kept_set.clear()
+        self._deleted_set.clear()
+        if self._state_save_job is not None:
+            try:
+                self.after_cancel(self._state_save_job)
+            except Exception:
+                LOGGER.debug("No se pudo cancelar _state_save_job en reset", exc_info=True)
+            self._state_save_job = None
+        self._state_dirty = False
+        self._journal_events = []
+        self._journal_index = 0
+        self._state_compact = False
+        self.status_var.set("Progreso reiniciado.")
+        self._schedule_show_current()
+
+    # ------------- Navigation -------------
+    def next_image(self) -> None:
+        if not self.images or self._scan_pending_start is not None:
+            return
+        if self.index < len(self.images) - 1:
+            self.index += 1
+            self._note_navigation(1)
+            self._save_state()
+            self._schedule_show_current()
+        elif self._scan_in_progress:
+            self.status_var.set(f"Escaneando carpeta... {len(self.images)} archivos encontrados por ahora.")
+        else:
+            self._open_delete_review()
+
+    def prev_image(self) -> None:
+        if not self.images or self._scan_pending_start is not None:
+            return
+        if self.index > 0:
+            self.index -= 1
+            self._note_navigation(-1)
+            self._save_state()
+            self._schedule_show_current()
+
+    def _note_navigation(self, direction: int) -> None:
+        now = time.monotonic()
+        if direction != self._nav_direction:
+            self._nav_interval = None
+        elif self._nav_last_at is not None:
+            interval = now - self._nav_last_at
+            # Pausas largas no describen el ritmo de revisión.
+            if interval < 5.0:
+                if self._nav_interval is None:
+                    self._nav_interval = interval
+                else:
+                    self._nav_interval = self._nav_interval * 0.7 + interval * 0.3
+        self._nav_direction = direction
+        self._nav_last_at = now
+        self._nav_started = time.perf_counter()
+        # El fotograma visible tiene prioridad: lo encolado para prefetch se descarta.
+        self._cancel_prefetch()
+
+    # ------------- Actions -------------
+    def keep_current(self) -> None:
+        current = self._current_path()
+        if not current:
+            return
+        rel = self._rel(current)
+        was_kept = rel in self._kept_set
+        was_deleted = rel in self._deleted_set
+        self._set_mark(rel, kept=True, deleted=False)
+        self._history.append(
+            Action(
+                kind="keep",
+                src=current,
+                was_kept=was_kept,
+                was_deleted=was_deleted,
+                index_before=self.index,
+            )
+        )
+        self._save_state()
+        self.status_var.set(f"Marcada para conservar: {current.name}")
+        self.next_image()
+
+    def delete_current(self) -> None:
+        current = self._current_path()
+        if not current:
+            return
+        rel = self._rel(current)
+        was_kept = rel in self._kept_set
+        was_deleted = rel in self._deleted_set
+        self._set_mark(rel, kept=False, deleted=True)
+        self._history.append(
+            Action(
+                kind="delete",
+                src=current,
+                was_kept=was_kept,
+                was_deleted=was_deleted,
+                index_before=self.index,
+            )
+        )
+        self._save_state()
+        self.status_var.set(f"Marcada para borrar: {current.name}")
+        self.next_image()
+
+    def undo(self) -> None:
+        if not self._history:
+            return
+        last = self._history.pop()
+        self._set_mark(self._rel(last.src), kept=last.was_kept, deleted=last.was_deleted)
+
+        self.index = max(0, min(last.index_before, max(0, len(self.images) - 1)))
+        self._save_state()
+        self.status_var.set(f"Deshecho: {last.kind}.")
+        self._schedule_show_current()
+
+    # ------------- Rendering -------------
+    def _current_path(self) -> Path | None:
+        if not self.images or self._scan_pending_start is not None:
+            return None
+        self.index = max(0, min(self.index, len(self.images) - 1))
+        return self.images[self.index]
+
+    def _schedule_show_current(self, delay_ms: int = 0) -> None:
+        if self._show_job is not None:
+            try:
+                self.after_cancel(self._show_job)
+            except Exception:
+                LOGGER.debug("No se pudo cancelar _show_job", exc_info=True)
+            self._show_job = None
+        self._show_job = self.after(delay_ms, self._run_show_current)
+
+    def _run_show_current(self) -> None:
+        self._show_job = None
+        self._show_current()
+
+    def _show_current(self) -> None:
+        if self._nav_started is not None:
+            self._latency.since("nav.schedule", self._nav_started)
+        p = self._current_path()
+        if not p:
+            self._current_image_path = None
+            self._clear_canvas("Sin imágenes")
+            self._clear_strip()
+            return
+        self._display_loading_token += 1
+        if self._is_video(p):
+            self._current_image_path = None
+            if self._video_available:
+                self._clear_canvas()
+                self._play_video(p)
+            else:
+                self._stop_video()
+                self._clear_canvas(self._video_message(p) + "\nVideo no disponible. Instala VLC y python-vlc.")
+                self._show_video_controls(False)
+            self._render_strip()
+            self.status_var.set(self._position_label(p, "Video: "))
+            return
+        self._stop_video()
+        self._current_image_path = p
+        self._request_image_frame(p, token=self._display_loading_token)
+        self._render_strip()
+        self.status_var.set(self._position_label(p) + " (cargando...)")
+
+    def _position_label(self, path: Path, prefix: str = "") -> str:
+        label = f"{self.index + 1}/{len(self.images)} — {prefix}{path.name}"
+        burst = self._burst_of.get(path)
+        if burst is not None:
+            label += f" — ráfaga de {len(self._bursts[burst])} fotos, [B] para revisarla"
+        return label
+
+    def _redraw_current(self) -> None:
+        self._resize_job = None
+        if self._current_image_path is None:
+            return
+        self._display_loading_token += 1
+        self._request_image_frame(self._current_image_path, token=self._display_loading_token, show_loading=False)
+
+    def _quick_resize(self) -> None:
+        # Al soltar, _redraw_current pinta la versión LANCZOS.
+        self._resize_quick_job = None
+        path = self._current_image_path
+        if path is None or self._is_closing:
+            return
+        entry = self._master_cache.get(path)
+        if entry is None:
+            return
+        max_w = max(1, int(self.canvas.winfo_width()))
+        max_h = max(1, int(self.canvas.winfo_height()))
+        started = time.perf_counter()
+        frame = fit_frame(entry[0], (max_w - 20, max_h - 20), Image.Resampling.BILINEAR)
+        self._latency.since("resize.quick", started)
+        self._draw_image(frame, stage="resize")
+
+    def _on_canvas_configure(self, _event: tk.Event) -> None:
+        if self._is_closing:
+            return
+        if self._video_path is not None:
+            self._set_video_output()
+            return
+        if self._resize_job is not None:
+            try:
+                self.after_cancel(self._resize_job)
+            except Exception:
+                LOGGER.debug("No se pudo cancelar _resize_job", exc_info=True)
+        self._cancel_prefetch()
+        self._request_master()
+        if self._resize_quick_job is None:
+            self._resize_quick_job = self.after(30, self._quick_resize)
+        self._resize_job = self.after(120, self._redraw_current)
+
+    def _master_box(self, max_w: int, max_h: int) -> tuple[int, int]:
+        return (max(self.winfo_screenwidth(), max_w) - 20, max(self.winfo_screenheight(), max_h) - 20)
+
+    def _request_master(self) -> None:
+        path = self._current_image_path
+        if not self._masters_enabled or path is None or path in self._master_cache or path in self._master_pending:
+            return
+        max_w = max(1, int(self.canvas.winfo_width()))
+        max_h = max(1, int(self.canvas.winfo_height()))
+        master_box = self._master_box(max_w, max_h)
+        generation = self._media_generation
+        self._master_pending.add(path)
+        future = self._decoder.submit(
+            timed_call, self._latency, "master", time.perf_counter(),
+            self._decoder.decode, path, master_box,
+            priority=PRIORITY_VIEW,
+            stale=lambda: self._is_closing or generation != self._media_generation,
+        )
+
+        def _apply() -> None:
+            self._master_pending.discard(path)
+            if self._is_closing or generation != self._media_generation or future.cancelled():
+                return
+            try:
+                master, _err, _strategy = future.result()
+            except Exception:
+                LOGGER.debug("Error decodificando el maestro de %s", path, exc_info=True)
+                return
+            self._store_master(path, master, master_box)
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, _apply)
+            except Exception:
+                LOGGER.debug("No se pudo despachar el maestro", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+
+    def _usable_master(self, path: Path, max_w: int, max_h: int) -> Image.Image | None:
+        entry = self._master_cache.get(path)
+        if entry is None:
+            return None
+        master, master_box = entry
+        # Un maestro decodificado para una caja menor que la actual se vería borroso.
+        if master_box[0] < max_w - 20 or master_box[1] < max_h - 20:
+            return None
+        return master
+
+    def _store_master(self, path: Path, master: Image.Image | None, master_box: tuple[int, int]) -> None:
+        if master is not None and self._masters_enabled:
+            self._master_cache.put(path, (master, master_box))
+
+    def _display_cache_key(self, path: Path, max_w: int, max_h: int) -> tuple[Path, int, int]:
+        return (path, max(1, max_w // 80), max(1, max_h // 80))
+
+    def _cache_display_image(self, key: tuple[Path, int, int], frame: Image.Image) -> None:
+        self._display_cache.put(key, frame)
+
+    def _draw_image(
+        self,
+        frame: Image.Image,
+        stage: str = "view",
+        key: tuple[Path, int, int] | None = None,
+    ) -> None:
+        started = time.perf_counter()
+        photo = StripedPhoto(frame.size, [(0, ImageTk.PhotoImage(frame))])
+        self._latency.record(f"{stage}.photo", time.perf_counter() - started)
+        if key is not None:
+            self._photo_cache.put(key, photo)
+        self._draw_photo(photo, stage)
+
+    def _draw_photo(self, photo: StripedPhoto, stage: str = "view") -> None:
+        cw = max(1, int(self.canvas.winfo_width()))
+        ch = max(1, int(self.canvas.winfo_height()))
+        drawn = time.perf_counter()
+        self._photo = photo
+        self.canvas.delete("all")
+        x = cw // 2 - photo.size[0] // 2
+        y = ch // 2 - photo.size[1] // 2
+        for offset, stripe in photo.stripes:
+            self.canvas.create_image(x, y + offset, image=stripe, anchor="nw")
+        self._latency.since(f"{stage}.draw", drawn)
+        # Tk repinta en la cola de tareas ociosas: este callback corre justo después.
+        self.after_idle(self._note_painted, stage, drawn)
+
+    def _queue_photo_build(self, key: tuple[Path, int, int], frame: Image.Image) -> None:
+        if key in self._photo_cache or any(build[0] == key for build in self._photo_builds):
+            return
+        self._photo_builds.append((key, frame, []))
+        if self._photo_build_job is None:
+            self._photo_build_job = self.after_idle(self._photo_build_step)
+
+    def _photo_build_step(self) -> None:
+        # Una franja por vuelta ociosa: entre una y otra Tk atiende teclas y repintados.
+        self._photo_build_job = None
+        if self._is_closing:
+            return
+        while self._photo_builds:
+            key, frame, stripes = self._photo_builds[0]
+            if key in self._photo_wanted and key not in self._photo_cache:
+                break
+            self._photo_builds.popleft()
+        else:
+            return
+        started = time.perf_counter()
+        top = len(stripes) * PHOTO_STRIPE_ROWS
+        bottom = min(frame.height, top + PHOTO_STRIPE_ROWS)
+        stripes.append((top, ImageTk.PhotoImage(frame.crop((0, top, frame.width, bottom)))))
+        self._latency.since("photo.stripe", started)
+        if bottom >= frame.height:
+            self._photo_builds.popleft()
+            self._photo_cache.put(key, StripedPhoto(frame.size, stripes))
+        if self._photo_builds:
+            self._photo_build_job = self.after_idle(self._photo_build_step)
+
+    def _note_painted(self, stage: str, drawn: float) -> None:
+        self._latency.since(f"{stage}.paint", drawn)
+        if stage == "view" and self._nav_started is not None:
+            self._latency.since("nav.total", self._nav_started)
+            self._nav_started = None
+
+    def _request_image_frame(self, path: Path, token: int, show_loading: bool = True) -> None:
+        max_w = max(1, int(self.canvas.winfo_width()))
+        max_h = max(1, int(self.canvas.winfo_height()))
+        cache_key = self._display_cache_key(path, max_w, max_h)
+        photo = self._photo_cache.get(cache_key)
+        if photo is not None:
+            self._latency.record("view.photo_hit", 0.0)
+            self._draw_photo(photo)
+            self.status_var.set(self._position_label(path))
+            self._schedule_prefetch()
+            return
+        cached = self._display_cache.get(cache_key)
+        if cached is not None:
+            self._latency.record("view.cache_hit", 0.0)
+            self._draw_image(cached, key=cache_key)
+            self.status_var.set(self._position_label(path))
+            self._schedule_prefetch()
+            return
+
+        # Si el prefetch ya está decodificando esta imagen se reutiliza su resultado.
+        future = self._prefetch_inflight.get(cache_key)
+        if future is not None and (future.cancelled() or not (future.running() or future.done())):
+            future = None
+        adopted = future is not None
+        if show_loading and future is None:
+            self._clear_canvas("Cargando...")
+            self._request_preview_frame(path, token, max_w, max_h)
+
+        started: float | None = None
+        if future is None:
+            master = self._usable_master(path, max_w, max_h)
+            if master is not None:
+                fn, args = _view_from_master, (master, max_w, max_h)
+            else:
+                fn, args = _decode_image_for_view, (path, max_w, max_h, self._decode_read_ahead)
+            submitted = time.perf_counter()
+            # Solo las decodificaciones reales alimentan la estimación del prefetch.
+            started = submitted if master is None else None
+            future = self._decoder.submit(
+                timed_call, self._latency, "view", submitted, fn, *args,
+                priority=PRIORITY_VIEW,
+                stale=lambda: token != self._display_loading_token,
+            )
+        elif show_loading:
+            self._clear_canvas("Cargando...")
+        done_at = [0.0]
+
+        def _apply() -> None:
+            if self._is_closing or token != self._display_loading_token:
+                return
+            superseded = future.cancelled() or (future.exception() is None and future.result()[1] == "cancelado")
+            if adopted and superseded:
+                # El prefetch adoptado se canceló: no es un error del archivo, se pide de nuevo.
+                if self._prefetch_inflight.get(cache_key) is future:
+                    del self._prefetch_inflight[cache_key]
+                self._request_image_frame(path, token)
+                return
+            if future.cancelled():
+                return
+            self._latency.since("view.dispatch", done_at[0])
+            try:
+                frame, err = future.result()
+            except Exception as exc:
+                LOGGER.exception("Error cargando imagen %s", path)
+                frame, err = None, str(exc)
+            self._display_final_token = token
+            if frame is None:
+                self.status_var.set(f"No pude abrir {path.name}: {err or 'error'}")
+                self._clear_canvas("Error")
+                return
+            if started is not None:
+                self._record_decode_time(time.perf_counter() - started)
+            self._cache_display_image(cache_key, frame)
+            self._draw_image(frame, key=cache_key)
+            if self._current_image_path == path:
+                self.status_var.set(self._position_label(path))
+            self._schedule_prefetch()
+
+        def _dispatch(_fut: object) -> None:
+            done_at[0] = time.perf_counter()
+            try:
+                self.after(0, _apply)
+            except Exception:
+                LOGGER.debug("No se pudo despachar render de imagen", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+
+    def _decode_read_ahead(
+        self,
+        path: Path,
+        box: tuple[int, int],
+    ) -> tuple[Image.Image | None, str | None, str]:
+        data = self._read_ahead.take(path) if self._read_ahead is not None else None
+        return self._decoder.decode(path, box, data)
+
+    def _schedule_read_ahead(self) -> None:
+        if self._read_ahead is None or not self.images:
+            return
+        # Sin la imagen actual, que ya se lee del disco, ni lo que ya está en caché.
+        max_w = max(1, int(self.canvas.winfo_width()))
+        max_h = max(1, int(self.canvas.winfo_height()))
+        order = prefetch_order(
+            self.index, len(self.images), self._nav_direction, self._read_ahead_files, self._prefetch_behind
+        )
+        paths = [
+            path
+            for path in (self.images[i] for i in order)
+            if not self._is_video(path)
+            and path not in self._master_cache
+            and self._display_cache_key(path, max_w, max_h) not in self._display_cache
+        ]
+        self._read_ahead.schedule(paths)
+
+    def _record_decode_time(self, seconds: float) -> None:
+        self._decode_seconds = self._decode_seconds * 0.8 + seconds * 0.2
+
+    def _cancel_prefetch(self) -> None:
+        self._prefetch_generation += 1
+        self._prefetch_queue.clear()
+
+    def _schedule_prefetch(self) -> None:
+        self._cancel_prefetch()
+        if self._is_closing:
+            return
+        self._schedule_read_ahead()
+        if not self.images or self._prefetch_ahead <= 0:
+            return
+        max_w = max(1, int(self.canvas.winfo_width()))
+        max_h = max(1, int(self.canvas.winfo_height()))
+        ahead = prefetch_window(self._prefetch_ahead, self._decode_seconds, self._nav_interval)
+        self._photo_wanted = set()
+        for i in prefetch_order(self.index, len(self.images), self._nav_direction, ahead, self._prefetch_behind):
+            path = self.images[i]
+            if self._is_video(path):
+                continue
+            key = self._display_cache_key(path, max_w, max_h)
+            self._photo_wanted.add(key)
+            frame = self._display_cache.get(key)
+            if frame is not None:
+                self._queue_photo_build(key, frame)
+                continue
+            if key in self._prefetch_inflight:
+                continue
+            self._prefetch_queue.append(path)
+        self._prefetch_size = (max_w, max_h)
+        self._prefetch_next()
+
+    def _prefetch_next(self) -> None:
+        # Un único trabajo de prefetch en vuelo deja libre el resto del pool
+        # para el fotograma visible y las miniaturas.
+        if self._is_closing or self._prefetch_inflight:
+            return
+        max_w, max_h = self._prefetch_size
+        while self._prefetch_queue:
+            path = self._prefetch_queue.pop(0)
+            key = self._display_cache_key(path, max_w, max_h)
+            if key in self._display_cache:
+                continue
+            generation = self._media_generation
+            prefetch_generation = self._prefetch_generation
+            started = time.perf_counter()
+            future = self._decoder.submit(
+                timed_call, self._latency, "prefetch", started,
+                _decode_image_for_view, path, max_w, max_h, self._decode_read_ahead,
+                priority=PRIORITY_PREFETCH,
+                stale=lambda: self._is_closing or prefetch_generation != self._prefetch_generation,
+            )
+            self._prefetch_inflight[key] = future
+
+            def _apply(key: tuple[Path, int, int] = key, future: Future = future) -> None:
+                self._prefetch_inflight.pop(key, None)
+                if self._is_closing or generation != self._media_generation:
+                    return
+                if future.cancelled():
+                    self._prefetch_next()
+                    return
+                try:
+                    frame, _err = future.result()
+                except Exception:
+                    LOGGER.debug("Error en prefetch de %s", key[0], exc_info=True)
+                    frame = None
+                if frame is not None:
+                    self._record_decode_time(time.perf_counter() - started)
+                    self._cache_display_image(key, frame)
+                    self._queue_photo_build(key, frame)
+                self._prefetch_next()
+
+            def _dispatch(_fut: object, apply: Callable[[], None] = _apply) -> None:
+                try:
+                    self.after(0, apply)
+                except Exception:
+                    LOGGER.debug("No se pudo despachar prefetch", exc_info=True)
+
+            future.add_done_callback(_dispatch)
+            return
+
+    def _request_preview_frame(self, path: Path, token: int, max_w: int, max_h: int) -> None:
+        # Primera fase: la vista previa embebida se pinta en cuanto llega, salvo
+        # que el fotograma definitivo del mismo token ya esté en pantalla.
+        future = self._decoder.submit(
+            extract_embedded_preview, path, (max_w - 20, max_h - 20),
+            priority=PRIORITY_VIEW,
+            stale=lambda: token != self._display_loading_token,
+        )
+
+        def _apply() -> None:
+            if self._is_closing or token != self._display_loading_token:
+                return
+            if self._display_final_token == token or future.cancelled():
+                return
+            try:
+                preview = future.result()
+            except Exception:
+                LOGGER.debug("Error cargando vista previa de %s", path, exc_info=True)
+                return
+            if preview is None:
+                return
+            self._draw_image(preview, stage="preview")
+            if self._current_image_path == path:
+                self.status_var.set(self._position_label(path) + " (vista previa)")
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, _apply)
+            except Exception:
+                LOGGER.debug("No se pudo despachar vista previa", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+
+    def _clear_canvas(self, text: str | None = None) -> None:
+        self._photo = None
+        self.canvas.delete("all")
+        cw = max(1, int(self.canvas.winfo_width()))
+        ch = max(1, int(self.canvas.winfo_height()))
+        if text:
+            self.canvas.create_text(
+                cw // 2,
+                ch // 2,
+                text=text,
+                fill="white",
+                font=("Segoe UI", 16),
+                justify="center",
+            )
+
+    # ------------- Helpers -------------
+    def _rel(self, path: Path) -> str:
+        if not self.folder:
+            return str(path)
+        return _safe_relative(path, self.folder)
+
+    def _is_video(self, path: Path) -> bool:
+        return path.suffix.lower() in VIDEO_EXTS
+
+    def _video_message(self, path: Path) -> str:
+        try:
+            size = self._format_size(path.stat().st_size)
+        except Exception:
+            LOGGER.debug("No se pudo leer tamano de %s", path, exc_info=True)
+            size = "?"
+        return f"Video: {path.name}\nTamano: {size}"
+
+    def _format_size(self, bytes_size: int) -> str:
+        units = ["B", "KB", "MB", "GB", "TB"]
+        value = float(bytes_size)
+        for unit in units:
+            if value < 1024 or unit == units[-1]:
+                return f"{value:.2f} {unit}"
+            value /= 1024
+        return f"{value:.2f} TB"
+
+    def _format_time_ms(self, ms: int) -> str:
+        if ms < 0:
+            ms = 0
+        seconds = int(ms // 1000)
+        mins = seconds // 60
+        secs = seconds % 60
+        return f"{mins:02d}:{secs:02d}"
+
+    def _show_video_controls(self, show: bool) -> None:
+        if show:
+            if not self.video_controls.winfo_ismapped():
+                self.video_controls.grid()
+        else:
+            if self.video_controls.winfo_ismapped():
+                self.video_controls.grid_remove()
+
+    def _set_video_output(self) -> None:
+        if not self._vlc_player:
+            return
+        try:
+            self.update_idletasks()
+            handle = self.canvas.winfo_id()
+            if sys.platform.startswith("win"):
+                self._vlc_player.set_hwnd(handle)
+            elif sys.platform == "darwin":
+                self._vlc_player.set_nsobject(handle)
+            else:
+                self._vlc_player.set_xwindow(handle)
+        except Exception:
+            LOGGER.debug("No se pudo asignar salida de video VLC", exc_info=True)
+
+    def _start_vlc_event_poller(self) -> None:
+        if self._vlc_event_job is not None or self._is_closing:
+            return
+        self._vlc_event_job = self.after(120, self._process_vlc_events)
+
+    def _cancel_vlc_event_poller(self) -> None:
+        if self._vlc_event_job is None:
+            return
+        try:
+            self.after_cancel(self._vlc_event_job)
+        except Exception:
+            LOGGER.debug("No se pudo cancelar poller de VLC", exc_info=True)
+        self._vlc_event_job = None
+
+    def _process_vlc_events(self) -> None:
+        self._vlc_event_job = None
+        if self._is_closing:
+            return
+        while True:
+            try:
+                event_name, session_id = self._vlc_events.get_nowait()
+            except queue.Empty:
+                break
+            if event_name == "end":
+                self._restart_video_if_current(session_id)
+        self._start_vlc_event_poller()
+
+    def _on_vlc_end(self, _event) -> None:
+        try:
+            self._vlc_events.put(("end", self._video_session))
+        except Exception:
+            LOGGER.exception("No se pudo registrar evento de fin de video")
+
+    def _restart_video_if_current(self, session_id: int) -> None:
+        if self._is_closing or not self._vlc_player or self._video_path is None:
+            return
+        if session_id != self._video_session:
+            return
+        try:
+            self._vlc_player.set_time(0)
+            self._vlc_player.play()
+            self.play_pause_text.set("Pausa")
+            self._start_video_updates(self._video_session)
+        except Exception:
+            LOGGER.exception("No se pudo reiniciar video")
+
+    def _play_video(self, path: Path) -> None:
+        if not self._vlc_player or not self._vlc_instance:
+            return
+        if self._video_path and self._video_path == path:
+            if not self._vlc_player.is_playing():
+                self._vlc_player.play()
+            self.play_pause_text.set("Pausa")
+            self._show_video_controls(True)
+            self._start_video_updates(self._video_session)
+            return
+        self._stop_video()
+        self._video_session += 1
+        self._video_path = path
+        media = self._vlc_instance.media_new(str(path))
+        self._vlc_player.set_media(media)
+        self._set_video_output()
+        self._vlc_player.play()
+        self.play_pause_text.set("Pausa")
+        self._show_video_controls(True)
+        self._set_volume(self._volume_var.get())
+        self._start_video_updates(self._video_session)
+
+    def _stop_video(self) -> None:
+        self._video_session += 1
+        if self._vlc_player:
+            try:
+                self._vlc_player.stop()
+            except Exception:
+                LOGGER.debug("No se pudo detener VLC", exc_info=True)
+        self._video_path = None
+        self._duration_ms = 0
+        self._progress_var.set(0.0)
+        self._time_var.set("00:00 / 00:00")
+        self._show_video_controls(False)
+        self._cancel_video_updates()
+
+    def _start_video_updates(self, session_id: int) -> None:
+        self._cancel_video_updates()
+        self._video_update_job = self.after(200, lambda: self._update_video_ui(session_id))
+
+    def _cancel_video_updates(self) -> None:
+        if self._video_update_job is not None:
+            try:
+                self.after_cancel(self._video_update_job)
+            except Exception:
+                LOGGER.debug("No se pudo cancelar _video_update_job", exc_info=True)
+        self._video_update_job = None
+
+    def _update_video_ui(self, session_id: int) -> None:
+        if (
+            not self._vlc_player
+            or self._video_path is None
+            or self._is_closing
+            or session_id != self._video_session
+        ):
+            return
+        try:
+            length = self._vlc_player.get_length()
+            current = self._vlc_player.get_time()
+        except Exception:
+            LOGGER.debug("No se pudo leer estado de reproduccion VLC", exc_info=True)
+            return
+        if length > 0:
+            if length != self._duration_ms:
+                self._duration_ms = length
+                self.progress_scale.configure(to=max(1, length / 1000))
+            if not self._seeking:
+                self._progress_var.set(current / 1000)
+            self._time_var.set(
+                f"{self._format_time_ms(current)} / {self._format_time_ms(length)}"
+            )
+        self._video_update_job = self.after(200, lambda: self._update_video_ui(session_id))
+
+    def _on_seek_start(self, _event: tk.Event) -> None:
+        self._seeking = True
+
+    def _on_seek_end(self, _event: tk.Event) -> None:
+        if self._vlc_player:
+            target = int(self._progress_var.get() * 1000)
+            try:
+                self._vlc_player.set_time(target)
+            except Exception:
+                LOGGER.debug("No se pudo ajustar seek de VLC", exc_info=True)
+        self._seeking = False
+
+    def _on_seek_change(self, value: str) -> None:
+        if not self._seeking:
+            return
+        try:
+            current_ms = int(float(value) * 1000)
+        except Exception:
+            return
+        if self._duration_ms:
+            self._time_var.set(
+                f"{self._format_time_ms(current_ms)} / {self._format_time_ms(self._duration_ms)}"
+            )
+
+    def _set_volume(self, value: int) -> None:
+        if self._vlc_player:
+            try:
+                self._vlc_player.audio_set_volume(int(value))
+            except Exception:
+                LOGGER.debug("No se pudo ajustar volumen VLC", exc_info=True)
+
+    def _on_volume_change(self, value: str) -> None:
+        try:
+            vol = int(float(value))
+        except Exception:
+            return
+        self._set_volume(vol)
+
+    def toggle_play_pause(self) -> None:
+        if not self._vlc_player:
+            return
+        if self._vlc_player.is_playing():
+            self._vlc_player.pause()
+            self.play_pause_text.set("Play")
+        else:
+            self._vlc_player.play()
+            self.play_pause_text.set("Pausa")
+
+    def _request_thumb(
+        self,
+        path: Path,
+        thumb_size: int,
+        on_ready: Callable[[ImageTk.PhotoImage], None] | None = None,
+        priority: int = PRIORITY_REVIEW,
+        wanted: Callable[[], bool] | None = None,
+    ) -> None:
+        # Si ningún `wanted` sigue siendo cierto, la carga se descarta antes de empezar.
+        key = (path, thumb_size)
+        cached = self._thumb_cache.get(key)
+        if cached is not None:
+            if on_ready:
+                on_ready(cached)
+            return
+
+        if self._is_video(path):
+            if on_ready:
+                on_ready(self._thumb_placeholder if thumb_size <= 64 else self._review_thumb_placeholder)
+            return
+
+        if on_ready:
+            self._thumb_waiters.setdefault(key, []).append(on_ready)
+        wanted_list = self._thumb_wanted.setdefault(key, [])
+        wanted_list.append((wanted or (lambda: True), on_ready))
+        if key in self._thumb_pending:
+            return
+
+        generation = self._media_generation
+        self._thumb_pending.add(key)
+        root = str(self.folder) if self.folder else ""
+        rel = self._rel(path)
+
+        def _stale() -> bool:
+            return generation != self._media_generation or not any(check() for check, _cb in list(wanted_list))
+
+        future = self._decoder.submit(
+            timed_call, self._latency, "thumb", time.perf_counter(),
+            load_thumbnail, path, thumb_size, self._thumb_store, root, rel, self._decoder.decode,
+            priority=priority,
+            stale=_stale,
+        )
+
+        def _apply() -> None:
+            self._thumb_pending.discard(key)
+            if self._thumb_wanted.get(key) is wanted_list:
+                self._thumb_wanted.pop(key, None)
+            if self._is_closing or generation != self._media_generation:
+                self._thumb_waiters.pop(key, None)
+                return
+            if future.cancelled():
+                self._thumb_waiters.pop(key, None)
+                # Quien la pidió después de descartarla la vuelve a encolar.
+                for check, callback in wanted_list:
+                    if check():
+                        self._request_thumb(path, thumb_size, on_ready=callback, priority=priority, wanted=check)
+                return
+            try:
+                frame, _err, stamp = future.result()
+            except Exception:
+                LOGGER.exception("Error creando miniatura de %s", path)
+                frame, stamp = None, None
+            if frame is not None and stamp is not None:
+                self._persist_thumb(root, rel, thumb_size, stamp, frame)
+            if frame is None:
+                self._thumb_waiters.pop(key, None)
+                return
+            converted = time.perf_counter()
+            photo = ImageTk.PhotoImage(frame)
+            self._latency.since("thumb.photo", converted)
+            self._thumb_cache.put(key, photo, image_nbytes(frame))
+            callbacks = self._thumb_waiters.pop(key, [])
+            for callback in callbacks:
+                try:
+                    callback(photo)
+                except Exception:
+                    LOGGER.debug("Error aplicando callback de miniatura", exc_info=True)
+            if thumb_size == STRIP_THUMB_SIZE:
+                self._update_strip_thumb(path, photo)
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, _apply)
+            except Exception:
+                LOGGER.debug("No se pudo despachar miniatura", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+
+    def _persist_thumb(
+        self,
+        root: str,
+        rel: str,
+        thumb_size: int,
+        stamp: tuple[int, int],
+        frame: Image.Image,
+    ) -> None:
+        try:
+            self._thumb_store_writer.submit(self._thumb_store.put, root, rel, thumb_size, stamp, frame)
+        except RuntimeError:
+            LOGGER.debug("Escritor de miniaturas cerrado; se descarta %s", rel, exc_info=True)
+
+    def _schedule_strip_render(self) -> None:
+        if self._is_closing:
+            return
+        if self._strip_render_job is not None:
+            return
+        self._strip_render_job = self.after(30, self._run_strip_render)
+
+    def _run_strip_render(self) -> None:
+        self._strip_render_job = None
+        self._render_strip()
+
+    def _clear_strip(self) -> None:
+        self.strip_canvas.delete("all")
+        self._strip_slots = []
+        self._strip_layout = None
+        self._strip_cursor = None
+        self._strip_slot_of = {}
+
+    def _build_strip_slots(self, columns: int, y: int) -> None:
+        self._clear_strip()
+        canvas = self.strip_canvas
+        x = STRIP_PAD // 2
+        for _ in range(columns):
+            self._strip_slots.append(
+                StripSlot(
+                    image=canvas.create_image(x, y, anchor="nw", state="hidden"),
+                    video=canvas.create_text(
+                        x + STRIP_THUMB_SIZE // 2,
+                        y + STRIP_THUMB_SIZE // 2,
+                        text="VID",
+                        fill="white",
+                        font=("Segoe UI", 9, "bold"),
+                        state="hidden",
+                    ),
+                    badge=canvas.create_rectangle(x, y, x + 30, y + 16, outline="", state="hidden"),
+                    badge_text=canvas.create_text(
+                        x + 15, y + 8, fill="white", font=("Segoe UI", 8, "bold"), state="hidden"
+                    ),
+                )
+            )
+            x += STRIP_THUMB_SIZE + STRIP_PAD
+        self._strip_cursor = canvas.create_rectangle(0, 0, 0, 0, outline="#ffcc00", width=2, state="hidden")
+        self._strip_layout = (columns, y)
+
+    def _update_strip_thumb(self, path: Path, photo: ImageTk.PhotoImage) -> None:
+        slot = self._strip_slot_of.get(path)
+        if slot is None or slot.path != path or slot.photo is photo:
+            return
+        slot.photo = photo
+        self.strip_canvas.itemconfigure(slot.image, image=photo)
+
+    def _render_strip(self) -> None:
+        if not self.images:
+            self._clear_strip()
+            return
+        width = max(1, int(self.strip_canvas.winfo_width()))
+        height = max(1, int(self.strip_canvas.winfo_height()))
+        slot_width = STRIP_THUMB_SIZE + STRIP_PAD
+        columns = max(1, width // slot_width)
+        before = columns // 2
+        start = max(0, self.index - before)
+        end = min(len(self.images), start + columns)
+        start = max(0, end - columns)
+        y = (height - STRIP_THUMB_SIZE) // 2
+        if self._strip_layout != (columns, y):
+            self._build_strip_slots(columns, y)
+
+        canvas = self.strip_canvas
+        kept_set = self._kept_set
+        deleted_set = self._deleted_set
+        # Se publica antes de pedir miniaturas: los hilos la consultan para descartar.
+        slot_of: dict[Path, StripSlot] = {}
+        self._strip_slot_of = slot_of
+        for pos, slot in enumerate(self._strip_slots):
+            i = start + pos
+            if i >= end:
+                if slot.path is not None:
+                    slot.path = None
+                    slot.photo = None
+                    slot.state = ""
+                    for item in (slot.image, slot.video, slot.badge, slot.badge_text):
+                        canvas.itemconfigure(item, state="hidden")
+                continue
+            path = self.images[i]
+            slot_of[path] = slot
+            if slot.path != path:
+                is_video = self._is_video(path)
+                canvas.itemconfigure(slot.video, state="normal" if is_video else "hidden")
+                if slot.path is None:
+                    canvas.itemconfigure(slot.image, state="normal")
+                slot.path = path
+                slot.photo = None
+            if slot.photo is None or slot.photo is self._thumb_placeholder:
+                photo = self._thumb_cache.get((path, STRIP_THUMB_SIZE))
+                if photo is None:
+                    photo = self._thumb_placeholder
+                    if not self._is_video(path):
+                        self._request_thumb(
+                            path,
+                            STRIP_THUMB_SIZE,
+                            priority=PRIORITY_STRIP,
+                            wanted=lambda path=path: path in self._strip_slot_of,
+                        )
+                if photo is not slot.photo:
+                    slot.photo = photo
+                    canvas.itemconfigure(slot.image, image=photo)
+
+            rel = self._rel(path)
+            state = "keep" if rel in kept_set else ("delete" if rel in deleted_set else "")
+            if state != slot.state:
+                slot.state = state
+                if state:
+                    keep = state == "keep"
+                    canvas.itemconfigure(slot.badge, state="normal", fill="#2e7d32" if keep else "#c62828")
+                    canvas.itemconfigure(slot.badge_text, state="normal", text="OK" if keep else "DEL")
+                else:
+                    canvas.itemconfigure(slot.badge, state="hidden")
+                    canvas.itemconfigure(slot.badge_text, state="hidden")
+
+        x = STRIP_PAD // 2 + (self.index - start) * slot_width
+        canvas.coords(self._strip_cursor, x - 2, y - 2, x + STRIP_THUMB_SIZE + 2, y + STRIP_THUMB_SIZE + 2)
+        canvas.itemconfigure(self._strip_cursor, state="normal")
+
+    def _open_delete_review(self) -> None:
+        if not self.folder:
+            return
+        if self._show_job is not None:
+            try:
+                self.after_cancel(self._show_job)
+            except Exception:
+                LOGGER.debug("No se pudo cancelar _show_job al abrir revisión", exc_info=True)
+            self._show_job = None
+        self._stop_video()
+        if self._review_window and self._review_window.winfo_exists():
+            self._review_window.lift()
+            self._review_window.focus_force()
+            return
+
+        review_items: list[tuple[str, Path]] = []
+        for rel in sorted(self._deleted_set):
+            candidate = self.folder / rel
+            if candidate.exists() and candidate.is_file():
+                review_items.append((rel, candidate))
+
+        if not review_items:
+            self.status_var.set("Fin de revisión. No hay imágenes marcadas para borrar.")
+            self._clear_canvas("Revisión completa\nNo hay imágenes marcadas para borrar.")
+            self._deleted_set.clear()
+            self._state_compact = True
+            self._save_state()
+            return
+
+        win = ctk.CTkToplevel(self)
+        self._review_window = win
+        win.title("Revisión final de borrado")
+        win.geometry("980x680")
+        win.minsize(720, 480)
+        win.protocol("WM_DELETE_WINDOW", self._close_review_window)
+
+        root = ctk.CTkFrame(win, fg_color="transparent")
+        root.pack(fill="both", expand=True, padx=10, pady=10)
+
+        ctk.CTkLabel(
+            root,
+            text=(
+                "Revisa rápido las imágenes marcadas para borrar. "
+                "Desmarca las que quieras conservar y pulsa el botón final."
+            ),
+            wraplength=640,
+            justify="left",
+        ).pack(fill="x")
+
+        container = ctk.CTkFrame(root)
+        container.pack(fill="both", expand=True, pady=(10, 10))
+
+        canvas = tk.Canvas(container, highlightthickness=0, yscrollincrement=REVIEW_TILE_HEIGHT // 5)
+        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ctk.CTkScrollbar(container, orientation="vertical", command=canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self._review_selection = {rel: True for rel, _path in review_items}
+        tiles: dict[int, ReviewTile] = {}
+        spare: list[ReviewTile] = []
+        layout: dict[str, object] = {"region": None, "job": None}
+
+        def _toggle(tile: ReviewTile) -> None:
+            if 0 <= tile.index < len(review_items):
+                self._review_selection[review_items[tile.index][0]] = bool(tile.var.get())
+
+        def _make_tile() -> ReviewTile:
+            frame = ctk.CTkFrame(canvas, fg_color="transparent", corner_radius=8)
+            var = tk.BooleanVar(value=True)
+            check = ctk.CTkCheckBox(frame, text="", variable=var)
+            check.pack(anchor="w")
+            preview = ctk.CTkLabel(
+                frame,
+                text="Cargando...",
+                anchor="center",
+                image=self._review_thumb_placeholder,
+                compound="center",
+            )
+            preview.pack()
+            name = ctk.CTkLabel(frame, text="", wraplength=160, justify="center")
+            name.pack()
+            rel_label = ctk.CTkLabel(frame, text="", wraplength=160, justify="center")
+            rel_label.pack()
+            item = canvas.create_window(
+                0, 0, window=frame, anchor="nw", width=REVIEW_TILE_WIDTH - 12, height=REVIEW_TILE_HEIGHT - 12
+            )
+            tile = ReviewTile(frame, var, preview, name, rel_label, item)
+            check.configure(command=lambda: _toggle(tile))
+            return tile
+
+        def _bind_tile(tile: ReviewTile, index: int) -> None:
+            rel, path = review_items[index]
+            tile.index = index
+            tile.var.set(self._review_selection.get(rel, True))
+            tile.name.configure(text=path.name)
+            tile.rel.configure(text=rel)
+            video = self._is_video(path)
+            tile.preview.configure(image=self._review_thumb_placeholder, text="Video" if video else "Cargando...")
+            tile.preview.image = self._review_thumb_placeholder
+            if video:
+                return
+
+            def _apply_thumb(photo: ImageTk.PhotoImage) -> None:
+                # La miniatura puede llegar cuando el widget ya muestra otro archivo.
+                if self._is_closing or tile.index != index or not tile.frame.winfo_exists():
+                    return
+                tile.preview.configure(image=photo, text="")
+                tile.preview.image = photo
+
+            self._request_thumb(
+                path,
+                150,
+                on_ready=_apply_thumb,
+                priority=PRIORITY_REVIEW,
+                wanted=lambda: tile.index == index and self._review_window is win,
+            )
+
+        def _refresh() -> None:
+            layout["job"] = None
+            if not canvas.winfo_exists():
+                return
+            width = max(1, canvas.winfo_width())
+            height = max(1, canvas.winfo_height())
+            columns = max(1, width // REVIEW_TILE_WIDTH)
+            rows = (len(review_items) + columns - 1) // columns
+            region = (0, 0, width, rows * REVIEW_TILE_HEIGHT)
+            if region != layout["region"]:
+                layout["region"] = region
+                canvas.configure(scrollregion=region)
+            wanted, visible = grid_window(
+                len(review_items), columns, canvas.canvasy(0), height, REVIEW_TILE_HEIGHT, REVIEW_OVERSCAN_ROWS
+            )
+            for index in [index for index in tiles if index not in wanted]:
+                tile = tiles.pop(index)
+                tile.index = -1
+                # Fuera de la región desplazable nunca se ve; más barato que destruirlo.
+                canvas.coords(tile.item, -2 * REVIEW_TILE_WIDTH, -2 * REVIEW_TILE_HEIGHT)
+                spare.append(tile)
+            column_width = width / columns
+            # Primero las filas visibles, para que sus miniaturas se pidan antes.
+            for index in sorted(wanted, key=lambda i: (i not in visible, i)):
+                tile = tiles.get(index)
+                if tile is None:
+                    tile = spare.pop() if spare else _make_tile()
+                    tiles[index] = tile
+                    _bind_tile(tile, index)
+                row, col = divmod(index, columns)
+                canvas.coords(
+                    tile.item,
+                    col * column_width + (column_width - REVIEW_TILE_WIDTH) / 2 + 6,
+                    row * REVIEW_TILE_HEIGHT + 6,
+                )
+
+        def _schedule_refresh(*_args: object) -> None:
+            if layout["job"] is None:
+                layout["job"] = canvas.after_idle(_refresh)
+
+        def _on_yscroll(first: str, last: str) -> None:
+            scrollbar.set(first, last)
+            _schedule_refresh()
+
+        def _on_wheel(event: tk.Event) -> None:
+            if getattr(event, "num", 0) == 4 or getattr(event, "delta", 0) > 0:
+                canvas.yview_scroll(-1, "units")
+            else:
+                canvas.yview_scroll(1, "units")
+
+        canvas.configure(yscrollcommand=_on_yscroll)
+        canvas.bind("<Configure>", _schedule_refresh)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            win.bind(sequence, _on_wheel)
+        _schedule_refresh()
+
+        buttons = ctk.CTkFrame(root, fg_color="transparent")
+        buttons.pack(fill="x")
+        ctk.CTkButton(buttons, text="Cerrar", command=self._close_review_window).pack(side="right", padx=8)
+        ctk.CTkButton(
+            buttons,
+            text="Borrar todas",
+            command=self._delete_selected_from_review,
+        ).pack(side="right", padx=(0, 8))
+
+        self.status_var.set(
+            f"Fin de revisión: {len(review_items)} imágenes marcadas. Revisa y confirma el borrado."
+        )
+
+    def _close_review_window(self) -> None:
+        if self._review_window and self._review_window.winfo_exists():
+            self._review_window.destroy()
+        self._review_window = None
+        self._review_selection = {}
+
+    # ------------- Similar images -------------
+    def find_similar_images(self) -> None:
+        if not self.folder or not self.images:
+            messagebox.showinfo("Similares", "Primero elige una carpeta con imágenes.")
+            return
+        if self._scan_in_progress:
+            messagebox.showinfo("Similares", "Espera a que termine el escaneo de la carpeta.")
+            return
+        if self._similar_job is not None:
+            self.status_var.set("La búsqueda de similares ya está en marcha.")
+            return
+        paths = [path for path in self.images if not self._is_video(path)]
+        if not paths:
+            messagebox.showinfo("Similares", "No hay imágenes en esta carpeta.")
+            return
+        generation = self._media_generation
+        job = {"generation": generation, "paths": paths, "signatures": [None] * len(paths), "done": 0}
+        self._similar_job = job
+
+        def _cancelled() -> bool:
+            return self._is_closing or generation != self._media_generation
+
+        for start in range(0, len(paths), SIGNATURE_CHUNK_SIZE):
+            chunk = paths[start : start + SIGNATURE_CHUNK_SIZE]
+            future = self._analysis_worker.submit(signatures_for, chunk, _cancelled)
+
+            def _dispatch(fut: Future, start: int = start) -> None:
+                try:
+                    self.after(0, self._apply_signature_chunk, job, start, fut)
+                except Exception:
+                    LOGGER.debug("No se pudo despachar huellas", exc_info=True)
+
+            future.add_done_callback(_dispatch)
+        self.status_var.set(f"Calculando huellas de {len(paths)} imágenes...")
+
+    def _apply_signature_chunk(self, job: dict, start: int, future: Future) -> None:
+        if self._is_closing or job is not self._similar_job:
+            return
+        if job["generation"] != self._media_generation:
+            self._similar_job = None
+            return
+        try:
+            results = future.result()
+        except Exception:
+            LOGGER.exception("Error calculando huellas perceptuales")
+            results = []
+        total = len(job["paths"])
+        job["signatures"][start : start + len(results)] = results
+        job["done"] += min(SIGNATURE_CHUNK_SIZE, total - start)
+        if job["done"] < total:
+            self.status_var.set(f"Calculando huellas... {job['done']}/{total}")
+            return
+        self.status_var.set("Agrupando imágenes similares...")
+        valid = [(path, sig) for path, sig in zip(job["paths"], job["signatures"]) if sig is not None]
+        cluster = self._analysis_worker.submit(find_similar_groups, [sig[0] for _path, sig in valid])
+
+        def _apply_groups() -> None:
+            if self._is_closing or job is not self._similar_job:
+                return
+            self._similar_job = None
+            if job["generation"] != self._media_generation:
+                return
+            try:
+                groups = cluster.result()
+            except Exception:
+                LOGGER.exception("Error agrupando imágenes similares")
+                self.status_var.set("No se pudieron agrupar las imágenes similares.")
+                return
+            if not groups:
+                self.status_var.set("No se encontraron imágenes similares.")
+                messagebox.showinfo("Similares", "No se encontraron imágenes similares.")
+                return
+            member_groups: list[list[Path]] = []
+            keepers: list[int] = []
+            details: list[list[str]] = []
+            for members in groups:
+                signatures = [valid[i][1] for i in members]
+                member_groups.append([valid[i][0] for i in members])
+                keepers.append(choose_keeper(signatures))
+                details.append(
+                    [f"{sig[1] / 1_000_000:.1f} MP · {self._format_size(sig[2])}" for sig in signatures]
+                )
+            self.status_var.set(f"{len(groups)} grupos de imágenes similares.")
+            self._open_group_review("Imágenes similares", member_groups, keepers, details)
+
+        def _dispatch_groups(_fut: object) -> None:
+            try:
+                self.after(0, _apply_groups)
+            except Exception:
+                LOGGER.debug("No se pudo despachar grupos de similares", exc_info=True)
+
+        cluster.add_done_callback(_dispatch_groups)
+
+    # ------------- Exact duplicates -------------
+    def find_duplicate_files(self) -> None:
+        if not self.folder or not self.images:
+            messagebox.showinfo("Duplicados", "Primero elige una carpeta con medios.")
+            return
+        if self._scan_in_progress:
+            messagebox.showinfo("Duplicados", "Espera a que termine el escaneo de la carpeta.")
+            return
+        if self._duplicate_job is not None:
+            self.status_var.set("La búsqueda de duplicados ya está en marcha.")
+            return
+        generation = self._media_generation
+        known = {path: self._file_stats.get(path) for path in self.images}
+
+        def _cancelled() -> bool:
+            return self._is_closing or generation != self._media_generation
+
+        def _run() -> tuple[list[list[Path]], dict[Path, tuple[int, int]]]:
+            stats = {path: stat or _file_stamp(path) or (0, 0) for path, stat in known.items()}
+            groups = find_exact_duplicates(
+                [(path, stat[0]) for path, stat in stats.items()],
+                cancelled=_cancelled,
+            )
+            return groups, stats
+
+        future = self._analysis_worker.submit(_run)
+        self._duplicate_job = future
+        self.status_var.set(f"Buscando duplicados exactos entre {len(known)} archivos...")
+
+        def _apply() -> None:
+            if self._is_closing or future is not self._duplicate_job:
+                return
+            self._duplicate_job = None
+            if generation != self._media_generation:
+                return
+            try:
+                groups, stats = future.result()
+            except Exception:
+                LOGGER.exception("Error buscando duplicados exactos")
+                self.status_var.set("No se pudieron buscar duplicados.")
+                return
+            if not groups:
+                self.status_var.set("No se encontraron duplicados exactos.")
+                messagebox.showinfo("Duplicados", "No se encontraron duplicados exactos.")
+                return
+            keepers: list[int] = []
+            details: list[list[str]] = []
+            for members in groups:
+                # Se conserva la copia más antigua y, a igualdad, la de ruta más corta.
+                keepers.append(
+                    min(range(len(members)), key=lambda i: (stats[members[i]][1], len(self._rel(members[i]))))
+                )
+                details.append(
+                    [f"{self._format_size(stats[path][0])} · {Path(self._rel(path)).parent}" for path in members]
+                )
+            extra = sum(len(members) - 1 for members in groups)
+            self.status_var.set(f"{len(groups)} grupos de duplicados exactos ({extra} copias sobrantes).")
+            self._open_group_review("Duplicados exactos", groups, keepers, details)
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, _apply)
+            except Exception:
+                LOGGER.debug("No se pudo despachar duplicados", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+
+    # ------------- Quality ranking -------------
+    def toggle_quality_order(self) -> None:
+        if self._quality_sorted:
+            current = self._current_path()
+            self._quality_sorted = False
+            self._reorder_images(self._name_order, current)
+            self._name_order = []
+            self.quality_button.configure(text="Peores primero")
+            self.status_var.set("Orden por nombre restaurado.")
+            return
+        self.rank_by_quality()
+
+    def _reorder_images(self, order: list[Path], current: Path | None) -> None:
+        self.images = list(order)
+        try:
+            self.index = self.images.index(current) if current is not None else 0
+        except ValueError:
+            self.index = 0
+        # Los índices del historial dejan de ser válidos con el nuevo orden.
+        self._history.clear()
+        self._cancel_prefetch()
+        self._save_state()
+        self._schedule_show_current()
+
+    def _cancel_quality_job(self) -> None:
+        job = self._quality_job
+        self._quality_job = None
+        if job is not None:
+            for future in job["futures"]:
+                future.cancel()
+
+    def _quality_executor(self) -> ProcessPoolExecutor | ThreadPoolExecutor:
+        if self._quality_pool is None:
+            workers = _env_int("TRASH_IMAGE_ERASER_QUALITY_WORKERS", max(1, (os.cpu_count() or 2) - 1), minimum=1)
+            try:
+                # Los hijos solo cargan imaging/core: app.py es un lanzador (ver DecodeBackend).
+                self._quality_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except Exception:
+                LOGGER.exception("No se pudo crear el pool de procesos; se puntúa en hilos")
+                return self._analysis_worker
+        return self._quality_pool
+
+    def rank_by_quality(self) -> None:
+        if not self.folder or not self.images:
+            messagebox.showinfo("Calidad", "Primero elige una carpeta con imágenes.")
+            return
+        if np is None:
+            messagebox.showinfo("Calidad", "La puntuación de calidad necesita numpy: pip install numpy")
+            return
+        if self._scan_in_progress:
+            messagebox.showinfo("Calidad", "Espera a que termine el escaneo de la carpeta.")
+            return
+        if self._quality_job is not None:
+            self.status_var.set("La puntuación de calidad ya está en marcha.")
+            return
+        paths = [path for path in self.images if not self._is_video(path)]
+        if not paths:
+            messagebox.showinfo("Calidad", "No hay imágenes en esta carpeta.")
+            return
+        folder = self.folder
+        known = {path: self._file_stats.get(path) for path in paths}
+        job = {"generation": self._media_generation, "folder": folder, "futures": [], "done": 0, "total": 0}
+        self._quality_job = job
+
+        def _lookup() -> tuple[dict[Path, tuple[int, int]], dict[Path, QualityMetrics]]:
+            stamps = {path: stat or _file_stamp(path) for path, stat in known.items()}
+            stamps = {path: stat for path, stat in stamps.items() if stat is not None}
+            rels = {_safe_relative(path, folder): path for path in stamps}
+            cached = self._quality_store.get_many(str(folder), {rel: stamps[path] for rel, path in rels.items()})
+            return stamps, {rels[rel]: metrics for rel, metrics in cached.items()}
+
+        future = self._analysis_worker.submit(_lookup)
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, self._start_quality_scoring, job, future)
+            except Exception:
+                LOGGER.debug("No se pudo despachar la caché de calidad", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+        self.status_var.set(f"Buscando puntuaciones guardadas de {len(paths)} imágenes...")
+
+    def _start_quality_scoring(self, job: dict, future: Future) -> None:
+        if self._is_closing or job is not self._quality_job:
+            return
+        try:
+            stamps, cached = future.result()
+        except Exception:
+            LOGGER.exception("Error leyendo la caché de calidad")
+            stamps, cached = {}, {}
+        job["stamps"] = stamps
+        job["metrics"] = dict(cached)
+        missing = [path for path in stamps if path not in cached]
+        job["total"] = len(missing)
+        if not missing:
+            self._apply_quality_order(job)
+            return
+        pool = self._quality_executor()
+        for start in range(0, len(missing), QUALITY_CHUNK_SIZE):
+            chunk = missing[start : start + QUALITY_CHUNK_SIZE]
+            chunk_future = pool.submit(quality_metrics_batch, [str(path) for path in chunk])
+            job["futures"].append(chunk_future)
+
+            def _dispatch(fut: Future, chunk: list[Path] = chunk) -> None:
+                try:
+                    self.after(0, self._apply_quality_chunk, job, chunk, fut)
+                except Exception:
+                    LOGGER.debug("No se pudo despachar puntuaciones", exc_info=True)
+
+            chunk_future.add_done_callback(_dispatch)
+        self.status_var.set(f"Puntuando calidad de {len(missing)} imágenes ({len(cached)} ya en caché)...")
+
+    def _apply_quality_chunk(self, job: dict, chunk: list[Path], future: Future) -> None:
+        if self._is_closing or job is not self._quality_job:
+            return
+        try:
+            results = future.result()
+        except Exception:
+            LOGGER.exception("Error puntuando calidad")
+            results = [None] * len(chunk)
+        folder = job["folder"]
+        rows: list[tuple[str, tuple[int, int], QualityMetrics]] = []
+        for path, metrics in zip(chunk, results):
+            if metrics is None:
+                continue
+            job["metrics"][path] = metrics
+            rows.append((_safe_relative(path, folder), job["stamps"][path], metrics))
+        self._analysis_worker.submit(self._quality_store.put_many, str(folder), rows)
+        job["done"] += len(chunk)
+        if job["done"] < job["total"]:
+            self.status_var.set(f"Puntuando calidad... {job['done']}/{job['total']}")
+            return
+        self._apply_quality_order(job)
+
+    def _apply_quality_order(self, job: dict) -> None:
+        self._quality_job = None
+        if job["generation"] != self._media_generation or self.folder != job["folder"]:
+            return
+        scores = {path: quality_score(metrics) for path, metrics in job["metrics"].items()}
+        if not scores:
+            self.status_var.set("No se pudo puntuar ninguna imagen.")
+            return
+        self._name_order = list(self.images)
+        self._quality_sorted = True
+        self._reorder_images(quality_order(self.images, scores), None)
+        self.quality_button.configure(text="Orden por nombre")
+        doubtful = sum(1 for score in scores.values() if score < 0.5)
+        self.status_var.set(
+            f"Peores primero: {len(scores)} imágenes puntuadas, {doubtful} con poca nitidez o mala exposición."
+        )
+
+    # ------------- Latency -------------
+    def _latency_report(self) -> dict:
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "decode_backend": self._decoder.mode,
+            "decode_workers": self._decoder.workers,
+            "stages": self._latency.snapshot(),
+            "caches": {
+                "display": self._display_cache.stats(),
+                "photos": self._photo_cache.stats(),
+                "masters": self._master_cache.stats(),
+                "thumbs": self._thumb_cache.stats(),
+            },
+            "read_ahead": self._read_ahead.stats() if self._read_ahead is not None else None,
+        }
+
+    def toggle_debug_overlay(self) -> None:
+        if self._overlay is not None:
+            if self._overlay_job is not None:
+                self.after_cancel(self._overlay_job)
+                self._overlay_job = None
+            self._overlay.destroy()
+            self._overlay = None
+            return
+        self._overlay = tk.Label(
+            self.canvas,
+            justify="left",
+            anchor="nw",
+            bg="#000000",
+            fg="#7CFC00",
+            font=("Consolas", 9),
+        )
+        self._overlay.place(x=8, y=8)
+        self._refresh_overlay()
+
+    def _refresh_overlay(self) -> None:
+        self._overlay_job = None
+        if self._overlay is None or self._is_closing:
+            return
+        report = self._latency_report()
+        lines = [f"{'etapa':<20}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for stage, data in report["stages"].items():
+            lines.append(
+                f"{stage:<20}{data['count']:>7}{data['p50_ms']:>9.1f}{data['p95_ms']:>9.1f}{data['p99_ms']:>9.1f}"
+            )
+        for name, stats in report["caches"].items():
+            lines.append(f"caché {name}: {stats['hit_rate']:.0%} aciertos, {stats['bytes'] // (1024 * 1024)} MB")
+        read_ahead = report["read_ahead"]
+        if read_ahead is not None:
+            lines.append(
+                f"lectura anticipada: {read_ahead['hit_rate']:.0%} aciertos, "
+                f"{read_ahead['bytes'] // (1024 * 1024)} MB, {read_ahead['saved_seconds']:.1f} s de espera evitados"
+            )
+        lines.append(f"decodificación: {report['decode_backend']} x{report['decode_workers']}  [F12] ocultar")
+        self._overlay.configure(text="\n".join(lines))
+        self._overlay_job = self.after(500, self._refresh_overlay)
+
+    def _dump_latency(self, reschedule: bool = True) -> None:
+        self._latency_dump_job = None
+        report = self._latency_report()
+        if report["stages"]:
+            path = _app_state_dir() / LATENCY_FILENAME
+            tmp_path = path.with_name(path.name + ".tmp")
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+                os.replace(tmp_path, path)
+            except Exception:
+                LOGGER.debug("No se pudieron guardar las latencias en %s", path, exc_info=True)
+        if reschedule and not self._is_closing and self._latency_dump_seconds > 0:
+            self._latency_dump_job = self.after(self._latency_dump_seconds * 1000, self._dump_latency)
+
+    # ------------- Bursts -------------
+    def _start_burst_grouping(self) -> None:
+        if not self.images or self._burst_job is not None:
+            return
+        job = {"generation": self._media_generation, "paths": list(self.images), "pos": 0, "grouper": BurstGrouper()}
+        self._burst_job = job
+        self._next_burst_chunk(job)
+
+    def _next_burst_chunk(self, job: dict) -> None:
+        # Un bloque cada vez, para no acaparar los hilos de análisis.
+        start = job["pos"]
+        chunk = job["paths"][start : start + BURST_CHUNK_SIZE]
+        if not chunk:
+            closed = job["grouper"].finish()
+            if closed:
+                self._add_burst(closed)
+            self._burst_job = None
+            LOGGER.info("Ráfagas detectadas en %s: %d", self.folder, len(self._bursts))
+            return
+        future = self._analysis_worker.submit(burst_signatures, chunk)
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, self._apply_burst_chunk, job, chunk, future)
+            except Exception:
+                LOGGER.debug("No se pudo despachar firmas de ráfaga", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+
+    def _apply_burst_chunk(self, job: dict, chunk: list[Path], future: Future) -> None:
+        if self._is_closing or job is not self._burst_job:
+            return
+        if job["generation"] != self._media_generation:
+            self._burst_job = None
+            return
+        try:
+            signatures = future.result()
+        except Exception:
+            LOGGER.exception("Error calculando firmas de ráfaga")
+            signatures = [(None, None)] * len(chunk)
+        for path, signature in zip(chunk, signatures):
+            closed = job["grouper"].feed(path, signature)
+            if closed:
+                self._add_burst(closed)
+        job["pos"] += len(chunk)
+        self._next_burst_chunk(job)
+
+    def _add_burst(self, members: list[Path]) -> None:
+        burst = len(self._bursts)
+        self._bursts.append(members)
+        self._burst_keepers.append(0)
+        for path in members:
+            self._burst_of[path] = burst
+        generation = self._media_generation
+        future = self._analysis_worker.submit(sharpest_index, members)
+
+        def _apply() -> None:
+            if self._is_closing or generation != self._media_generation:
+                return
+            try:
+                self._burst_keepers[burst] = future.result()
+            except Exception:
+                LOGGER.debug("No se pudo elegir la foto más nítida de la ráfaga", exc_info=True)
+
+        def _dispatch(_fut: object) -> None:
+            try:
+                self.after(0, _apply)
+            except Exception:
+                LOGGER.debug("No se pudo despachar la foto más nítida", exc_info=True)
+
+        future.add_done_callback(_dispatch)
+        if self._current_image_path in members:
+            self.status_var.set(self._position_label(self._current_image_path))
+
+    def _burst_details(self, members: list[Path]) -> list[str]:
+        details = []
+        for pos, path in enumerate(members):
+            stat = self._file_stats.get(path) or _file_stamp(path)
+            details.append(f"{pos + 1}/{len(members)}" + (f" · {self._format_size(stat[0])}" if stat else ""))
+        return details
+
+    def review_current_burst(self) -> None:
+        current = self._current_path()
+        burst = self._burst_of.get(current) if current is not None else None
+        if burst is None:
+            self.status_var.set(
+                "Aún se están buscando ráfagas..." if self._burst_job is not None else "Esta foto no forma parte de una ráfaga."
+            )
+            return
+        members = self._bursts[burst]
+
+        def _after_mark(_g: int) -> None:
+            # La ráfaga cuenta como un único elemento: se sigue tras su última foto.
+            self._close_group_window()
+            live = [path for path in members if path in self.images]
+            if live:
+                self.index = min(self.images.index(live[-1]) + 1, len(self.images) - 1)
+                self._note_navigation(1)
+                self._save_state()
+                self._schedule_show_current()
+
+        self._open_group_review(
+            "Ráfaga",
+            [members],
+            [self._burst_keepers[burst]],
+            [self._burst_details(members)],
+            on_marked=_after_mark,
+        )
+
+    def review_bursts(self) -> None:
+        if not self.folder or not self.images:
+            messagebox.showinfo("Ráfagas", "Primero elige una carpeta con imágenes.")
+            return
+        if not self._bursts:
+            messagebox.showinfo(
+                "Ráfagas",
+                "Todavía se están buscando ráfagas." if self._burst_job is not None else "No se encontraron ráfagas.",
+            )
+            return
+        live = set(self.images)
+        bursts = [
+            (members, keeper)
+            for members, keeper in zip(self._bursts, self._burst_keepers)
+            if all(path in live for path in members)
+        ]
+        if not bursts:
+            messagebox.showinfo("Ráfagas", "No quedan ráfagas por revisar.")
+            return
+        self._open_group_review(
+            "Ráfagas" + (" (búsqueda en curso)" if self._burst_job is not None else ""),
+            [members for members, _keeper in bursts],
+            [keeper for _members, keeper in bursts],
+            [self._burst_details(members) for members, _keeper in bursts],
+        )
+
+    def _mark_group(self, members: list[Path], keeper: int, shown: set[int] | None = None) -> int:
+        # Con shown solo se tocan las miniaturas que llegaron a verse.
+        changed = 0
+        for pos, path in enumerate(members):
+            if shown is not None and pos not in shown:
+                continue
+            rel = self._rel(path)
+            was_kept = rel in self._kept_set
+            was_deleted = rel in self._deleted_set
+            if pos == keeper:
+                if was_kept and not was_deleted:
+                    continue
+                self._set_mark(rel, kept=True, deleted=False)
+                kind = "keep"
+            else:
+                if was_deleted and not was_kept:
+                    continue
+                self._set_mark(rel, kept=False, deleted=True)
+                kind = "delete"
+            self._history.append(
+                Action(kind=kind, src=path, was_kept=was_kept, was_deleted=was_deleted, index_before=self.index)
+            )
+            changed += 1
+        if changed:
+            self._save_state()
+            self._schedule_strip_render()
+        return changed
+
+    def _open_group_review(
+        self,
+        title: str,
+        groups: list[list[Path]],
+        keepers: list[int],
+        details: list[list[str]],
+        on_marked: Callable[[int], None] | None = None,
+    ) -> None:
+        self._close_group_window()
+        win = ctk.CTkToplevel(self)
+        self._group_window = win
+        win.title(title)
+        win.geometry("980x520")
+        win.minsize(640, 380)
+        win.protocol("WM_DELETE_WINDOW", self._close_group_window)
+
+        root = ctk.CTkFrame(win, fg_color="transparent")
+        root.pack(fill="both", expand=True, padx=10, pady=10)
+        header_var = tk.StringVar()
+        ctk.CTkLabel(root, textvariable=header_var, anchor="w", justify="left").pack(fill="x")
+        ctk.CTkLabel(
+            root,
+            text=(
+                "Clic en una miniatura para elegir la que se conserva. "
+                "[M] o [Enter]: marcar el resto para borrar | [←] / [→]: grupo anterior / siguiente | "
+                "[RePág] / [AvPág]: más miniaturas del grupo | [Esc]: cerrar"
+            ),
+            anchor="w",
+            wraplength=900,
+            justify="left",
+        ).pack(fill="x", pady=(2, 8))
+        strip = ctk.CTkScrollableFrame(root, orientation="horizontal", height=250)
+        strip.pack(fill="both", expand=True)
+
+        max_tiles = 40
+        position = {"group": 0, "page": 0}
+        keeper_by_group = list(keepers)
+        # Posiciones que se han mostrado en cada grupo: marcar no toca lo que no se vio.
+        shown_by_group: list[set[int]] = [set() for _ in groups]
+
+        def _page_positions(g: int, page: int) -> list[int]:
+            # La que se conserva se muestra siempre, aunque caiga en otra página.
+            start = page * max_tiles
+            positions = list(range(start, min(start + max_tiles, len(groups[g]))))
+            keeper = keeper_by_group[g]
+            if keeper not in positions:
+                positions.insert(0, keeper)
+            return positions
+
+        def _render() -> None:
+            for child in strip.winfo_children():
+                child.destroy()
+            g = position["group"]
+            members = groups[g]
+            keeper = keeper_by_group[g]
+            pages = max(1, math.ceil(len(members) / max_tiles))
+            positions = _page_positions(g, position["page"])
+            shown_by_group[g].update(positions)
+            header_var.set(
+                f"Grupo {g + 1}/{len(groups)} — {len(members)} archivos"
+                + (f" (página {position['page'] + 1}/{pages}, vistas {len(shown_by_group[g])})" if pages > 1 else "")
+            )
+            for pos in positions:
+                path = members[pos]
+                rel = self._rel(path)
+                is_keeper = pos == keeper
+                tile = ctk.CTkFrame(
+                    strip,
+                    corner_radius=8,
+                    border_width=3,
+                    border_color="#ffcc00" if is_keeper else "#333333",
+                )
+                tile.pack(side="left", padx=6, pady=6, anchor="n")
+                preview = ctk.CTkLabel(tile, text="", image=self._review_thumb_placeholder, width=150, height=150)
+                preview.pack(padx=6, pady=(6, 2))
+                preview.image = self._review_thumb_placeholder
+
+                def _apply_thumb(photo: ImageTk.PhotoImage, label: ctk.CTkLabel = preview) -> None:
+                    if self._is_closing or not label.winfo_exists():
+                        return
+                    label.configure(image=photo)
+                    label.image = photo
+
+                self._request_thumb(path, 150, on_ready=_apply_thumb)
+                if is_keeper:
+                    badge = "CONSERVAR"
+                elif rel in self._deleted_set:
+                    badge = "Marcada"
+                else:
+                    badge = ""
+                ctk.CTkLabel(tile, text=path.name, wraplength=150).pack(padx=6)
+                ctk.CTkLabel(tile, text=details[g][pos], wraplength=150).pack(padx=6)
+                ctk.CTkLabel(tile, text=badge, text_color="#ffcc00" if is_keeper else "#ef5350").pack(padx=6, pady=(0, 6))
+                for widget in (tile, preview):
+                    widget.bind("<Button-1>", lambda _e, pos=pos: _choose(pos))
+
+        def _choose(pos: int) -> None:
+            keeper_by_group[position["group"]] = pos
+            _render()
+
+        def _move(step: int) -> None:
+            target = position["group"] + step
+            if 0 <= target < len(groups):
+                position["group"] = target
+                position["page"] = 0
+                _render()
+
+        def _page(step: int) -> None:
+            target = position["page"] + step
+            if 0 <= target < math.ceil(len(groups[position["group"]]) / max_tiles):
+                position["page"] = target
+                _render()
+
+        def _mark() -> None:
+            g = position["group"]
+            shown = shown_by_group[g]
+            changed = self._mark_group(groups[g], keeper_by_group[g], shown)
+            unseen = len(groups[g]) - len(shown)
+            self.status_var.set(
+                f"Grupo {g + 1}: {changed} cambios de marca."
+                + (f" {unseen} sin ver quedan sin marcar." if unseen else "")
+            )
+            if on_marked is not None:
+                on_marked(g)
+            elif g < len(groups) - 1:
+                _move(1)
+            else:
+                _render()
+
+        def _mark_all() -> None:
+            # En los grupos no abiertos cuenta la primera página, la que se mostraría al llegar.
+            shown = [shown_by_group[g] | set(_page_positions(g, 0)) for g in range(len(groups))]
+            extra = sum(len(positions) - 1 for positions in shown)
+            unseen = sum(len(members) for members in groups) - sum(len(positions) for positions in shown)
+            if not messagebox.askyesno(
+                title,
+                f"¿Marcar para borrar {extra} archivos y conservar uno por grupo en los {len(groups)} grupos?"
+                + (f"\n{unseen} archivos sin mostrar quedan sin marcar." if unseen else ""),
+                parent=win,
+            ):
+                return
+            changed = sum(
+                self._mark_group(members, keeper_by_group[g], shown[g]) for g, members in enumerate(groups)
+            )
+            self.status_var.set(f"{changed} cambios de marca en {len(groups)} grupos.")
+            _render()
+
+        buttons = ctk.CTkFrame(root, fg_color="transparent")
+        buttons.pack(fill="x", pady=(8, 0))
+        ctk.CTkButton(buttons, text="Cerrar", command=self._close_group_window).pack(side="right", padx=8)
+        ctk.CTkButton(buttons, text="Marcar resto en todos los grupos", command=_mark_all).pack(side="right", padx=(0, 8))
+        ctk.CTkButton(buttons, text="Marcar resto para borrar", command=_mark).pack(side="right", padx=(0, 8))
+        ctk.CTkButton(buttons, text="Siguiente", command=lambda: _move(1)).pack(side="left", padx=(0, 8))
+        ctk.CTkButton(buttons, text="Anterior", command=lambda: _move(-1)).pack(side="left")
+
+        win.bind("<Left>", lambda _e: _move(-1))
+        win.bind("<Right>", lambda _e: _move(1))
+        win.bind("<Prior>", lambda _e: _page(-1))
+        win.bind("<Next>", lambda _e: _page(1))
+        win.bind("<Return>", lambda _e: _mark())
+        win.bind("m", lambda _e: _mark())
+        win.bind("M", lambda _e: _mark())
+        win.bind("<Escape>", lambda _e: self._close_group_window())
+        _render()
+        win.after(100, win.focus_force)
+
+    def _close_group_window(self) -> None:
+        if self._group_window and self._group_window.winfo_exists():
+            self._group_window.destroy()
+        self._group_window = None
+
+    # ------------- Background mover -------------
+    def _start_move(self, rel_paths: list[str], unselected: list[str] | None = None) -> None:
+        if not self.folder:
+            return
+        if self._move_cancel is not None:
+            messagebox.showinfo("Mover", "Ya hay un movimiento en curso.")
+            return
+        folder = self.folder
+        self._move_generation += 1
+        move_id = self._move_generation
+        cancel = threading.Event()
+        self._move_cancel = cancel
+        self._move_moved = []
+        self._move_failed = []
+        with self._move_lock:
+            self._move_unmarked = set()
+        if unselected:
+            self._apply_move_results([], unselected=unselected)
+        self._open_move_window(len(rel_paths))
+        self._mover.submit(self._run_move, move_id, folder, list(rel_paths), cancel)
+
+    def _run_move(self, move_id: int, folder: Path, rel_paths: list[str], cancel: threading.Event) -> None:
+        moved: list[str] = []
+        failed: list[str] = []
+        done = 0
+        flushed = time.monotonic()
+
+        def _still_marked() -> Iterator[str]:
+            # Se consulta justo antes de mover cada archivo.
+            nonlocal done
+            for rel in rel_paths:
+                with self._move_lock:
+                    skip = rel in self._move_unmarked
+                if skip:
+                    done += 1
+                    continue
+                yield rel
+
+        try:
+            for rel, error in iter_move_to_deleted(folder, _still_marked(), DELETED_DIRNAME):
+                done += 1
+                if error is None:
+                    moved.append(rel)
+                else:
+                    failed.append(f"{rel} ({error})")
+                if len(moved) + len(failed) >= MOVE_CHUNK_FILES or time.monotonic() - flushed >= MOVE_CHUNK_SECONDS:
+                    self.after(0, self._apply_move_chunk, move_id, folder, moved, failed, done, len(rel_paths))
+                    moved, failed = [], []
+                    flushed = time.monotonic()
+                if cancel.is_set() or self._is_closing:
+                    break
+        except Exception as exc:
+            LOGGER.exception("Error moviendo archivos de %s", folder)
+            failed.append(f"{DELETED_DIRNAME} ({exc})")
+        if self._is_closing:
+            return
+        self.after(0, self._apply_move_chunk, move_id, folder, moved, failed, done, len(rel_paths))
+        self.after(0, self._finish_move, move_id, folder)
+
+    def _apply_move_chunk(
+        self,
+        move_id: int,
+        folder: Path,
+        moved: list[str],
+        failed: list[str],
+        done: int,
+        total: int,
+    ) -> None:
+        if self._is_closing or move_id != self._move_generation or self.folder != folder:
+            return
+        self._move_moved.extend(moved)
+        self._move_failed.extend(failed)
+        if moved:
+            self._apply_move_results(moved)
+            if self.images:
+                self._schedule_show_current()
+            else:
+                self._clear_canvas("Sin imágenes")
+                self._clear_strip()
+        if self._move_progress is not None:
+            self._move_progress.set(done / total if total else 1.0)
+        if self._move_cancel is not None and self._move_cancel.is_set():
+            self._move_text.set(f"Cancelando... {len(self._move_moved)} movidas.")
+        else:
+            self._move_text.set(f"Movidas {len(self._move_moved)} de {total}.")
+
+    def _finish_move(self, move_id: int, folder: Path) -> None:
+        if self._is_closing or move_id != self._move_generation or self.folder != folder:
+            return
+        cancelled = self._move_cancel is not None and self._move_cancel.is_set()
+        self._move_cancel = None
+        self._close_move_window()
+        if self._move_moved:
+            self._state_compact = True
+            self._save_state()
+        self._refresh_after_move(self._move_moved, self._move_failed)
+        if cancelled:
+            self.status_var.set(f"Movimiento cancelado: {len(self._move_moved)} imágenes movidas a {DELETED_DIRNAME}.")
+
+    def _request_move_cancel(self) -> None:
+        # Se termina el archivo en curso y se aplica lo ya movido.
+        if self._move_cancel is not None:
+            self._move_cancel.set()
+            self._move_text.set("Cancelando...")
+
+    def _cancel_move(self) -> None:
+        # Lo ya movido queda en la papelera y el estado se depura al reabrir.
+        if self._move_cancel is not None:
+            self._move_cancel.set()
+            self._move_cancel = None
+        self._move_generation += 1
+        self._close_move_window()
+
+    def _open_move_window(self, total: int) -> None:
+        self._close_move_window()
+        win = ctk.CTkToplevel(self)
+        self._move_window = win
+        win.title("Moviendo archivos")
+        win.geometry("420x140")
+        win.resizable(False, False)
+        win.transient(self)
+        win.protocol("WM_DELETE_WINDOW", self._request_move_cancel)
+        self._move_text.set(f"Moviendo {total} imágenes a {DELETED_DIRNAME}...")
+        ctk.CTkLabel(win, textvariable=self._move_text, anchor="w").pack(fill="x", padx=14, pady=(14, 6))
+        self._move_progress = ctk.CTkProgressBar(win)
+        self._move_progress.pack(fill="x", padx=14, pady=6)
+        self._move_progress.set(0.0)
+        ctk.CTkButton(win, text="Cancelar", width=110, command=self._request_move_cancel).pack(pady=(6, 12))
+
+    def _close_move_window(self) -> None:
+        if self._move_window and self._move_window.winfo_exists():
+            self._move_window.destroy()
+        self._move_window = None
+        self._move_progress = None
+
+    def _drop_paths_from_caches(self, moved_rel_paths: set[str]) -> None:
+        if not moved_rel_paths or not self.folder:
+            return
+
+        thumb_keys = [key for key in self._thumb_cache if self._rel(key[0]) in moved_rel_paths]
+        for key in thumb_keys:
+            self._thumb_cache.pop(key, None)
+            self._thumb_waiters.pop(key, None)
+            self._thumb_wanted.pop(key, None)
+            self._thumb_pending.discard(key)
+
+        display_keys = [key for key in self._display_cache if self._rel(key[0]) in moved_rel_paths]
+        for key in display_keys:
+            self._display_cache.pop(key, None)
+        for key in [key for key in self._photo_cache if self._rel(key[0]) in moved_rel_paths]:
+            self._photo_cache.pop(key, None)
+        for path in [path for path in self._master_cache if self._rel(path) in moved_rel_paths]:
+            self._master_cache.pop(path, None)
+        if self._read_ahead is not None:
+            for path in [path for path in self._read_ahead if self._rel(path) in moved_rel_paths]:
+                self._read_ahead.discard(path)
+
+    def _apply_move_results(self, moved: list[str], unselected: list[str] | None = None) -> None:
+        moved_set = set(moved)
+        current = self.images[self.index] if self.images and self._scan_pending_start is None else None
+        self._kept_set, self._deleted_set = update_marks_after_move(
+            self._kept_set,
+            self._deleted_set,
+            moved_set,
+            set(unselected or []),
+        )
+        # Cada tanda va al diario; la instantánea se reescribe una vez en _finish_move.
+        self._journal_events.extend({"op": "keep", "rel": rel} for rel in unselected or [])
+        self._journal_events.extend({"op": "unmark", "rel": rel} for rel in moved)
+        removed = [i for i, p in enumerate(self.images) if self._rel(p) in moved_set]
+        self.images = [p for p in self.images if self._rel(p) not in moved_set]
+        if self._quality_sorted:
+            self._name_order = [p for p in self._name_order if self._rel(p) not in moved_set]
+        self._drop_paths_from_caches(moved_set)
+        if current is not None and self._rel(current) not in moved_set:
+            # Con el movimiento en segundo plano se sigue revisando: no perder la imagen actual.
+            self.index = self.images.index(current)
+        if self.index >= len(self.images):
+            self.index = max(0, len(self.images) - 1)
+        self._save_state()
+        if moved_set:
+            # Solo se olvidan las acciones sobre archivos movidos; el resto se reubica.
+            self._history = [
+                replace(action, index_before=action.index_before - bisect.bisect_left(removed, action.index_before))
+                for action in self._history
+                if self._rel(action.src) not in moved_set
+            ]
+
+    def _refresh_after_move(self, moved: list[str], failed: list[str]) -> None:
+        if failed:
+            messagebox.showwarning(
+                "Borrado parcial",
+                "Algunas imágenes no se pudieron mover:\n" + "\n".join(failed[:10]),
+            )
+        if moved:
+            self.status_var.set(f"Movidas {len(moved)} imágenes a {DELETED_DIRNAME}.")
+        else:
+            self.status_var.set("No se movió ninguna imagen.")
+        if self.images:
+            self._schedule_show_current()
+        else:
+            self._clear_canvas("Sin imágenes")
+            self._clear_strip()
+
+    def _flush_deleted_items(self) -> None:
+        if not self.folder:
+            return
+        if not self._deleted_set:
+            messagebox.showinfo("Borrar marcadas", "No hay imágenes marcadas para borrar.")
+            return
+        if not self._deleted_dir():
+            return
+        confirmed = messagebox.askyesno(
+            "Borrar marcadas",
+            f"¿Mover {len(self._deleted_set)} imágenes ya marcadas a {DELETED_DIRNAME}?",
+        )
+        if not confirmed:
+            return
+        self._close_review_window()
+        self._start_move(sorted(self._deleted_set))
+
+    def _show_about(self) -> None:
+        messagebox.showinfo(
+            "Acerca de Trash Image Eraser",
+            (
+                "Revisa imágenes/video y decide qué hacer con cada archivo.\n"
+                "- `D` / `Delete`: marcar para borrar.\n"
+                "- `K` / `Espacio`: marcar para conservar.\n"
+                "- `U`: deshacer última acción.\n"
+                "- `B`: revisar la ráfaga de la foto actual.\n"
+                "- Flechas `←` / `→`: navegar.\n"
+                "- `Borrar marcadas ahora`: mueve ya los archivos con marca de borrado al directorio de eliminados.\n"
+                "- El reproductor de video ofrece barra de progreso, pausa y volumen.\n"
+                "- El progreso se guarda en `.trash_image_eraser_state.json` dentro de la carpeta revisada."
+            ),
+        )
+
+    def _delete_selected_from_review(self) -> None:
+        if not self.folder:
+            return
+        if not self._deleted_dir():
+            return
+        selected = [rel for rel, checked in self._review_selection.items() if checked]
+        unselected = [rel for rel, checked in self._review_selection.items() if not checked]
+        if not selected:
+            messagebox.showinfo("Borrado", "No hay imágenes seleccionadas para borrar.")
+            return
+        if not messagebox.askyesno("Confirmar", f"¿Mover {len(selected)} imágenes a {DELETED_DIRNAME}?"):
+            return
+
+        self._close_review_window()
+        self._start_move(selected, unselected=unselected)
+
+    def _on_close(self) -> None:
+        if messagebox.askokcancel("Salir", "¿Salir de la app?"):
+            self._is_closing = True
+            self._schedule_state_save(immediate=True)
+            for job in (self._resize_job, self._resize_quick_job):
+                if job is not None:
+                    try:
+                        self.after_cancel(job)
+                    except Exception:
+                        LOGGER.debug("No se pudo cancelar un redimensionado al cerrar", exc_info=True)
+            self._resize_job = None
+            self._resize_quick_job = None
+            if self._strip_render_job is not None:
+                try:
+                    self.after_cancel(self._strip_render_job)
+                except Exception:
+                    LOGGER.debug("No se pudo cancelar _strip_render_job al cerrar", exc_info=True)
+                self._strip_render_job = None
+            if self._photo_build_job is not None:
+                try:
+                    self.after_cancel(self._photo_build_job)
+                except Exception:
+                    LOGGER.debug("No se pudo cancelar _photo_build_job al cerrar", exc_info=True)
+                self._photo_build_job = None
+            self._photo_builds.clear()
+            if self._show_job is not None:
+                try:
+                    self.after_cancel(self._show_job)
+                except Exception:
+                    LOGGER.debug("No se pudo cancelar _show_job al cerrar", exc_info=True)
+                self._show_job = None
+            self._cancel_vlc_event_poller()
+            self._stop_video()
+            LOGGER.info("Tiempos de decodificación: %s", DECODE_STATS.summary())
+            LOGGER.info("Caché de visor: %s", self._display_cache.stats())
+            LOGGER.info("Caché de miniaturas: %s", self._thumb_cache.stats())
+            if self._read_ahead is not None:
+                LOGGER.info("Lectura anticipada: %s", self._read_ahead.stats())
+            for job in (self._overlay_job, self._latency_dump_job):
+                if job is not None:
+                    try:
+                        self.after_cancel(job)
+                    except Exception:
+                        LOGGER.debug("No se pudo cancelar un temporizador de latencias", exc_info=True)
+            self._dump_latency(reschedule=False)
+            self._scan_generation += 1
+            self._decoder.shutdown()
+            if self._read_ahead is not None:
+                self._read_ahead.shutdown()
+            self._scan_worker.shutdown(wait=False, cancel_futures=True)
+            self._cancel_move()
+            self._mover.shutdown(wait=False, cancel_futures=True)
+            self._analysis_worker.shutdown(wait=False, cancel_futures=True)
+            self._cancel_quality_job()
+            if self._quality_pool is not None:
+                self._quality_pool.shutdown(wait=False, cancel_futures=True)
+            self._quality_store.close()
+            # Las escrituras pendientes de miniaturas se completan antes de cerrar la base.
+            self._thumb_store_writer.submit(self._thumb_store.close)
+            self._thumb_store_writer.shutdown(wait=False)
+            self.destroy()
@@ -0,0 +1,224 @@
+# Decodificación y puntuación de calidad sin Tk. Es lo único que importan los
+# procesos hijos de los pools (spawn); app.py es un lanzador y no carga gui.py
+# fuera del proceso principal.
+import io
+import os
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from core import LOGGER, _safe_int
+
+try:
+    import pillow_heif
+
+    pillow_heif.register_heif_opener()
+except Exception:
+    pillow_heif = None
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+_EXIF_ORIENTATION_TAG = 0x0112
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+DECODE_REDUCING_GAP = 2.0
+DECODE_STATS_LOG_EVERY = 200
+QUALITY_EDGE = 512
+QUALITY_DARK_LEVEL = 8
+QUALITY_BRIGHT_LEVEL = 247
+
+
+class DecodeStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: dict[str, list[float]] = {}
+        self._count = 0
+
+    def record(self, strategy: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._totals.setdefault(strategy, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            self._count += 1
+            should_log = self._count % DECODE_STATS_LOG_EVERY == 0
+        if should_log:
+            LOGGER.info("Tiempos de decodificación: %s", self.summary())
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                strategy: {
+                    "count": int(count),
+                    "avg_ms": (total / count) * 1000 if count else 0.0,
+                    "max_ms": peak * 1000,
+                }
+                for strategy, (count, total, peak) in self._totals.items()
+            }
+
+    def summary(self) -> str:
+        parts = [
+            f"{strategy}: {data['count']} x {data['avg_ms']:.1f} ms (max {data['max_ms']:.1f} ms)"
+            for strategy, data in sorted(self.snapshot().items())
+        ]
+        return "; ".join(parts) or "sin datos"
+
+
+DECODE_STATS = DecodeStats()
+
+
+def _exif_orientation(img: Image.Image) -> int:
+    try:
+        return _safe_int(img.getexif().get(_EXIF_ORIENTATION_TAG, 1), 1)
+    except Exception:
+        return 1
+
+
+def _decode_full(path: Path | io.BytesIO, box: tuple[int, int]) -> Image.Image:
+    with Image.open(path) as img:
+        frame = ImageOps.exif_transpose(img)
+        if frame.mode not in {"RGB", "RGBA"}:
+            frame = frame.convert("RGB")
+        frame.thumbnail(box, Image.Resampling.LANCZOS)
+        return frame.copy()
+
+
+def _decode_reduced(path: Path | io.BytesIO, box: tuple[int, int]) -> tuple[Image.Image, str]:
+    with Image.open(path) as img:
+        orientation = _exif_orientation(img)
+        # Las orientaciones 5-8 intercambian ejes: el draft se pide en
+        # coordenadas del archivo, antes de rotar.
+        source_box = (box[1], box[0]) if orientation in {5, 6, 7, 8} else box
+        draft_box = (
+            int(source_box[0] * DECODE_REDUCING_GAP),
+            int(source_box[1] * DECODE_REDUCING_GAP),
+        )
+        strategy = "reduce"
+        if img.format == "JPEG":
+            if img.draft(None, draft_box) is not None:
+                strategy = "jpeg-draft"
+        elif img.format in {"HEIF", "AVIF"}:
+            # pillow_heif selecciona en draft() la miniatura embebida más pequeña
+            # que cubra el tamaño pedido; versiones antiguas no lo implementan.
+            strategy = "heif"
+            try:
+                if img.draft(None, draft_box) is not None:
+                    strategy = "heif-thumbnail"
+            except Exception:
+                LOGGER.debug("draft() no disponible para %s", path, exc_info=True)
+        if img.mode not in {"RGB", "RGBA", "L"}:
+            frame = img.convert("RGB")
+        else:
+            frame = img
+        frame.thumbnail(source_box, Image.Resampling.LANCZOS, reducing_gap=DECODE_REDUCING_GAP)
+        if frame is img:
+            frame = img.copy()
+        if frame.mode == "L":
+            frame = frame.convert("RGB")
+        method = _ORIENTATION_TRANSPOSE.get(orientation)
+        if method is not None:
+            frame = frame.transpose(method)
+        return frame, strategy
+
+
+def decode_image(
+    path: Path,
+    box: tuple[int, int],
+    stats: DecodeStats | None = DECODE_STATS,
+    data: bytes | None = None,
+) -> tuple[Image.Image | None, str | None, str]:
+    # Con `data` se decodifica desde memoria; `path` queda para los mensajes.
+    def source() -> Path | io.BytesIO:
+        return path if data is None else io.BytesIO(data)
+
+    box = (max(1, box[0]), max(1, box[1]))
+    started = time.perf_counter()
+    if os.environ.get("TRASH_IMAGE_ERASER_DECODE_STRATEGY") != "full":
+        try:
+            frame, strategy = _decode_reduced(source(), box)
+            if stats is not None:
+                stats.record(strategy, time.perf_counter() - started)
+            return frame, None, strategy
+        except Exception:
+            LOGGER.debug("Decodificación reducida fallida para %s; se usa la completa", path, exc_info=True)
+            started = time.perf_counter()
+    try:
+        frame = _decode_full(source(), box)
+    except Exception as exc:
+        return None, str(exc), "full"
+    if stats is not None:
+        stats.record("full", time.perf_counter() - started)
+    return frame, None, "full"
+
+
+def fit_frame(master: Image.Image, box: tuple[int, int], resample: Image.Resampling) -> Image.Image:
+    # Mismo encaje que decode_image (sin ampliar), pero desde un fotograma en memoria.
+    box = (max(1, box[0]), max(1, box[1]))
+    scale = min(box[0] / master.width, box[1] / master.height, 1.0)
+    size = (max(1, round(master.width * scale)), max(1, round(master.height * scale)))
+    if size == master.size:
+        return master
+    return master.resize(size, resample, reducing_gap=DECODE_REDUCING_GAP)
+
+
+# (modo, tamaño, píxeles crudos, error, estrategia, segundos de decodificación)
+DecodePayload = tuple[str, tuple[int, int], bytes | None, str | None, str, float]
+
+
+def decode_image_payload(path: str, box: tuple[int, int], data: bytes | None = None) -> DecodePayload:
+    # Se ejecuta en un proceso hijo: las estadísticas viajan con el resultado
+    # porque las del hijo no son visibles desde la app.
+    started = time.perf_counter()
+    frame, err, strategy = decode_image(Path(path), box, stats=None, data=data)
+    seconds = time.perf_counter() - started
+    if frame is None:
+        return "", (0, 0), None, err, strategy, seconds
+    return frame.mode, frame.size, frame.tobytes(), None, strategy, seconds
+
+
+# (varianza del laplaciano, fracción de píxeles casi negros, fracción casi blancos)
+QualityMetrics = tuple[float, float, float]
+
+
+def quality_metrics(path: Path) -> QualityMetrics | None:
+    if np is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (QUALITY_EDGE, QUALITY_EDGE))
+            frame = img.convert("L")
+    except Exception:
+        LOGGER.debug("No se pudo puntuar %s", path, exc_info=True)
+        return None
+    # Siempre a la misma escala: la varianza del laplaciano depende de la resolución.
+    frame.thumbnail((QUALITY_EDGE, QUALITY_EDGE), Image.Resampling.BILINEAR, reducing_gap=DECODE_REDUCING_GAP)
+    levels = np.asarray(frame, dtype=np.uint8)
+    if levels.shape[0] < 3 or levels.shape[1] < 3:
+        return None
+    pixels = levels.astype(np.float32)
+    laplacian = (
+        pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:] - 4.0 * pixels[1:-1, 1:-1]
+    )
+    histogram = np.bincount(levels.ravel(), minlength=256)
+    total = float(levels.size)
+    dark = float(histogram[: QUALITY_DARK_LEVEL + 1].sum()) / total
+    bright = float(histogram[QUALITY_BRIGHT_LEVEL:].sum()) / total
+    return float(laplacian.var()), dark, bright
+
+
+def quality_metrics_batch(paths: list[str]) -> list[QualityMetrics | None]:
+    # Punto de entrada de los procesos hijos: rutas como str para serializar poco.
+    return [quality_metrics(Path(path)) for path in paths]
@@ -1,11 +1,69 @@
+import io
+import json
+import os
 import shutil
+import struct
+import subprocess
+import sys
+import threading
 import unittest
 import uuid
-from contextlib import contextmanager
+from contextlib import contextmanager, redirect_stdout
 from pathlib import Path
 
-from app import (
+from PIL import ExifTags, Image, ImageFilter
+
+from gui import (
+    _decode_image_for_view,
+    _view_from_master,
+    BurstGrouper,
+    DecodeBackend,
+    LatencyTracker,
+    LRUCache,
+    PRIORITY_PREFETCH,
+    PRIORITY_REVIEW,
+    PRIORITY_VIEW,
+    PriorityExecutor,
+    QualityStore,
+    ReadAhead,
+    ThumbnailStore,
+    burst_signatures,
+    choose_keeper,
+    decode_image,
+    decode_image_payload,
+    extract_embedded_preview,
+    find_exact_duplicates,
+    find_similar_groups,
+    fit_frame,
+    frame_from_payload,
+    grid_window,
+    image_nbytes,
+    load_thumbnail,
+    perceptual_signature,
+    prefetch_order,
+    prefetch_window,
+    quality_metrics,
+    quality_order,
+    quality_score,
+    timed_call,
+)
+from cli import main as cli_main
+from core import (
+    DELETED_DIRNAME,
+    INDEX_FILENAME,
+    JOURNAL_FILENAME,
+    MANIFEST_FILENAME,
+    STATE_FILENAME,
+    MEDIA_EXTS,
+    DeletedNameIndex,
+    DirectoryIndex,
+    StateJournal,
     has_state_progress,
+    iter_media_batches,
+    iter_move_to_deleted,
+    iter_restore_deleted,
+    load_manifest,
+    move_file,
     resolve_initial_index,
     sanitize_state_payload,
     scan_media_files,
@@ -26,6 +84,18 @@ def _workspace_tempdir() -> Path:
         shutil.rmtree(temp_dir, ignore_errors=True)
 
 
+def _exif_with_thumbnail(thumbnail: Image.Image, orientation: int) -> bytes:
+    data = io.BytesIO()
+    thumbnail.save(data, format="JPEG")
+    payload = data.getvalue()
+    ifd0_offset = 8
+    ifd1_offset = ifd0_offset + 2 + 12 + 4
+    data_offset = ifd1_offset + 2 + 2 * 12 + 4
+    ifd0 = struct.pack("<HHHIHHI", 1, 0x0112, 3, 1, orientation, 0, ifd1_offset)
+    ifd1 = struct.pack("<HHHIIHHIII", 2, 0x0201, 4, 1, data_offset, 0x0202, 4, 1, len(payload), 0)
+    return b"Exif\x00\x00II*\x00" + struct.pack("<I", ifd0_offset) + ifd0 + ifd1 + payload
+
+
 class AppLogicTests(unittest.TestCase):
     def test_sanitize_state_payload_removes_missing_and_conflicts(self) -> None:
         with _workspace_tempdir() as folder:
@@ -93,6 +163,18 @@ class AppLogicTests(unittest.TestCase):
             candidate = unique_target_path(base)
             self.assertEqual(candidate.name, "photo (2).jpg")
 
+    def test_deleted_name_index_picks_free_names_without_probing(self) -> None:
+        with _workspace_tempdir() as folder:
+            for name in ("IMG_0001.JPG", "IMG_0001 (1).JPG", "other.png"):
+                (folder / name).write_bytes(b"x")
+            names = DeletedNameIndex(folder)
+            self.assertEqual(names.reserve("IMG_0001.JPG").name, "IMG_0001 (2).JPG")
+            self.assertEqual(names.reserve("img_0001.jpg").name, "img_0001 (3).jpg")
+            self.assertEqual(names.reserve("IMG_0001.JPG").name, "IMG_0001 (4).JPG")
+            self.assertEqual(names.reserve("new.png").name, "new.png")
+            names.release("new.png")
+            self.assertEqual(names.reserve("new.png").name, "new.png")
+
     def test_update_marks_after_move_keeps_state_consistent(self) -> None:
         kept = {"keep.jpg", "unselected.jpg", "moved.jpg"}
         deleted = {"delete.jpg", "unselected.jpg", "moved.jpg"}
@@ -106,6 +188,655 @@ class AppLogicTests(unittest.TestCase):
         self.assertNotIn("unselected.jpg", new_deleted)
         self.assertIn("delete.jpg", new_deleted)
 
+    def test_thumbnail_store_roundtrip_and_stale_stamp(self) -> None:
+        with _workspace_tempdir() as folder:
+            store = ThumbnailStore(folder / "thumbs.sqlite3", budget_bytes=10_000_000)
+            frame = Image.new("RGB", (64, 48), "#336699")
+            store.put("root", "a.jpg", 64, (100, 5), frame)
+
+            hit = store.get("root", "a.jpg", 64, (100, 5))
+            self.assertIsNotNone(hit)
+            self.assertEqual(hit.size, (64, 48))
+            self.assertIsNone(store.get("root", "a.jpg", 64, (100, 6)))
+            self.assertIsNone(store.get("root", "a.jpg", 150, (100, 5)))
+            self.assertIsNone(store.get("other", "a.jpg", 64, (100, 5)))
+            store.close()
+
+    def test_thumbnail_store_evicts_least_recently_used(self) -> None:
+        with _workspace_tempdir() as folder:
+            store = ThumbnailStore(folder / "thumbs.sqlite3", budget_bytes=1)
+            store.put("root", "a.jpg", 64, (1, 1), Image.new("RGB", (64, 64), "red"))
+            store.put("root", "b.jpg", 64, (1, 1), Image.new("RGB", (64, 64), "blue"))
+            self.assertIsNone(store.get("root", "a.jpg", 64, (1, 1)))
+            self.assertLessEqual(store.total_bytes, 1)
+            store.close()
+
+    def test_load_thumbnail_reads_store_before_decoding(self) -> None:
+        with _workspace_tempdir() as folder:
+            source = folder / "photo.png"
+            Image.new("RGB", (400, 300), "green").save(source)
+            store = ThumbnailStore(folder / "thumbs.sqlite3", budget_bytes=10_000_000)
+
+            frame, err, stamp = load_thumbnail(source, 64, store, "root", "photo.png")
+            self.assertIsNone(err)
+            self.assertIsNotNone(stamp)
+            self.assertEqual(max(frame.size), 64)
+            store.put("root", "photo.png", 64, stamp, frame)
+
+            cached, _err, cached_stamp = load_thumbnail(source, 64, store, "root", "photo.png")
+            self.assertIsNotNone(cached)
+            self.assertIsNone(cached_stamp)
+            store.close()
+
+    def test_decode_image_uses_jpeg_draft_and_applies_orientation(self) -> None:
+        with _workspace_tempdir() as folder:
+            source = folder / "rotated.jpg"
+            exif = Image.Exif()
+            exif[0x0112] = 6
+            Image.new("RGB", (1600, 1200), "orange").save(source, quality=90, exif=exif)
+
+            frame, err, strategy = decode_image(source, (64, 64))
+            self.assertIsNone(err)
+            self.assertEqual(strategy, "jpeg-draft")
+            self.assertEqual(frame.size, (48, 64))
+
+    def test_decode_image_reduces_other_formats(self) -> None:
+        with _workspace_tempdir() as folder:
+            source = folder / "palette.png"
+            Image.new("P", (900, 300)).save(source)
+
+            frame, err, strategy = decode_image(source, (150, 150))
+            self.assertIsNone(err)
+            self.assertEqual(strategy, "reduce")
+            self.assertEqual(frame.mode, "RGB")
+            self.assertEqual(frame.size, (150, 50))
+
+    def test_view_frames_derive_from_master_without_reading_again(self) -> None:
+        with _workspace_tempdir() as folder:
+            source = folder / "big.png"
+            Image.linear_gradient("L").resize((1600, 1200)).convert("RGB").save(source)
+            frame, err = _decode_image_for_view(source, 420, 320)
+            self.assertIsNone(err)
+            self.assertEqual(frame.size, (400, 300))
+            master, err, _strategy = decode_image(source, (1000, 1000))
+            self.assertIsNone(err)
+            self.assertEqual(master.size, (1000, 750))
+
+            source.unlink()
+            self.assertEqual(_view_from_master(master, 420, 320)[0].size, (400, 300))
+            self.assertEqual(fit_frame(master, (780, 780), Image.Resampling.BILINEAR).size, (780, 585))
+            # Nunca se amplía por encima del maestro.
+            self.assertIs(fit_frame(master, (3000, 3000), Image.Resampling.LANCZOS), master)
+
+    def test_read_ahead_buffers_window_and_decodes_from_memory(self) -> None:
+        with _workspace_tempdir() as folder:
+            paths = []
+            for i in range(3):
+                path = folder / f"img_{i}.png"
+                Image.new("RGB", (300, 200), (i * 80, 0, 0)).save(path)
+                paths.append(path)
+            read_ahead = ReadAhead(1024 * 1024, max_inflight=2)
+            try:
+                read_ahead.schedule(paths)
+                # Si la lectura sigue en vuelo, take() espera a ella.
+                data = read_ahead.take(paths[0])
+                self.assertEqual(data, paths[0].read_bytes())
+                paths[0].unlink()
+                frame, err, _strategy = decode_image(paths[0], (150, 150), data=data)
+                self.assertIsNone(err)
+                self.assertEqual(frame.size, (150, 100))
+                # Entregado una vez: el decodificador no lo vuelve a recibir.
+                self.assertIsNone(read_ahead.take(paths[0]))
+                self.assertEqual(read_ahead.take(paths[2]), paths[2].read_bytes())
+                stats = read_ahead.stats()
+                self.assertEqual(stats["hits"], 2)
+                self.assertEqual(stats["misses"], 1)
+
+                # Un fallo ya se leyó del disco: no se vuelve a traer por la red.
+                late = ReadAhead(1024 * 1024, max_inflight=1)
+                try:
+                    self.assertIsNone(late.take(paths[1]))
+                    late.schedule([paths[1]])
+                    self.assertEqual(late.stats()["inflight"], 0)
+                    self.assertEqual(late.stats()["bytes"], 0)
+                finally:
+                    late.shutdown()
+
+                # Lo que no cabe en el presupuesto se deja para la lectura normal.
+                tight = ReadAhead(16, max_inflight=1)
+                try:
+                    tight.schedule([paths[1]])
+                    self.assertIsNone(tight.take(paths[1]))
+                    self.assertEqual(tight.stats()["bytes"], 0)
+                finally:
+                    tight.shutdown()
+            finally:
+                read_ahead.shutdown()
+
+    def test_extract_embedded_preview_uses_exif_thumbnail(self) -> None:
+        with _workspace_tempdir() as folder:
+            source = folder / "camera.jpg"
+            exif = _exif_with_thumbnail(Image.new("RGB", (160, 120), "red"), orientation=6)
+            Image.new("RGB", (1600, 1200), "blue").save(source, exif=exif)
+
+            preview = extract_embedded_preview(source, (300, 400))
+            self.assertIsNotNone(preview)
+            self.assertEqual(preview.size, (300, 400))
+            self.assertGreater(preview.getpixel((150, 200))[0], 200)
+
+            plain = folder / "plain.png"
+            Image.new("RGB", (400, 300)).save(plain)
+            self.assertIsNone(extract_embedded_preview(plain, (300, 400)))
+
+    def test_prefetch_window_adapts_to_decode_and_navigation_speed(self) -> None:
+        self.assertEqual(prefetch_window(0, 0.5, 0.1), 0)
+        self.assertEqual(prefetch_window(6, 0.3, None), 2)
+        self.assertEqual(prefetch_window(6, 0.3, 1.0), 2)
+        self.assertEqual(prefetch_window(6, 0.3, 0.1), 4)
+        self.assertEqual(prefetch_window(6, 2.0, 0.1), 6)
+
+    def test_prefetch_order_follows_direction_and_bounds(self) -> None:
+        self.assertEqual(prefetch_order(5, 10, 1, 3, 1), [6, 7, 8, 4])
+        self.assertEqual(prefetch_order(5, 10, -1, 3, 1), [4, 3, 2, 6])
+        self.assertEqual(prefetch_order(8, 10, 1, 3, 2), [9, 7, 6])
+
+    def test_grid_window_builds_only_rows_near_viewport(self) -> None:
+        # 5000 elementos en 4 columnas; la vista muestra las filas 10 a 12.
+        wanted, visible = grid_window(5000, 4, top=2500, height=700, row_height=250, overscan=1)
+        self.assertEqual((wanted.start, wanted.stop), (36, 56))
+        self.assertEqual((visible.start, visible.stop), (40, 52))
+        wanted, visible = grid_window(10, 4, top=0, height=2000, row_height=250, overscan=1)
+        self.assertEqual((wanted.start, wanted.stop), (0, 10))
+        self.assertEqual((visible.start, visible.stop), (0, 10))
+
+    def test_lru_cache_evicts_least_recently_used_by_bytes(self) -> None:
+        cache: LRUCache[str, Image.Image] = LRUCache(budget_bytes=3 * 10 * 10 * 3, sizeof=image_nbytes)
+        for name in ("a", "b", "c"):
+            cache.put(name, Image.new("RGB", (10, 10)))
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("d", Image.new("RGB", (10, 10)))
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.total_bytes, 900)
+        self.assertIsNone(cache.get("b"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 1, 1))
+
+    def test_lru_cache_keeps_single_oversized_entry(self) -> None:
+        cache: LRUCache[str, str] = LRUCache(budget_bytes=100)
+        cache.put("small", "x", nbytes=60)
+        cache.put("huge", "y", nbytes=500)
+        self.assertEqual(list(cache), ["huge"])
+        self.assertEqual(cache.pop("huge"), "y")
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_iter_media_batches_streams_in_sorted_order(self) -> None:
+        with _workspace_tempdir() as folder:
+            names = ["b.jpg", "a/z.png", "a.jpg", "a/b/c.gif", "c/d.mp4", "a b.jpg", "notes.txt"]
+            for name in names:
+                target = folder / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(b"x")
+            (folder / "_deleted_by_trash_image_eraser").mkdir()
+            (folder / "_deleted_by_trash_image_eraser" / "old.jpg").write_bytes(b"x")
+
+            batches = list(iter_media_batches(folder, batch_size=2))
+            streamed = [path for batch in batches for path in batch]
+
+            self.assertEqual(len(batches[0]), 1)
+            self.assertTrue(all(len(batch) <= 2 for batch in batches))
+            self.assertEqual(streamed, sorted(streamed))
+            self.assertEqual(streamed, scan_media_files(folder))
+            self.assertEqual(len(streamed), 6)
+
+    def test_directory_index_reuses_unchanged_directories(self) -> None:
+        with _workspace_tempdir() as folder:
+            for name in ("a/one.jpg", "a/two.jpg", "b/three.png"):
+                target = folder / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(b"x")
+            index_path = folder / INDEX_FILENAME
+
+            first = DirectoryIndex(MEDIA_EXTS)
+            initial = [p for batch in iter_media_batches(folder, index=first) for p in batch]
+            first.save(index_path)
+            self.assertEqual(first.listed_dirs, 3)
+
+            (folder / "b" / "four.jpg").write_bytes(b"x")
+            previous = DirectoryIndex.load(index_path, MEDIA_EXTS)
+            second = DirectoryIndex(MEDIA_EXTS)
+            rescanned = [p for batch in iter_media_batches(folder, previous=previous, index=second) for p in batch]
+
+            self.assertEqual(second.reused_dirs, 1)
+            self.assertIn("a", second.dirs)
+            self.assertEqual(rescanned, sorted(initial + [folder / "b" / "four.jpg"]))
+            size, _mtime = next(item[2:] for item in second.dirs["a"][1] if item[0] == "one.jpg")
+            self.assertEqual(size, 1)
+
+    def test_directory_index_ignores_mismatched_extensions(self) -> None:
+        with _workspace_tempdir() as folder:
+            index = DirectoryIndex({".jpg"})
+            index.dirs[""] = (1, [])
+            index.save(folder / INDEX_FILENAME)
+            self.assertEqual(DirectoryIndex.load(folder / INDEX_FILENAME, {".png"}).dirs, {})
+            self.assertEqual(DirectoryIndex.load(folder / INDEX_FILENAME, {".jpg"}).dirs, {"": (1, [])})
+
+    def test_perceptual_signature_matches_resized_copy(self) -> None:
+        with _workspace_tempdir() as folder:
+            original = Image.linear_gradient("L").rotate(90).resize((800, 600)).convert("RGB")
+            original.save(folder / "original.jpg", quality=95)
+            original.resize((400, 300)).save(folder / "small.png")
+            original.transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(folder / "flipped.jpg")
+
+            big = perceptual_signature(folder / "original.jpg")
+            small = perceptual_signature(folder / "small.png")
+            flipped = perceptual_signature(folder / "flipped.jpg")
+
+            self.assertEqual(big[1], 800 * 600)
+            self.assertLessEqual((big[0] ^ small[0]).bit_count(), 2)
+            groups = find_similar_groups([big[0], small[0], flipped[0]])
+            self.assertEqual(groups, [[0, 1]])
+            self.assertEqual(choose_keeper([small, big]), 1)
+
+    def test_find_similar_groups_links_transitively(self) -> None:
+        base = 0x0123456789ABCDEF
+        hashes = [base, base ^ 0b111, base ^ 0b111 ^ (0b111 << 40), ~base & (2**64 - 1), base ^ (2**64 - 1) ^ 1]
+        self.assertEqual(find_similar_groups(hashes, max_distance=3), [[0, 1, 2], [3, 4]])
+        self.assertEqual(find_similar_groups(hashes, max_distance=0), [])
+
+    def test_find_exact_duplicates_uses_staged_hashes(self) -> None:
+        with _workspace_tempdir() as folder:
+            big = bytes(range(256)) * 1024
+            variant = big[:100_000] + b"?" + big[100_001:]
+            contents = {
+                "a.jpg": big,
+                "copy/a.jpg": big,
+                "b.jpg": variant,
+                "small1.png": b"tiny",
+                "small2.png": b"tiny",
+                "other.png": b"tinx",
+                "empty1.jpg": b"",
+                "empty2.jpg": b"",
+            }
+            files = []
+            for name, data in contents.items():
+                target = folder / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(data)
+                files.append((target, len(data)))
+
+            groups = find_exact_duplicates(files, max_workers=2)
+            self.assertEqual(
+                groups,
+                [[folder / "a.jpg", folder / "copy" / "a.jpg"], [folder / "small1.png", folder / "small2.png"]],
+            )
+            self.assertEqual(find_exact_duplicates(files, cancelled=lambda: True), [])
+
+            # Tamaños del índice anteriores a una edición: no basta con el hash parcial.
+            (folder / "grown1.jpg").write_bytes(big + b"1")
+            (folder / "grown2.jpg").write_bytes(big + b"2")
+            stale = [(folder / "grown1.jpg", 4), (folder / "grown2.jpg", 4)]
+            self.assertEqual(find_exact_duplicates(stale), [])
+
+    def test_directory_index_file_stats_match_scanned_paths(self) -> None:
+        with _workspace_tempdir() as folder:
+            (folder / "a").mkdir()
+            (folder / "a" / "one.jpg").write_bytes(b"abc")
+            (folder / "two.png").write_bytes(b"x")
+            index = DirectoryIndex(MEDIA_EXTS)
+            scanned = [p for batch in iter_media_batches(folder, index=index) for p in batch]
+            stats = index.file_stats(folder)
+            self.assertEqual(set(stats), set(scanned))
+            self.assertEqual(stats[folder / "a" / "one.jpg"][0], 3)
+
+            # Un listado reutilizado no aporta tamaños: el archivo pudo editarse en su sitio.
+            (folder / "a" / "one.jpg").write_bytes(b"abcdef")
+            reused = DirectoryIndex(MEDIA_EXTS)
+            for _batch in iter_media_batches(folder, previous=index, index=reused):
+                pass
+            self.assertEqual(reused.reused_dirs, 2)
+            self.assertEqual(reused.file_stats(folder), {})
+
+    def test_quality_score_ranks_blurred_and_dark_images_first(self) -> None:
+        with _workspace_tempdir() as folder:
+            sharp = Image.new("L", (400, 300), 128)
+            for x in range(0, 400, 8):
+                sharp.paste(40 if (x // 8) % 2 else 215, (x, 0, x + 4, 300))
+            sharp = sharp.convert("RGB")
+            sharp.save(folder / "sharp.png")
+            sharp.filter(ImageFilter.GaussianBlur(6)).save(folder / "blurred.png")
+            Image.new("RGB", (400, 300), (3, 3, 3)).save(folder / "dark.png")
+
+            metrics = {name: quality_metrics(folder / name) for name in ("sharp.png", "blurred.png", "dark.png")}
+            self.assertGreater(metrics["sharp.png"][0], metrics["blurred.png"][0] * 10)
+            self.assertGreater(metrics["dark.png"][1], 0.99)
+            scores = {folder / name: quality_score(value) for name, value in metrics.items()}
+            self.assertEqual(scores[folder / "dark.png"], 0.0)
+
+            video = folder / "clip.mp4"
+            ordered = quality_order([folder / "blurred.png", video, folder / "dark.png", folder / "sharp.png"], scores)
+            self.assertEqual(ordered, [folder / "dark.png", folder / "blurred.png", folder / "sharp.png", video])
+
+    def test_quality_store_invalidates_changed_files(self) -> None:
+        with _workspace_tempdir() as folder:
+            store = QualityStore(folder / "quality.sqlite3")
+            try:
+                store.put_many("root", [("a.jpg", (10, 1), (5.0, 0.1, 0.0)), ("b.jpg", (20, 2), (1.0, 0.0, 0.5))])
+                found = store.get_many("root", {"a.jpg": (10, 1), "b.jpg": (20, 3), "c.jpg": (1, 1)})
+                self.assertEqual(found, {"a.jpg": (5.0, 0.1, 0.0)})
+                self.assertEqual(store.get_many("other", {"a.jpg": (10, 1)}), {})
+            finally:
+                store.close()
+
+    def test_burst_grouper_splits_on_time_gap_and_content(self) -> None:
+        with _workspace_tempdir() as folder:
+            scene = Image.linear_gradient("L").convert("RGB").resize((120, 90))
+            other = scene.transpose(Image.Transpose.ROTATE_270).resize((120, 90))
+            shots = [
+                ("IMG_0001.jpg", scene, "10:00:00", "10"),
+                ("IMG_0002.jpg", scene, "10:00:00", "45"),
+                ("IMG_0003.jpg", scene, "10:00:01", "20"),
+                ("IMG_0004.jpg", other, "10:00:01", "60"),
+                ("IMG_0005.jpg", other, "10:00:02", "00"),
+                ("IMG_0006.jpg", other, "10:05:00", "00"),
+                ("IMG_0007.png", other, None, None),
+            ]
+            paths = []
+            for name, frame, taken, subsec in shots:
+                target = folder / name
+                if taken is None:
+                    frame.save(target)
+                else:
+                    exif = Image.Exif()
+                    exif.get_ifd(ExifTags.IFD.Exif)[0x9003] = f"2024:05:01 {taken}"
+                    exif.get_ifd(ExifTags.IFD.Exif)[0x9291] = subsec
+                    frame.save(target, exif=exif.tobytes())
+                paths.append(target)
+
+            signatures = burst_signatures(paths + [folder / "clip.mp4"])
+            self.assertAlmostEqual(signatures[1][0] - signatures[0][0], 0.35, places=6)
+            self.assertIsNone(signatures[6][0])
+            self.assertEqual(signatures[7], (None, None))
+
+            grouper = BurstGrouper()
+            bursts = [closed for path, sig in zip(paths, signatures) if (closed := grouper.feed(path, sig))]
+            final = grouper.finish()
+            if final:
+                bursts.append(final)
+            self.assertEqual(bursts, [paths[0:3], paths[3:5]])
+
+    def test_cli_applies_deletions_and_restores_without_tk(self) -> None:
+        def _run(*argv: str) -> tuple[int, list[dict]]:
+            out = io.StringIO()
+            with redirect_stdout(out):
+                code = cli_main(list(argv))
+            return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+        with _workspace_tempdir() as folder:
+            (folder / "sub").mkdir()
+            for rel in ("a.jpg", "b.jpg", "sub/c.png"):
+                (folder / rel).write_bytes(rel.encode())
+            (folder / STATE_FILENAME).write_text(
+                json.dumps({"index": 1, "kept": ["a.jpg"], "deleted": ["b.jpg", "sub/c.png", "gone.jpg"]}),
+                encoding="utf-8",
+            )
+
+            code, events = _run("status", str(folder))
+            self.assertEqual(code, 0)
+            self.assertEqual(events[-1], {"event": "status", "files": 3, "index": 1, "kept": 1, "deleted": 2, "pending": 0})
+
+            code, events = _run("apply-deletions", str(folder))
+            self.assertEqual(code, 1)
+            self.assertEqual([e["event"] for e in events], ["moved", "failed", "moved", "done"])
+            self.assertTrue((folder / DELETED_DIRNAME / "c.png").exists())
+            state = json.loads((folder / STATE_FILENAME).read_text(encoding="utf-8"))
+            self.assertEqual(state["deleted"], ["gone.jpg"])
+
+            code, events = _run("restore", str(folder), "c.png")
+            self.assertEqual(code, 0)
+            self.assertEqual(events[0], {"event": "restored", "name": "c.png", "path": str(Path("sub/c.png"))})
+            self.assertTrue((folder / "sub" / "c.png").exists())
+
+        probe = "import sys, cli; print('customtkinter' in sys.modules or 'PIL' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_pool_children_skip_gui_and_log_file(self) -> None:
+        # Un hijo "spawn" vuelve a ejecutar app.py como __mp_main__ e importa core.
+        root = Path(__file__).resolve().parent.parent
+        probe = (
+            "import multiprocessing, runpy, sys\n"
+            "from logging.handlers import RotatingFileHandler\n"
+            "def child(app_path):\n"
+            "    runpy.run_path(app_path, run_name='__mp_main__')\n"
+            "    import core\n"
+            "    return ('customtkinter' in sys.modules or 'gui' in sys.modules,\n"
+            "            any(isinstance(h, RotatingFileHandler) for h in core.LOGGER.handlers))\n"
+            "if __name__ == '__main__':\n"
+            "    with multiprocessing.get_context('spawn').Pool(1) as pool:\n"
+            "        print(pool.apply(child, (sys.argv[1],)))\n"
+        )
+        with _workspace_tempdir() as folder:
+            script = folder / "probe.py"
+            script.write_text(probe, encoding="utf-8")
+            result = subprocess.run(
+                [sys.executable, str(script), str(root / "app.py")],
+                cwd=root,
+                env={**os.environ, "PYTHONPATH": str(root)},
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=60,
+            )
+        self.assertEqual(result.stdout.strip(), "(False, False)")
+
+    def test_quality_pool_runs_from_launcher_without_gui(self) -> None:
+        # El hijo arranca con app.py como script principal, igual que en la app.
+        root = Path(__file__).resolve().parent.parent
+        probe = (
+            "import multiprocessing, sys\n"
+            "from concurrent.futures import ProcessPoolExecutor\n"
+            "import imaging\n"
+            "if __name__ == '__main__':\n"
+            "    sys.modules['__main__'].__file__ = sys.argv[1]\n"
+            "    ctx = multiprocessing.get_context('spawn')\n"
+            "    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:\n"
+            "        metrics = pool.submit(imaging.quality_metrics_batch, [sys.argv[2]]).result()\n"
+            "        loaded = pool.submit(eval, \"sorted({'customtkinter', 'tkinter', 'vlc', 'gui'} & set(__import__('sys').modules))\").result()\n"
+            "    print(metrics[0] is not None, loaded)\n"
+        )
+        with _workspace_tempdir() as folder:
+            Image.new("RGB", (64, 48), (120, 90, 60)).save(folder / "a.jpg")
+            script = folder / "probe.py"
+            script.write_text(probe, encoding="utf-8")
+            result = subprocess.run(
+                [sys.executable, str(script), str(root / "app.py"), str(folder / "a.jpg")],
+                cwd=root,
+                env={**os.environ, "PYTHONPATH": str(root)},
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=60,
+            )
+        self.assertEqual(result.stdout.strip(), "True []")
+
+    def test_manifest_restores_batches_to_original_paths(self) -> None:
+        with _workspace_tempdir() as folder:
+            for rel in ("x/IMG_1.jpg", "y/IMG_1.jpg", "y/IMG_2.jpg"):
+                (folder / rel).parent.mkdir(exist_ok=True)
+                (folder / rel).write_bytes(rel.encode())
+            list(iter_move_to_deleted(folder, ["x/IMG_1.jpg"], batch="first"))
+            list(iter_move_to_deleted(folder, ["y/IMG_1.jpg", "y/IMG_2.jpg"], batch="second"))
+            deleted_dir = folder / DELETED_DIRNAME
+            (deleted_dir / "legacy.jpg").write_bytes(b"old")
+
+            entries = load_manifest(deleted_dir)
+            self.assertEqual(entries["IMG_1 (1).jpg"]["rel"], "y/IMG_1.jpg")
+            self.assertEqual(entries["IMG_1.jpg"]["size"], len(b"x/IMG_1.jpg"))
+
+            restored = list(iter_restore_deleted(folder, batch="second", under="y"))
+            self.assertEqual(
+                restored, [("IMG_1 (1).jpg", str(Path("y/IMG_1.jpg")), None), ("IMG_2.jpg", str(Path("y/IMG_2.jpg")), None)]
+            )
+            self.assertEqual((folder / "y" / "IMG_1.jpg").read_bytes(), b"y/IMG_1.jpg")
+            self.assertEqual(list(load_manifest(deleted_dir)), ["IMG_1.jpg"])
+
+            restored = {name: rel for name, rel, _error in iter_restore_deleted(folder)}
+            self.assertEqual(restored, {"IMG_1.jpg": str(Path("x/IMG_1.jpg")), "legacy.jpg": "legacy.jpg"})
+            self.assertEqual(load_manifest(deleted_dir), {})
+
+            # Un manifiesto manipulado no puede sacar archivos de la carpeta revisada.
+            (deleted_dir / "evil.jpg").write_bytes(b"evil")
+            with (deleted_dir / MANIFEST_FILENAME).open("a", encoding="utf-8") as manifest:
+                manifest.write(json.dumps({"name": "evil.jpg", "rel": "../escaped.jpg"}) + "\n")
+            restored = list(iter_restore_deleted(folder, batch=None))
+            self.assertEqual(restored, [("evil.jpg", None, "ruta fuera de la carpeta revisada")])
+            self.assertEqual(list(iter_restore_deleted(folder, ["../outside.jpg"]))[0][2], "ruta fuera de la carpeta revisada")
+            self.assertFalse((folder.parent / "escaped.jpg").exists())
+            self.assertTrue((deleted_dir / "evil.jpg").exists())
+
+    def test_move_file_copies_and_verifies_across_devices(self) -> None:
+        with _workspace_tempdir() as folder:
+            src = folder / "a.jpg"
+            src.write_bytes(b"x" * 4096)
+            target = folder / "b.jpg"
+            move_file(src, target, same_device=False)
+            self.assertFalse(src.exists())
+            self.assertEqual(target.read_bytes(), b"x" * 4096)
+
+            move_file(target, src, same_device=True)
+            self.assertTrue(src.exists())
+            self.assertFalse(target.exists())
+            with self.assertRaises(FileNotFoundError):
+                move_file(folder / "missing.jpg", target, same_device=False)
+            self.assertFalse(target.exists())
+
+    def test_move_reads_paths_lazily_so_unmarked_files_stay(self) -> None:
+        with _workspace_tempdir() as folder:
+            for name in ("a.jpg", "b.jpg", "c.jpg"):
+                (folder / name).write_bytes(name.encode())
+            unmarked: set[str] = set()
+            moves = iter_move_to_deleted(folder, (rel for rel in ["a.jpg", "b.jpg", "c.jpg"] if rel not in unmarked))
+            self.assertEqual(next(moves), ("a.jpg", None))
+            # Desmarcado mientras el movimiento sigue en curso.
+            unmarked.add("b.jpg")
+            self.assertEqual(list(moves), [("c.jpg", None)])
+            self.assertTrue((folder / "b.jpg").exists())
+
+    def test_state_journal_replays_events_over_legacy_snapshot(self) -> None:
+        with _workspace_tempdir() as folder:
+            (folder / STATE_FILENAME).write_text(
+                json.dumps({"index": 2, "kept": ["a.jpg"], "deleted": ["b.jpg"]}), encoding="utf-8"
+            )
+            journal = StateJournal(folder)
+            journal.append(
+                [
+                    {"op": "delete", "rel": "a.jpg"},
+                    {"op": "unmark", "rel": "b.jpg"},
+                    {"op": "keep", "rel": "c.jpg"},
+                    {"op": "index", "value": 5},
+                ]
+            )
+            # Última línea cortada por un cierre abrupto.
+            with (folder / JOURNAL_FILENAME).open("a", encoding="utf-8") as handle:
+                handle.write('{"op": "delete", "re')
+
+            reloaded = StateJournal(folder)
+            state = reloaded.load()
+            self.assertEqual(state, {"index": 5, "kept": ["c.jpg"], "deleted": ["a.jpg"]})
+            self.assertEqual(reloaded.events, 4)
+
+            reloaded.compact(state)
+            self.assertFalse((folder / JOURNAL_FILENAME).exists())
+            snapshot = json.loads((folder / STATE_FILENAME).read_text(encoding="utf-8"))
+            self.assertEqual(snapshot, {**state, "journal_epoch": 1})
+            self.assertEqual(StateJournal(folder).load(), state)
+
+            # Corte entre la instantánea nueva y el borrado del diario: el diario viejo no se reaplica.
+            reloaded.append([{"op": "delete", "rel": "c.jpg"}])
+            stale_journal = (folder / JOURNAL_FILENAME).read_bytes()
+            kept_again = {"index": 5, "kept": ["c.jpg"], "deleted": ["a.jpg"]}
+            reloaded.compact(kept_again)
+            (folder / JOURNAL_FILENAME).write_bytes(stale_journal)
+            self.assertEqual(StateJournal(folder).load(), kept_again)
+
+    def test_process_decode_backend_matches_thread_backend(self) -> None:
+        with _workspace_tempdir() as folder:
+            source = folder / "photo.png"
+            Image.linear_gradient("L").convert("RGBA").resize((640, 480)).save(source)
+
+            payload = decode_image_payload(str(source), (200, 200))
+            self.assertEqual(payload[:2], ("RGBA", (200, 150)))
+            self.assertEqual(len(payload[2]), 200 * 150 * 4)
+            missing = frame_from_payload(decode_image_payload(str(folder / "missing.png"), (200, 200)))
+            self.assertIsNone(missing[0])
+            self.assertTrue(missing[1])
+
+            expected, _err, _strategy = decode_image(source, (200, 200))
+            backend = DecodeBackend("process", workers=1)
+            try:
+                self.assertEqual(backend.mode, "process")
+                frame, err = backend.submit(load_thumbnail, source, 200, None, "", "", backend.decode).result()[:2]
+            finally:
+                backend.shutdown()
+            self.assertIsNone(err)
+            self.assertEqual(frame.tobytes(), expected.tobytes())
+            self.assertEqual(DecodeBackend("thread").mode, "thread")
+
+    def test_priority_executor_runs_visible_first_and_drops_stale_jobs(self) -> None:
+        executor = PriorityExecutor(1, "test-loader")
+        gate = threading.Event()
+        ran: list[str] = []
+        try:
+            blocker = executor.submit(gate.wait)
+            review = executor.submit(ran.append, "review", priority=PRIORITY_REVIEW)
+            stale = executor.submit(ran.append, "stale", priority=PRIORITY_PREFETCH, stale=lambda: True)
+            prefetch = executor.submit(ran.append, "prefetch", priority=PRIORITY_PREFETCH)
+            view = executor.submit(ran.append, "view", priority=PRIORITY_VIEW)
+            gate.set()
+            for future in (blocker, review, prefetch, view):
+                future.result(timeout=5)
+            self.assertTrue(stale.cancelled())
+            self.assertEqual(ran, ["view", "prefetch", "review"])
+
+            # Al cambiar de carpeta se descarta todo lo encolado, no lo que ya corre.
+            gate.clear()
+            started = threading.Event()
+            executor.submit(lambda: (started.set(), gate.wait()))
+            started.wait(timeout=5)
+            queued = [executor.submit(ran.append, "old") for _ in range(3)]
+            self.assertEqual(executor.cancel_pending(), 3)
+            self.assertEqual(executor.pending(), 0)
+            self.assertTrue(all(future.cancelled() for future in queued))
+        finally:
+            gate.set()
+            executor.shutdown()
+
+    def test_latency_tracker_percentiles_over_rolling_window(self) -> None:
+        tracker = LatencyTracker(window=100)
+        for ms in range(1, 201):
+            tracker.record("view.work", ms / 1000)
+        stats = tracker.snapshot()["view.work"]
+        self.assertEqual(stats["count"], 200)
+        self.assertAlmostEqual(stats["p50_ms"], 150.0)
+        self.assertAlmostEqual(stats["p95_ms"], 195.0)
+        self.assertAlmostEqual(stats["p99_ms"], 199.0)
+        self.assertAlmostEqual(stats["max_ms"], 200.0)
+
+        self.assertEqual(timed_call(tracker, "thumb", 0.0, max, 3, 7), 7)
+        with self.assertRaises(ZeroDivisionError):
+            timed_call(tracker, "thumb", 0.0, lambda: 1 / 0)
+        snapshot = tracker.snapshot()
+        self.assertEqual(snapshot["thumb.queue"]["count"], 2)
+        self.assertEqual(snapshot["thumb.work"]["count"], 2)
+
 
 if __name__ == "__main__":
     unittest.main()